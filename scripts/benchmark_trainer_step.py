@@ -0,0 +1,100 @@
+"""
+Benchmark the per-step overhead of :class:`tfsnippet.trainer.Trainer`.
+
+A tiny model is trained by the following approaches, and the average time
+per step is reported:
+
+1. "session.run": build the fetch list and the feed dict at each step, and
+   call ``session.run``, as :meth:`Trainer._run_step` did before the fetch
+   plan was compiled.
+2. "make_callable": call a step function compiled by
+   ``session.make_callable``, which is the lower bound of the overhead.
+3. "Trainer._run_step": run the step by :class:`Trainer`.
+
+Usage::
+
+    python scripts/benchmark_trainer_step.py --steps 2000
+"""
+import argparse
+import time
+
+import numpy as np
+import six
+import tensorflow as tf
+
+from tfsnippet.scaffold import TrainLoop
+from tfsnippet.trainer import Trainer, merge_feed_dict, resolve_feed_dict
+
+
+def build_model(x_dim):
+    input_x = tf.placeholder(dtype=tf.float32, shape=[None, x_dim])
+    input_y = tf.placeholder(dtype=tf.float32, shape=[None])
+    learning_rate = tf.placeholder(dtype=tf.float32, shape=())
+    w = tf.get_variable('w', shape=[x_dim], dtype=tf.float32,
+                        initializer=tf.zeros_initializer())
+    loss = tf.reduce_mean(tf.square(tf.reduce_sum(input_x * w, axis=-1) -
+                                    input_y))
+    train_op = tf.train.GradientDescentOptimizer(learning_rate). \
+        minimize(loss)
+    return input_x, input_y, learning_rate, loss, train_op, w
+
+
+def measure(fn, steps):
+    for _ in range(min(steps, 100)):  # warm up
+        fn()
+    start_time = time.time()
+    for _ in range(steps):
+        fn()
+    return (time.time() - start_time) / steps
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--steps', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--x-dim', type=int, default=16)
+    args = parser.parse_args()
+
+    input_x, input_y, learning_rate, loss, train_op, w = \
+        build_model(args.x_dim)
+    inputs = [input_x, input_y]
+    batch = (np.random.normal(size=[args.batch_size, args.x_dim]).
+             astype(np.float32),
+             np.random.normal(size=[args.batch_size]).astype(np.float32))
+    feed_dict = {learning_rate: lambda: 0.001}
+    metrics = {'loss': loss}
+
+    with tf.Session() as session, \
+            TrainLoop([w], max_epoch=1, early_stopping=False) as loop:
+        session.run(tf.global_variables_initializer())
+        loop.collect_metrics = lambda *args, **kwargs: None
+
+        def session_run_step():
+            fd = resolve_feed_dict(merge_feed_dict(feed_dict,
+                                                   zip(inputs, batch)))
+            metric_names = list(six.iterkeys(metrics))
+            metric_tensors = [metrics[k] for k in metric_names]
+            session.run([train_op] + metric_tensors, feed_dict=fd)
+
+        step_fn = session.make_callable(
+            [train_op, loss], feed_list=[learning_rate] + inputs)
+
+        def make_callable_step():
+            step_fn(0.001, *batch)
+
+        trainer = Trainer(loop, train_op, inputs, None,
+                          feed_dict=feed_dict, metrics=metrics)
+
+        def trainer_step():
+            trainer._run_step(session, (0, batch))
+
+        print('Average time per step ({} steps):'.format(args.steps))
+        for name, fn in [('session.run', session_run_step),
+                         ('make_callable', make_callable_step),
+                         ('Trainer._run_step', trainer_step)]:
+            print('  {:<20s}{:.1f} us'.format(
+                name, measure(fn, args.steps) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -52,6 +52,10 @@ setup(
     platforms='any',
     setup_requires=['setuptools'],
     install_requires=install_requires,
+    extras_require={
+        # for decoding images by `tfsnippet.datasets.ImageFolder`
+        'images': ['imageio >= 2.3.0'],
+    },
     dependency_links=dependency_links,
     classifiers=[
         'Development Status :: 2 - Alpha',
@@ -2,9 +2,16 @@ import unittest
 
 import numpy as np
 import pytest
+import six
 
-from tfsnippet.dataflows import DataFlow
+from tfsnippet.dataflows import DataFlow, FeistelPermutation
 from tfsnippet.dataflows.array_flow import ArrayFlow
+from tfsnippet.utils import CheckpointSavableObject
+
+if six.PY2:
+    import cPickle as pkl
+else:
+    import pickle as pkl
 
 
 class ArrayFlowTestCase(unittest.TestCase):
@@ -84,3 +91,168 @@ class ArrayFlowTestCase(unittest.TestCase):
         b = [a[0] for a in ArrayFlow([np.arange(12)], 5, shuffle=True)]
         self.assertEqual(3, len(b))
         np.testing.assert_array_equal(np.arange(12), sorted(np.concatenate(b)))
+
+    def test_ring_buffers(self):
+        x = np.arange(24).reshape([12, 2])
+        y = np.arange(12)
+        df = DataFlow.arrays([x, y], 5, shuffle=True, ring_buffer_size=2)
+        self.assertEqual(2, df.ring_buffer_size)
+
+        batches = []
+        for bx, by in df:
+            np.testing.assert_equal(bx, x[by])
+            self.assertFalse(bx.flags.writeable)
+            batches.append((bx, by))
+        self.assertEqual([5, 5, 2], [len(b[0]) for b in batches])
+
+        # the first and the third mini-batch share the same buffer
+        self.assertIs(batches[0][0].base, batches[2][0].base)
+        self.assertIsNot(batches[0][0].base, batches[1][0].base)
+
+        # the buffers are reused in the next epoch
+        bx, by = next(iter(df))
+        self.assertIs(bx.base, batches[1][0].base)
+
+        with pytest.raises(
+                ValueError, match='`ring_buffer_size` must be at least 1'):
+            _ = ArrayFlow([x], 5, ring_buffer_size=0)
+        with pytest.raises(
+                ValueError, match='`arrays` must be numpy arrays when '
+                                  '`ring_buffer_size` is specified'):
+            _ = ArrayFlow([_ArrayLike(x)], 5, ring_buffer_size=2)
+
+    def test_block_shuffle(self):
+        x = np.arange(46)
+        df = ArrayFlow([x], 4, shuffle=True, shuffle_block_size=8)
+        self.assertEqual(8, df.shuffle_block_size)
+
+        for _ in range(5):
+            batches = [b[0] for b in df]
+            np.testing.assert_equal(np.sort(np.concatenate(batches)), x)
+            views = 0
+            for b in batches:
+                self.assertFalse(b.flags.writeable)
+                if np.may_share_memory(b, x):
+                    views += 1
+                    np.testing.assert_equal(
+                        b, np.arange(b[0], b[0] + len(b)))
+            # all the batches except those after the incomplete block
+            # should be views
+            self.assertGreaterEqual(views, 6)
+
+        with pytest.raises(
+                ValueError, match='`shuffle_block_size` must be at least 1'):
+            _ = ArrayFlow([x], 5, shuffle_block_size=0)
+
+    def test_block_shuffle_with_ring_buffers(self):
+        x = np.arange(23)
+        df = ArrayFlow([x], 4, shuffle=True, skip_incomplete=True,
+                       shuffle_block_size=5, ring_buffer_size=3)
+        for _ in range(5):
+            batches = [b[0].copy() for b in df]
+            self.assertEqual(5, len(batches))
+            merged = np.concatenate(batches)
+            self.assertEqual(len(merged), len(np.unique(merged)))
+
+    def test_counter_based_shuffle(self):
+        x = np.arange(23)
+        df = ArrayFlow([x], 4, shuffle=True, shuffle_seed=1234)
+        self.assertEqual(1234, df.shuffle_seed)
+        self.assertIsNone(ArrayFlow([x], 4).shuffle_seed)
+
+        epochs = []
+        for epoch in range(3):
+            merged = np.concatenate([b[0] for b in df])
+            np.testing.assert_equal(
+                FeistelPermutation(23, seed=1234, epoch=epoch).to_array(),
+                merged
+            )
+            epochs.append(merged)
+        self.assertFalse(np.all(epochs[0] == epochs[1]))
+
+        # the shuffling is reproducible from `(shuffle_seed, epoch)`
+        df2 = DataFlow.arrays([x], 4, shuffle=True, shuffle_seed=1234)
+        for e in epochs:
+            np.testing.assert_equal(e, np.concatenate([b[0] for b in df2]))
+
+        with pytest.raises(ValueError, match='`shuffle_seed` and '
+                                             '`shuffle_block_size` cannot '
+                                             'be both specified'):
+            _ = ArrayFlow([x], 4, shuffle=True, shuffle_seed=1,
+                          shuffle_block_size=5)
+
+    def test_state(self):
+        x = np.arange(23)
+
+        for kwargs in ({}, {'shuffle': True},
+                       {'shuffle': True, 'shuffle_block_size': 5},
+                       {'shuffle': True, 'shuffle_seed': 1234}):
+            df = ArrayFlow([x], 4, **kwargs)
+            self.assertIsInstance(df, CheckpointSavableObject)
+            _ = list(df)
+
+            # interrupt an epoch, and save the state
+            it = iter(df)
+            expected = [next(it)[0] for _ in range(2)]
+            state = pkl.loads(pkl.dumps(df.get_state()))
+            self.assertEqual(2, state['batch_cursor'])
+            expected.extend(b[0] for b in it)
+            next_epoch = [b[0] for b in df]
+
+            # restore the state into a new flow
+            df2 = ArrayFlow([x], 4, **kwargs)
+            df2.set_state(state)
+            self.assertEqual(0, df2.get_state()['batch_cursor'])
+            np.testing.assert_equal(expected[2:], [b[0] for b in df2])
+            np.testing.assert_equal(next_epoch, [b[0] for b in df2])
+
+            # the state after a complete epoch
+            df2.set_state(df.get_state())
+            self.assertEqual(0, df.get_state()['batch_cursor'])
+            np.testing.assert_equal(list(df), list(df2))
+
+
+    def test_shuffle_stream(self):
+        # the indices should be shuffled in place from the last epoch, as
+        # in earlier versions, such that seeded flows are reproducible
+        df = ArrayFlow([np.arange(10)], 10, shuffle=True,
+                       random_state=np.random.RandomState(1))
+        epochs = [next(iter(df))[0] for _ in range(2)]
+        np.testing.assert_equal(epochs[1], [5, 3, 4, 2, 8, 0, 6, 9, 1, 7])
+
+        rs = np.random.RandomState(1)
+        indices = np.arange(10)
+        for e in epochs:
+            rs.shuffle(indices)
+            np.testing.assert_equal(indices, e)
+
+    def test_state_of_restored_epoch(self):
+        x = np.arange(23)
+        df = ArrayFlow([x], 4, shuffle=True)
+        _ = list(df)
+        it = iter(df)
+        _ = next(it)
+        state = df.get_state()
+        expected = [b[0] for b in it]
+        next_epoch = [b[0] for b in df]
+
+        # the state taken before the restored epoch is resumed should
+        # also reproduce the permutation of that epoch
+        df2 = ArrayFlow([x], 4, shuffle=True)
+        df2.set_state(state)
+        df3 = ArrayFlow([x], 4, shuffle=True)
+        _ = list(df3)  # the indices should be replaced by the restored ones
+        df3.set_state(pkl.loads(pkl.dumps(df2.get_state())))
+        for f in (df2, df3):
+            np.testing.assert_equal(expected, [b[0] for b in f][-5:])
+            np.testing.assert_equal(next_epoch, [b[0] for b in f])
+
+
+class _ArrayLike(object):
+
+    def __init__(self, array):
+        self.array = array
+        self.shape = array.shape
+
+    def __len__(self):
+        return len(self.array)
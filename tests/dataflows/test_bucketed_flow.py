@@ -0,0 +1,131 @@
+import unittest
+
+import numpy as np
+import pytest
+
+from tfsnippet.dataflows import DataFlow
+from tfsnippet.dataflows.bucketed_flow import BucketedFlow
+
+
+def _make_sequences(lengths):
+    return [np.arange(n) + 100 * i + 1 for i, n in enumerate(lengths)]
+
+
+class BucketedFlowTestCase(unittest.TestCase):
+
+    def test_props(self):
+        lengths = np.asarray([3, 1, 7, 4, 2, 9])
+        seq = _make_sequences(lengths)
+        y = np.arange(12).reshape([6, 2])
+        df = DataFlow.bucketed([seq], lengths, batch_size=2,
+                               bucket_boundaries=[3, 6], arrays=[y])
+        self.assertIsInstance(df, BucketedFlow)
+        self.assertEqual(3, df.array_count)
+        self.assertEqual(6, df.data_length)
+        self.assertEqual(((None,), (None,), (2,)), df.data_shapes)
+        self.assertEqual(2, df.batch_size)
+        self.assertFalse(df.is_shuffled)
+        self.assertFalse(df.skip_incomplete)
+        self.assertEqual((seq,), df.the_sequences)
+        self.assertEqual((y,), df.the_arrays)
+        np.testing.assert_equal(lengths, df.lengths)
+        np.testing.assert_equal([3, 6], df.bucket_boundaries)
+        self.assertEqual((2, 2, 2), df.bucket_sizes)
+        self.assertIsNone(df.ring_buffer_size)
+
+    def test_errors(self):
+        lengths = np.asarray([1, 2, 3])
+        seq = _make_sequences(lengths)
+        with pytest.raises(ValueError, match='`sequences` must not be empty'):
+            _ = BucketedFlow([], lengths, 2, [2])
+        with pytest.raises(ValueError,
+                           match='`lengths` must be a 1-d integer array'):
+            _ = BucketedFlow([seq], lengths.astype(np.float32), 2, [2])
+        with pytest.raises(ValueError, match='`sequences` and `lengths` must '
+                                             'have the same data length'):
+            _ = BucketedFlow([seq[:2]], lengths, 2, [2])
+        with pytest.raises(ValueError, match='Padded `sequences` are shorter '
+                                             'than `lengths`: 2 vs 3'):
+            _ = BucketedFlow([np.zeros([3, 2])], lengths, 2, [2])
+        with pytest.raises(ValueError, match='`arrays` and `lengths` must '
+                                             'have the same data length'):
+            _ = BucketedFlow([seq], lengths, 2, [2], arrays=[np.arange(2)])
+        with pytest.raises(ValueError, match='`bucket_boundaries` must be a '
+                                             'strictly increasing sequence'):
+            _ = BucketedFlow([seq], lengths, 2, [2, 2])
+        with pytest.raises(ValueError,
+                           match='`ring_buffer_size` must be at least 1'):
+            _ = BucketedFlow([seq], lengths, 2, [2], ring_buffer_size=0)
+
+    def test_no_shuffle(self):
+        lengths = np.asarray([3, 1, 7, 4, 2, 9, 5])
+        seq = _make_sequences(lengths)
+        padded = np.full([7, 10, 2], -1, dtype=np.float32)
+        for i, s in enumerate(seq):
+            padded[i, :len(s)] = s[:, np.newaxis]
+        y = np.arange(7)
+
+        df = DataFlow.bucketed([seq, padded], lengths, batch_size=2,
+                               bucket_boundaries=[3, 6], arrays=[y],
+                               pad_value=-1, mask_dtype=np.float32)
+        self.assertEqual(((None,), (None, 2), (None,), ()), df.data_shapes)
+        b = list(df)
+        np.testing.assert_equal([[1, 4], [0, 3], [6], [2, 5]],
+                                [a[3] for a in b])
+        np.testing.assert_equal([2, 4, 5, 9], [a[0].shape[1] for a in b])
+
+        for bs, bp, bm, by in b:
+            self.assertEqual(np.float32, bm.dtype)
+            self.assertFalse(bs.flags.writeable)
+            for j, i in enumerate(by):
+                n = lengths[i]
+                np.testing.assert_equal(seq[i], bs[j, :n])
+                np.testing.assert_equal(-1, bs[j, n:])
+                np.testing.assert_equal(padded[i, :bs.shape[1]], bp[j])
+                np.testing.assert_equal(1., bm[j, :n])
+                np.testing.assert_equal(0., bm[j, n:])
+
+        # test skip incomplete
+        df = DataFlow.bucketed([seq], lengths, batch_size=2,
+                               bucket_boundaries=[3, 6], arrays=[y],
+                               skip_incomplete=True)
+        np.testing.assert_equal([[1, 4], [0, 3], [2, 5]],
+                                [a[2] for a in df])
+
+    def test_shuffle(self):
+        lengths = np.random.randint(1, 30, size=200)
+        seq = _make_sequences(lengths)
+        y = np.arange(200)
+        boundaries = [5, 10, 20]
+        buckets = np.searchsorted(boundaries, lengths, side='right')
+
+        for ring_buffer_size in (None, 3):
+            df = DataFlow.bucketed([seq], lengths, batch_size=8,
+                                   bucket_boundaries=boundaries, arrays=[y],
+                                   shuffle=True,
+                                   ring_buffer_size=ring_buffer_size)
+            epochs = []
+            for _ in range(2):
+                indices = []
+                for bs, bm, by in df:
+                    # each mini-batch should be taken from one bucket
+                    self.assertEqual(1, len(np.unique(buckets[by])))
+                    self.assertEqual(lengths[by].max(), bs.shape[1])
+                    self.assertTrue(bs.flags.c_contiguous)
+                    np.testing.assert_equal(lengths[by], np.sum(bm, axis=-1))
+                    for j, i in enumerate(by):
+                        np.testing.assert_equal(seq[i], bs[j, :lengths[i]])
+                    indices.append(by.copy())
+                epochs.append(np.concatenate(indices))
+                np.testing.assert_equal(y, np.sort(epochs[-1]))
+            self.assertFalse(np.all(epochs[0] == epochs[1]))
+
+    def test_ring_buffers(self):
+        lengths = np.asarray([3, 1, 7, 4, 2, 9])
+        seq = _make_sequences(lengths)
+        df = DataFlow.bucketed([seq], lengths, batch_size=2,
+                               bucket_boundaries=[3, 6], ring_buffer_size=2)
+        b = [a[0] for a in df]
+        # the third mini-batch should reuse the buffer of the first one
+        self.assertTrue(np.may_share_memory(b[0], b[2]))
+        self.assertFalse(np.may_share_memory(b[0], b[1]))
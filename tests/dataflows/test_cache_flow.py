@@ -0,0 +1,231 @@
+import functools
+import os
+import unittest
+
+import numpy as np
+import pytest
+
+from tfsnippet.dataflows import DataFlow
+from tfsnippet.dataflows.cache_flow import CacheFlow, _callable_identity
+from tfsnippet.utils import TemporaryDirectory
+
+
+class _CountingMapper(object):
+
+    def __init__(self):
+        self.counter = 0
+
+    def __call__(self, x):
+        self.counter += len(x)
+        return x * 2, x.astype(np.float32) + .5
+
+
+class CacheFlowTestCase(unittest.TestCase):
+
+    def test_props(self):
+        source = DataFlow.arrays([np.arange(10)], batch_size=4)
+        df = source.cache()
+        self.assertIsInstance(df, CacheFlow)
+        self.assertIs(source, df.source)
+        self.assertIsNone(df.path)
+        self.assertIsNone(df.max_bytes)
+        self.assertFalse(df.is_cached)
+
+        with TemporaryDirectory() as tempdir:
+            df = source.cache(tempdir, max_bytes=100)
+            self.assertEqual(os.path.abspath(tempdir), df.path)
+            self.assertEqual(100, df.max_bytes)
+
+        with pytest.raises(ValueError,
+                           match='`max_bytes` must be non-negative'):
+            _ = source.cache(max_bytes=-1)
+
+    def test_cache_in_memory(self):
+        x = np.arange(10)
+        mapper = _CountingMapper()
+        df = DataFlow.arrays([x], batch_size=4).map(mapper).cache()
+
+        b = list(df)
+        self.assertEqual(10, mapper.counter)
+        self.assertTrue(df.is_cached)
+        self.assertEqual(3, len(b))
+        np.testing.assert_equal(x * 2, np.concatenate([a[0] for a in b]))
+
+        # the replayed mini-batches should be identical
+        b2 = list(df)
+        self.assertEqual(10, mapper.counter)
+        self.assertEqual([4, 4, 2], [len(a[0]) for a in b2])
+        for a1, a2 in zip(b, b2):
+            np.testing.assert_equal(a1, a2)
+            self.assertEqual(np.float32, a2[1].dtype)
+
+        # test clear
+        df.clear()
+        self.assertFalse(df.is_cached)
+        _ = list(df)
+        self.assertEqual(20, mapper.counter)
+
+    def test_replay_shuffled(self):
+        x = np.arange(100)
+        mapper = _CountingMapper()
+        df = DataFlow.arrays([x], batch_size=32, shuffle=True,
+                             random_state=np.random.RandomState(1)). \
+            map(mapper).cache()
+
+        epochs = []
+        for _ in range(3):
+            b = list(df)
+            self.assertEqual([32, 32, 32, 4], [len(a[0]) for a in b])
+            y = np.concatenate([a[0] for a in b])
+            z = np.concatenate([a[1] for a in b])
+            np.testing.assert_equal(x * 2, np.sort(y))
+            np.testing.assert_equal(y / 2 + .5, z)
+            epochs.append(y)
+        self.assertEqual(100, mapper.counter)
+        self.assertFalse(np.all(epochs[0] == epochs[1]))
+        self.assertFalse(np.all(epochs[1] == epochs[2]))
+
+    def test_cache_on_disk(self):
+        x = np.arange(10)
+
+        with TemporaryDirectory() as tempdir:
+            mapper = _CountingMapper()
+            df = DataFlow.arrays([x], batch_size=4).map(mapper). \
+                cache(tempdir, cache_key='counting')
+            b = list(df)
+            self.assertEqual(10, mapper.counter)
+            self.assertTrue(
+                os.path.exists(os.path.join(tempdir, 'meta.json')))
+
+            # replay from the memory-mapped files
+            b2 = list(df)
+            self.assertEqual(10, mapper.counter)
+            for a1, a2 in zip(b, b2):
+                np.testing.assert_equal(a1, a2)
+                self.assertFalse(a2[0].flags.writeable)
+
+            # reused by another flow with the same mapper and data length
+            mapper2 = _CountingMapper()
+            df2 = DataFlow.arrays([x], batch_size=4).map(mapper2). \
+                cache(tempdir, cache_key='counting')
+            b2 = list(df2)
+            self.assertEqual(0, mapper2.counter)
+            for a1, a2 in zip(b, b2):
+                np.testing.assert_equal(a1, a2)
+
+            # invalidated by a different data length
+            df3 = DataFlow.arrays([x[:8]], batch_size=4).map(mapper2). \
+                cache(tempdir, cache_key='counting')
+            b3 = list(df3)
+            self.assertEqual(8, mapper2.counter)
+            self.assertEqual([4, 4], [len(a[0]) for a in b3])
+
+            # invalidated by a different mapper
+            df4 = DataFlow.arrays([x[:8]], batch_size=4).map(
+                lambda x: (x + 1,)).cache(tempdir)
+            np.testing.assert_equal(
+                x[:8] + 1, np.concatenate([a[0] for a in df4]))
+            np.testing.assert_equal(
+                x[:8] + 1, np.concatenate([a[0] for a in df4]))
+
+            # invalidated by a mapper with different constants
+            df5 = DataFlow.arrays([x[:8]], batch_size=4).map(
+                lambda x: (x + 2,)).cache(tempdir)
+            np.testing.assert_equal(
+                x[:8] + 2, np.concatenate([a[0] for a in df5]))
+
+            # test clear
+            df4.clear()
+            self.assertFalse(df4.is_cached)
+            self.assertFalse(
+                os.path.exists(os.path.join(tempdir, 'meta.json')))
+            self.assertFalse(
+                os.path.exists(os.path.join(tempdir, 'array_0.bin')))
+
+    def test_callable_identity(self):
+        def scale_factory(factor, offset):
+            def scale(x, shift=offset):
+                return x * factor + shift,
+            return scale
+
+        identities = [
+            _callable_identity(fn) for fn in (
+                lambda x: (x * 2,),
+                lambda x: (x * 3,),
+                lambda x: (x * 2.,),
+                lambda x: ([(i * 2,) for i in x],),
+                lambda x: ([(i * 3,) for i in x],),
+                scale_factory(2, 0),
+                scale_factory(3, 0),
+                scale_factory(2, 1),
+                functools.partial(scale_factory(2, 0), shift=1),
+                np.square,
+                np.sqrt,
+            )
+        ]
+        self.assertNotIn(None, identities)
+        self.assertEqual(len(identities), len(set(identities)))
+
+        # the identity should be deterministic
+        self.assertEqual(_callable_identity(scale_factory(2, 0)),
+                         _callable_identity(scale_factory(2, 0)))
+        self.assertEqual(
+            _callable_identity(lambda x: (x * np.arange(3),)),
+            _callable_identity(lambda x: (x * np.arange(3),))
+        )
+
+        # objects with internal states cannot be identified
+        self.assertIsNone(_callable_identity(_CountingMapper()))
+        self.assertIsNone(_callable_identity(scale_factory(object(), 0)))
+
+    def test_cache_key_required(self):
+        source = DataFlow.arrays([np.arange(10)], batch_size=4). \
+            map(_CountingMapper())
+        _ = source.cache()  # not required for caching in memory
+
+        with TemporaryDirectory() as tempdir:
+            with pytest.raises(ValueError,
+                               match='cannot be identified reliably, '
+                                     '`cache_key` must be specified'):
+                _ = source.cache(tempdir)
+
+    def test_interrupted_and_exceeded(self):
+        x = np.arange(10)
+        mapper = _CountingMapper()
+        df = DataFlow.arrays([x], batch_size=4).map(mapper).cache()
+
+        # the interrupted epoch should not be cached
+        for _ in df:
+            break
+        self.assertFalse(df.is_cached)
+        _ = list(df)
+        self.assertTrue(df.is_cached)
+        self.assertEqual(14, mapper.counter)
+
+        # exceeding `max_bytes` should disable the cache
+        mapper = _CountingMapper()
+        df = DataFlow.arrays([x], batch_size=4).map(mapper). \
+            cache(max_bytes=100)  # 120 bytes in total
+        for _ in range(2):
+            np.testing.assert_equal(
+                x * 2, np.concatenate([a[0] for a in df]))
+            self.assertFalse(df.is_cached)
+        self.assertEqual(20, mapper.counter)
+
+    def test_errors(self):
+        with TemporaryDirectory() as tempdir:
+            df = DataFlow.arrays([np.array(['a', 1], dtype=object)],
+                                 batch_size=2).cache(tempdir)
+            with pytest.raises(TypeError,
+                               match='Arrays of dtype object cannot be '
+                                     'cached on disk'):
+                _ = list(df)
+
+        df = DataFlow.iterator_factory(
+            lambda: iter([(np.arange(3),), (np.arange(3.),)])).cache()
+        with pytest.raises(ValueError,
+                           match='The mini-batches to be cached must have '
+                                 'identical array count, dtypes and item '
+                                 'shapes'):
+            _ = list(df)
+        self.assertFalse(df.is_cached)
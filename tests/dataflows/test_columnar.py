@@ -0,0 +1,136 @@
+import mmap
+import os
+import unittest
+
+import numpy as np
+import pytest
+
+from tfsnippet.dataflows import DataFlow
+from tfsnippet.dataflows.columnar import ColumnarWriter, ColumnarFlow
+from tfsnippet.utils import TemporaryDirectory
+
+
+def _is_memory_mapped(arr):
+    while isinstance(arr, np.ndarray):
+        arr = arr.base
+    return isinstance(arr, mmap.mmap)
+
+
+class ColumnarTestCase(unittest.TestCase):
+
+    def test_write_and_read(self):
+        x = np.arange(230, dtype=np.float32).reshape([115, 2])
+        y = np.arange(115) % 3
+        source = DataFlow.arrays([x, y], batch_size=7)
+
+        with TemporaryDirectory() as tempdir:
+            for compression in (None, 'zlib', 'bz2'):
+                path = os.path.join(tempdir, 'data.col')
+                with ColumnarWriter(path, chunk_size=20,
+                                    compression=compression) as writer:
+                    self.assertEqual(path, writer.path)
+                    self.assertEqual(20, writer.chunk_size)
+                    self.assertEqual(compression, writer.compression)
+                    writer.write_flow(source)
+                    self.assertEqual(115, writer.item_count)
+
+                df = DataFlow.columnar(path, batch_size=16)
+                self.assertIsInstance(df, ColumnarFlow)
+                self.assertEqual(path, df.path)
+                self.assertEqual(20, df.chunk_size)
+                self.assertEqual(compression, df.compression)
+                self.assertIsNone(df.workers)
+                self.assertEqual(115, df.data_length)
+                self.assertEqual(((2,), ()), df.data_shapes)
+
+                # sequential read
+                batches = list(df)
+                self.assertEqual([16] * 7 + [3], [len(b[0]) for b in batches])
+                np.testing.assert_equal(
+                    x, np.concatenate([b[0] for b in batches]))
+                np.testing.assert_equal(
+                    y, np.concatenate([b[1] for b in batches]))
+                self.assertEqual(np.float32, batches[0][0].dtype)
+                self.assertFalse(batches[0][0].flags.writeable)
+                # the mini-batch within one chunk is memory-mapped
+                self.assertEqual(compression is None,
+                                 _is_memory_mapped(batches[0][0]))
+
+                # shuffled read, with parallel decompression
+                for kwargs in ({}, {'shuffle_block_size': 20},
+                               {'shuffle_seed': 1234}):
+                    with ColumnarFlow(path, batch_size=16, shuffle=True,
+                                      workers=2, cache_chunks=2,
+                                      **kwargs) as df:
+                        self.assertEqual(2, df.workers)
+                        for _ in range(2):
+                            batches = list(df)
+                            bx = np.concatenate([b[0] for b in batches])
+                            by = np.concatenate([b[1] for b in batches])
+                            self.assertFalse(np.all(bx == x))
+                            np.testing.assert_equal(
+                                x, bx[np.argsort(bx[:, 0])])
+                            np.testing.assert_equal(
+                                by, (bx[:, 0] // 2).astype(np.int64) % 3)
+
+    def test_compressed_blocks(self):
+        with TemporaryDirectory() as tempdir:
+            path = os.path.join(tempdir, 'data.col')
+            zeros = np.zeros([100, 10], dtype=np.float64)
+            noise = np.random.RandomState(1).randint(
+                0, 256, size=[100], dtype=np.uint8)
+            with ColumnarWriter(path, chunk_size=50,
+                                compression='zlib') as writer:
+                writer.write([zeros, noise])
+            compressed_size = os.path.getsize(path)
+            self.assertLess(compressed_size, zeros.nbytes // 10)
+
+            # the incompressible blocks are memory-mapped
+            df = ColumnarFlow(path, batch_size=50)
+            [(bz, bn), _] = list(df)
+            self.assertFalse(_is_memory_mapped(bz))
+            self.assertTrue(_is_memory_mapped(bn))
+            np.testing.assert_equal(zeros[:50], bz)
+            np.testing.assert_equal(noise[:50], bn)
+
+            # random access with negative indices
+            np.testing.assert_equal(
+                noise[[99, 0, 51]], df.the_arrays[1][np.array([-1, 0, 51])])
+
+    def test_errors(self):
+        with TemporaryDirectory() as tempdir:
+            path = os.path.join(tempdir, 'data.col')
+            with pytest.raises(ValueError,
+                               match='`chunk_size` must be at least 1'):
+                _ = ColumnarWriter(path, chunk_size=0)
+            with pytest.raises(ValueError,
+                               match='Invalid value for argument '
+                                     '`compression`'):
+                _ = ColumnarWriter(path, compression='xyz')
+
+            with ColumnarWriter(path) as writer:
+                with pytest.raises(TypeError,
+                                   match='Arrays of dtype object cannot be '
+                                         'written'):
+                    writer.write([np.array([1, 'a'], dtype=object)])
+                with pytest.raises(ValueError,
+                                   match='`arrays` must have the same data '
+                                         'length'):
+                    writer.write([np.arange(3), np.arange(4)])
+                with pytest.raises(ValueError,
+                                   match='The mini-batches to be written '
+                                         'must have identical array count, '
+                                         'dtypes and item shapes'):
+                    writer.write([np.arange(3.), np.arange(3)])
+            with pytest.raises(ValueError,
+                               match='`workers` must be at least 1'):
+                _ = ColumnarFlow(path, batch_size=2, workers=0)
+            with pytest.raises(ValueError,
+                               match='`cache_chunks` must be at least 1'):
+                _ = ColumnarFlow(path, batch_size=2, cache_chunks=0)
+
+            with open(path, 'wb') as f:
+                f.write(b'not a columnar file')
+            with pytest.raises(IOError,
+                               match='Not a columnar record file'):
+                _ = ColumnarFlow(path, batch_size=2)
@@ -0,0 +1,34 @@
+import unittest
+
+import numpy as np
+import pytest
+
+from tfsnippet.dataflows import DataFlow
+from tfsnippet.dataflows.concat_flow import ConcatFlow
+
+
+class ConcatFlowTestCase(unittest.TestCase):
+
+    def test_flow(self):
+        x_flow = DataFlow.arrays([np.arange(10)], batch_size=4)
+        y_flow = DataFlow.arrays([np.arange(10, 17)], batch_size=4)
+        flow = DataFlow.concat([x_flow, y_flow])
+        self.assertIsInstance(flow, ConcatFlow)
+        self.assertEqual((x_flow, y_flow), flow.flows)
+        batches = list(flow)
+        self.assertEqual([4, 4, 2, 4, 3], [len(b[0]) for b in batches])
+        np.testing.assert_equal(
+            np.arange(17), np.concatenate([b[0] for b in batches]))
+
+        # concat and then rebatch
+        batches = list(flow.rebatch(4))
+        self.assertEqual([4, 4, 4, 4, 1], [len(b[0]) for b in batches])
+        np.testing.assert_equal(
+            np.arange(17), np.concatenate([b[0] for b in batches]))
+
+    def test_errors(self):
+        with pytest.raises(
+                ValueError, match='At least one flow must be specified'):
+            _ = DataFlow.concat([])
+        with pytest.raises(TypeError, match='Not a DataFlow'):
+            _ = DataFlow.concat([1])
@@ -50,3 +50,65 @@ class SlidingWindowTestCase(unittest.TestCase):
             [[8, 9, 10], [9, 10, 11], [10, 11, 12]],
             batches[2][0]
         )
+
+    def test_strided_views(self):
+        arr = np.arange(26).reshape([13, 2])
+        sw = SlidingWindow(arr, window_size=3)
+        self.assertEqual(11, sw.window_count)
+
+        # consecutive windows should be views
+        [w] = sw(np.asarray([4, 5, 6]))
+        self.assertTrue(np.may_share_memory(arr, w))
+        self.assertFalse(w.flags.writeable)
+        np.testing.assert_equal(
+            arr[np.asarray([[4, 5, 6], [5, 6, 7], [6, 7, 8]])], w)
+
+        # other windows should be gathered
+        [w] = sw(np.asarray([4, 6, 5]))
+        self.assertFalse(np.may_share_memory(arr, w))
+        np.testing.assert_equal(
+            arr[np.asarray([[4, 5, 6], [6, 7, 8], [5, 6, 7]])], w)
+
+        for batch in sw.as_flow(batch_size=4):
+            self.assertTrue(np.may_share_memory(arr, batch[0]))
+
+    def test_stride_and_multi_arrays(self):
+        values = np.arange(13, dtype=np.float32)
+        labels = np.arange(13) % 2
+        sw = SlidingWindow([values, labels], window_size=4, stride=3)
+        self.assertEqual(3, sw.stride)
+        self.assertEqual(4, sw.window_count)
+
+        batches = list(sw.as_flow(batch_size=3))
+        self.assertEqual(2, len(batches))
+        np.testing.assert_equal(
+            [[0, 1, 2, 3], [3, 4, 5, 6], [6, 7, 8, 9]], batches[0][0])
+        np.testing.assert_equal(
+            [[0, 1, 0, 1], [1, 0, 1, 0], [0, 1, 0, 1]], batches[0][1])
+        np.testing.assert_equal([[9, 10, 11, 12]], batches[1][0])
+        np.testing.assert_equal([[1, 0, 1, 0]], batches[1][1])
+        self.assertEqual(np.float32, batches[0][0].dtype)
+
+        # shuffled windows
+        batches = list(sw.as_flow(batch_size=4, shuffle=True))
+        np.testing.assert_equal(
+            np.arange(0, 10, 3), np.sort(batches[0][0][:, 0]))
+        np.testing.assert_equal(batches[0][0] % 2, batches[0][1])
+
+        # too short data
+        self.assertEqual(0, SlidingWindow(values, window_size=14).
+                         window_count)
+
+    def test_errors(self):
+        arr = np.arange(13)
+        with pytest.raises(ValueError,
+                           match='`window_size` must be at least 1'):
+            _ = SlidingWindow(arr, window_size=0)
+        with pytest.raises(ValueError, match='`stride` must be at least 1'):
+            _ = SlidingWindow(arr, window_size=3, stride=0)
+        with pytest.raises(ValueError,
+                           match='`data_array` must have the same length'):
+            _ = SlidingWindow([arr, arr[:-1]], window_size=3)
+        with pytest.raises(ValueError,
+                           match='`data_array` must be at least 1-d arrays'):
+            _ = SlidingWindow(np.asarray(1), window_size=3)
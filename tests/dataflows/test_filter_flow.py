@@ -0,0 +1,62 @@
+import unittest
+
+import numpy as np
+import pytest
+
+from tfsnippet.dataflows import DataFlow
+from tfsnippet.dataflows.filter_flow import FilterFlow
+from tfsnippet.dataflows.rebatch_flow import RebatchFlow
+
+
+class FilterFlowTestCase(unittest.TestCase):
+
+    def test_filter(self):
+        x = np.arange(20)
+        y = np.arange(40).reshape([20, 2])
+        source = DataFlow.arrays([x, y], batch_size=4)
+
+        df = source.filter(lambda x, y: (x % 8 < 3))
+        self.assertIsInstance(df, FilterFlow)
+        self.assertIs(source, df.source)
+        self.assertIsNone(df.array_indices)
+        b = list(df)
+        # the mini-batch [4, 5, 6, 7] should be dropped
+        self.assertEqual([[0, 1, 2], [8, 9, 10], [16, 17, 18]],
+                         [a[0].tolist() for a in b])
+        np.testing.assert_equal(y[x % 8 < 3],
+                                np.concatenate([a[1] for a in b]))
+
+        # test array indices
+        df = source.filter(lambda y: y[:, 1] > 30, array_indices=1)
+        self.assertEqual((1,), df.array_indices)
+        np.testing.assert_equal(
+            np.arange(15, 20), np.concatenate([a[0] for a in df]))
+
+        # mini-batches with all samples kept should be returned as they are
+        batches = list(source)
+        df = DataFlow.iterator_factory(lambda: batches). \
+            filter(lambda x, y: np.ones(len(x), dtype=np.bool_))
+        for a, b in zip(batches, df):
+            self.assertIs(a[0], b[0])
+
+    def test_rebatch(self):
+        x = np.arange(50)
+        df = DataFlow.arrays([x], batch_size=7).filter(
+            lambda x: x % 3 != 0, batch_size=7, skip_incomplete=True)
+        self.assertIsInstance(df, RebatchFlow)
+        self.assertIsInstance(df.source, FilterFlow)
+        b = list(df)
+        self.assertEqual([7] * 4, [len(a[0]) for a in b])
+        np.testing.assert_equal(
+            x[x % 3 != 0][:28], np.concatenate([a[0] for a in b]))
+
+    def test_errors(self):
+        source = DataFlow.arrays([np.arange(10)], batch_size=4)
+        with pytest.raises(ValueError, match='The output of the predicate is '
+                                             'expected to be a 1-d boolean '
+                                             'mask of length 4'):
+            _ = list(source.filter(lambda x: x))
+        with pytest.raises(ValueError, match='The output of the predicate is '
+                                             'expected to be a 1-d boolean '
+                                             'mask of length 4'):
+            _ = list(source.filter(lambda x: (x > 1)[:2]))
@@ -1,3 +1,4 @@
+import time
 import unittest
 
 import numpy as np
@@ -28,3 +29,65 @@ class GatherFlowTestCase(unittest.TestCase):
             _ = DataFlow.gather([])
         with pytest.raises(TypeError, match='Not a DataFlow'):
             _ = DataFlow.gather([1])
+
+    def test_prefetch(self):
+        def slow_batches(data, batch_size, delay):
+            def gen():
+                for i in range(0, len(data), batch_size):
+                    time.sleep(delay)
+                    yield (data[i: i + batch_size],)
+            return DataFlow.iterator_factory(gen)
+
+        x_flow = slow_batches(np.arange(10), 2, .1)
+        y_flow = slow_batches(np.arange(10, 17), 2, .1)
+        flow = DataFlow.gather([x_flow, y_flow], prefetch=2)
+        self.assertEqual(2, flow.prefetch)
+        self.assertIsNone(DataFlow.gather([x_flow]).prefetch)
+
+        for _ in range(2):
+            start = time.time()
+            batches = list(flow)
+            # the two flows should be fetched concurrently
+            self.assertLess(time.time() - start, .7)
+            self.assertEqual(4, len(batches))
+            for i, (x, y) in enumerate(batches):
+                np.testing.assert_equal(np.arange(i * 2, i * 2 + 2), x)
+                np.testing.assert_equal(np.arange(10, 17)[i * 2: i * 2 + 2],
+                                        y)
+
+        # the flows should be closed when the consumer exits early
+        for _ in flow:
+            break
+        self.assertEqual(4, len(list(flow)))
+
+        # the flow with threaded children
+        x_flow = DataFlow.arrays([np.arange(10)], batch_size=4)
+        with x_flow.threaded(2) as t_flow:
+            flow = DataFlow.gather(
+                [t_flow, DataFlow.arrays([np.arange(10)], batch_size=4)],
+                prefetch=1
+            )
+            for _ in range(2):
+                batches = list(flow)
+                self.assertEqual(3, len(batches))
+                for x, y in batches:
+                    np.testing.assert_equal(x, y)
+
+    def test_prefetch_errors(self):
+        def gen():
+            yield (np.arange(2),)
+            raise ValueError('error in the flow')
+
+        flow = DataFlow.gather(
+            [DataFlow.iterator_factory(gen),
+             DataFlow.arrays([np.arange(10)], batch_size=2)],
+            prefetch=1
+        )
+        it = iter(flow)
+        np.testing.assert_equal([np.arange(2), np.arange(2)], next(it))
+        with pytest.raises(ValueError, match='error in the flow'):
+            _ = next(it)
+
+        with pytest.raises(ValueError, match='`prefetch` must be at least 1'):
+            _ = DataFlow.gather([DataFlow.arrays([np.arange(10)], 2)],
+                                prefetch=0)
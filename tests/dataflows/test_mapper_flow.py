@@ -1,9 +1,13 @@
+import copy
+import functools
 import unittest
 
 import numpy as np
 import pytest
 
-from tfsnippet.dataflows import DataFlow
+from tfsnippet.dataflows import DataFlow, MapperFlow
+from tfsnippet.dataflows.mapper_flow import _reseed_random_states
+from tfsnippet.preprocessing import BernoulliSampler
 
 
 class MapperFlowTestCase(unittest.TestCase):
@@ -99,3 +103,50 @@ class MapperFlowTestCase(unittest.TestCase):
         self.assertEqual(1, len(list(flow)))
         for b in flow:
             np.testing.assert_equal([x, z, x], b)
+
+    def test_reseed_random_states(self):
+        class Augment(object):
+            def __init__(self):
+                self.random_state = np.random.RandomState(0)
+
+            def augment(self, x):
+                return x,
+
+        def mapper(x, random_state):
+            return x,
+
+        sampler = BernoulliSampler(random_state=np.random.RandomState(0))
+        partial = functools.partial(
+            mapper, random_state=np.random.RandomState(0))
+        augment = Augment().augment
+        flows = [MapperFlow(None, sampler), MapperFlow(None, partial),
+                 MapperFlow(None, augment)]
+
+        def states(flows):
+            return [flows[0]._mapper._random_state.randint(1 << 30),
+                    flows[1]._mapper.keywords['random_state'].
+                    randint(1 << 30),
+                    flows[2]._mapper.__self__.random_state.randint(1 << 30)]
+
+        copies = [copy.deepcopy(flows) for _ in range(3)]
+        self.assertEqual(3, _reseed_random_states(copies[0], 1))
+        self.assertEqual(3, _reseed_random_states(copies[1], 1))
+        self.assertEqual(3, _reseed_random_states(copies[2], 2))
+        s0, s1, s2 = (states(c) for c in copies)
+        self.assertEqual(s0, s1)
+        self.assertNotEqual(s0, s2)
+        self.assertEqual(3, len(set(s0)))  # each state gets its own seed
+        self.assertNotEqual(states(copy.deepcopy(flows)), s0)
+
+        # the generators should be re-seeded in place
+        if hasattr(np.random, 'default_rng'):
+            rng = np.random.default_rng(0)
+            sampler = BernoulliSampler(random_state=rng)
+            self.assertEqual(1, _reseed_random_states(sampler, 1))
+            self.assertIs(rng, sampler._random_state)
+            self.assertNotEqual(np.random.default_rng(0).integers(1 << 30),
+                                rng.integers(1 << 30))
+
+        # other objects should not be walked into
+        self.assertEqual(0, _reseed_random_states(
+            [lambda x: x, np.random, {'a': np.arange(3)}], 1))
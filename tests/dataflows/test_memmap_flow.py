@@ -0,0 +1,141 @@
+import gc
+import os
+import unittest
+import weakref
+
+import numpy as np
+import pytest
+
+from tfsnippet.dataflows import DataFlow
+from tfsnippet.dataflows.memmap_flow import MemmapFlow
+from tfsnippet.utils import TemporaryDirectory
+
+
+class MemmapFlowTestCase(unittest.TestCase):
+
+    def test_npy_files(self):
+        x = np.arange(60, dtype=np.float32).reshape([20, 3])
+        y = np.arange(20, dtype=np.int64)
+
+        with TemporaryDirectory() as tempdir:
+            x_path = os.path.join(tempdir, 'x.npy')
+            y_path = os.path.join(tempdir, 'y.npy')
+            np.save(x_path, x)
+            np.save(y_path, y)
+
+            df = DataFlow.memmap([x_path, y_path], batch_size=8)
+            self.assertIsInstance(df, MemmapFlow)
+            self.assertEqual((x_path, y_path), df.paths)
+            self.assertEqual(20, df.data_length)
+            self.assertEqual(((3,), ()), df.data_shapes)
+            self.assertTrue(df.sort_indices)
+            self.assertIsNone(df.advice)
+
+            # test without shuffle
+            b = list(df)
+            self.assertEqual(3, len(b))
+            np.testing.assert_equal(np.concatenate([a[0] for a in b]), x)
+            np.testing.assert_equal(np.concatenate([a[1] for a in b]), y)
+            self.assertFalse(b[0][0].flags.writeable)
+            self.assertEqual(np.float32, b[0][0].dtype)
+
+            # test with shuffle, the indices in each batch should be sorted
+            df = DataFlow.memmap([x_path, y_path], batch_size=8,
+                                 shuffle=True, advice='random')
+            self.assertEqual('random', df.advice)
+            b = list(df)
+            for bx, by in b:
+                np.testing.assert_equal(np.sort(by), by)
+                np.testing.assert_equal(x[by], bx)
+            np.testing.assert_equal(
+                np.sort(np.concatenate([a[1] for a in b])), y)
+
+            # test with shuffle, without sorting the indices
+            df = DataFlow.memmap([y_path], batch_size=20, shuffle=True,
+                                 sort_indices=False)
+            self.assertFalse(df.sort_indices)
+            [by] = next(iter(df))
+            np.testing.assert_equal(np.sort(by), y)
+
+            # test the ring buffers and the block shuffling
+            df = DataFlow.memmap([x_path, y_path], batch_size=8,
+                                 shuffle=True, ring_buffer_size=3,
+                                 shuffle_block_size=4)
+            self.assertEqual(3, df.ring_buffer_size)
+            self.assertEqual(4, df.shuffle_block_size)
+            b = [tuple(a.copy() for a in batch) for batch in df]
+            for bx, by in b:
+                np.testing.assert_equal(x[by], bx)
+            np.testing.assert_equal(
+                np.sort(np.concatenate([a[1] for a in b])), y)
+
+    def test_npy_versions(self):
+        x = np.arange(20, dtype=np.int64)
+        with TemporaryDirectory() as tempdir:
+            for version in [(1, 0), (2, 0), (3, 0)]:
+                path = os.path.join(tempdir, 'x{}.npy'.format(version[0]))
+                with open(path, 'wb') as f:
+                    np.lib.format.write_array(f, x, version=version)
+                df = DataFlow.memmap([path], batch_size=8)
+                np.testing.assert_equal(
+                    np.concatenate([a[0] for a in df]), x)
+                df.close()
+
+    def test_close(self):
+        x = np.arange(20, dtype=np.int64)
+        with TemporaryDirectory() as tempdir:
+            path = os.path.join(tempdir, 'x.npy')
+            np.save(path, x)
+            df = DataFlow.memmap([path], batch_size=8)
+            mm_ref = weakref.ref(df._mmaps[0])
+            b = [a[0] for a in df]
+            np.testing.assert_equal(np.concatenate(b), x)
+
+            # the memory map is still referenced by the mini-batches
+            df.close()
+            gc.collect()
+            self.assertIsNotNone(mm_ref())
+            np.testing.assert_equal(np.concatenate(b), x)
+            with pytest.raises(RuntimeError,
+                               match='The memory maps of MemmapFlow have '
+                                     'been closed'):
+                _ = list(df)
+            df.close()  # closing twice should cause no error
+
+            # the memory map is released along with the mini-batches
+            del b
+            gc.collect()
+            self.assertIsNone(mm_ref())
+
+    def test_raw_files(self):
+        x = np.arange(60, dtype=np.float32).reshape([20, 3])
+        y = np.arange(20, dtype=np.int64)
+
+        with TemporaryDirectory() as tempdir:
+            x_path = os.path.join(tempdir, 'x.bin')
+            y_path = os.path.join(tempdir, 'y.bin')
+            x.tofile(x_path)
+            y.tofile(y_path)
+
+            df = DataFlow.memmap([x_path, y_path], batch_size=8,
+                                 dtypes=[np.float32, np.int64],
+                                 shapes=[(3,), ()])
+            self.assertEqual(20, df.data_length)
+            self.assertEqual(((3,), ()), df.data_shapes)
+            b = list(df)
+            np.testing.assert_equal(np.concatenate([a[0] for a in b]), x)
+            np.testing.assert_equal(np.concatenate([a[1] for a in b]), y)
+
+            # test errors
+            with pytest.raises(ValueError, match='is not a multiple of the '
+                                                 'item size 28'):
+                _ = MemmapFlow([x_path], batch_size=8, dtypes=[np.float32],
+                               shapes=[(7,)])
+            with pytest.raises(ValueError, match='The number of `dtypes` and '
+                                                 '`shapes` must match'):
+                _ = MemmapFlow([x_path, y_path], batch_size=8,
+                               dtypes=[np.float32])
+            with pytest.raises(ValueError,
+                               match='Invalid value for argument `advice`'):
+                _ = MemmapFlow([y_path], batch_size=8, dtypes=[np.int64],
+                               advice='unknown')
@@ -0,0 +1,180 @@
+import os
+import unittest
+
+import numpy as np
+import pytest
+
+from tfsnippet.dataflows import DataFlow
+from tfsnippet.dataflows.multiprocess_flow import MultiprocessFlow
+from tfsnippet.preprocessing import BernoulliSampler
+
+
+class _MyError(Exception):
+    pass
+
+
+class MultiprocessFlowTestCase(unittest.TestCase):
+
+    def test_errors(self):
+        source = DataFlow.arrays([np.arange(10)], batch_size=2)
+        with pytest.raises(ValueError, match='`workers` must be at least 1'):
+            _ = MultiprocessFlow(source, workers=0, prefetch=1)
+        with pytest.raises(ValueError, match='`prefetch` must be at least 1'):
+            _ = MultiprocessFlow(source, workers=1, prefetch=0)
+
+    def test_multiprocess(self):
+        flow = DataFlow.arrays([np.arange(10)], batch_size=2). \
+            multiprocess(workers=2, prefetch=3)
+        self.assertIsInstance(flow, MultiprocessFlow)
+        self.assertEqual(2, flow.workers_num)
+        self.assertEqual(3, flow.prefetch_num)
+
+        # only the mappers, not the data source, are sent to the workers
+        def mapper(x):
+            return x + 1,
+
+        source = DataFlow.arrays([np.arange(10)], batch_size=2)
+        flow = source.map(mapper, array_indices=0).multiprocess(1, 1)
+        self.assertEqual(1, len(flow._mappers))
+        self.assertIsNone(flow._mappers[0].source)
+        self.assertIs(mapper, flow._mappers[0]._mapper)
+        self.assertEqual((0,), flow._mappers[0].array_indices)
+
+    def test_iterator(self):
+        x = np.arange(100, dtype=np.float32).reshape([50, 2])
+        source = DataFlow.arrays([x, np.arange(50)], batch_size=8)
+        mapped = source. \
+            map(lambda x, y: (x * 2, y, np.asarray(os.getpid()))). \
+            map(lambda x, y, pid: (x + 1, y, pid))
+
+        with mapped.multiprocess(workers=3, prefetch=4) as flow:
+            for epoch in range(3):
+                batches = list(flow)
+                self.assertEqual(7, len(batches))
+                np.testing.assert_equal(
+                    np.concatenate([b[0] for b in batches]), x * 2 + 1)
+                np.testing.assert_equal(
+                    np.concatenate([b[1] for b in batches]), np.arange(50))
+                self.assertEqual(np.float32, batches[0][0].dtype)
+                for b in batches:
+                    self.assertNotEqual(os.getpid(), int(b[2]))
+
+            # carry out an incomplete epoch by break
+            for b in flow:
+                np.testing.assert_equal(b[1], np.arange(8))
+                break
+
+            # verify that the next epoch starts from the beginning
+            batches = list(flow)
+            np.testing.assert_equal(
+                np.concatenate([b[1] for b in batches]), np.arange(50))
+
+            # carry out an incomplete epoch by error
+            try:
+                for _ in flow:
+                    raise _MyError()
+            except _MyError:
+                pass
+
+            batches = list(flow)
+            np.testing.assert_equal(
+                np.concatenate([b[1] for b in batches]), np.arange(50))
+
+    def test_shuffled_source(self):
+        source = DataFlow.arrays([np.arange(50)], batch_size=8, shuffle=True)
+        flow = source.map(lambda x: (x * 10,)).multiprocess(2, 2)
+        try:
+            epochs = [np.concatenate([b[0] for b in flow]) for _ in range(2)]
+            for e in epochs:
+                np.testing.assert_equal(np.sort(e), np.arange(50) * 10)
+            self.assertFalse(np.all(epochs[0] == epochs[1]))
+        finally:
+            flow.close()
+
+    def test_reseed_mappers(self):
+        # each worker should draw different random numbers by the mapper
+        x = np.full([8, 1000], .5, dtype=np.float32)
+        sampler = BernoulliSampler(random_state=np.random.RandomState(0))
+        flow = DataFlow.arrays([x], batch_size=1).map(sampler). \
+            multiprocess(workers=4, prefetch=4)
+        try:
+            batches = [b[0].tobytes() for b in flow]
+            self.assertEqual(8, len(set(batches)))
+        finally:
+            flow.close()
+
+    def test_source_error(self):
+        def make_iterator():
+            yield (np.arange(2),)
+            raise _MyError('source failed')
+
+        flow = DataFlow.iterator_factory(make_iterator). \
+            map(lambda x: (x,)).multiprocess(2, 2)
+        try:
+            with pytest.raises(RuntimeError, match='source failed'):
+                _ = list(flow)
+            # the feeder has exited, so the next epochs should fail fast
+            for _ in range(2):
+                with pytest.raises(RuntimeError,
+                                   match='The feeder of MultiprocessFlow '
+                                         'has exited because of an error in '
+                                         'the source flow'):
+                    _ = list(flow)
+
+            # closing the flow should restart the feeder
+            flow.close()
+            with pytest.raises(RuntimeError, match='source failed'):
+                _ = list(flow)
+        finally:
+            flow.close()
+
+    def test_worker_error(self):
+        def mapper(x):
+            if x[0] == 4:
+                raise _MyError('mapper failed')
+            return x,
+
+        flow = DataFlow.arrays([np.arange(10)], batch_size=2). \
+            map(mapper).multiprocess(2, 2)
+        try:
+            with pytest.raises(RuntimeError, match='mapper failed'):
+                _ = list(flow)
+        finally:
+            flow.close()
+
+    def test_growing_batches(self):
+        # the shared slots should grow with the mini-batches, while the
+        # mapper returns views of the input in the shared memory
+        sizes = [1, 1000, 0, 10, 100000]
+        source = DataFlow.iterator_factory(
+            lambda: ((np.arange(n, dtype=np.int64),) for n in sizes))
+        with source.map(lambda x: (x,)).multiprocess(1, 1) as flow:
+            for _ in range(2):
+                batches = [b[0] for b in flow]
+                self.assertEqual(sizes, [len(b) for b in batches])
+                for n, b in zip(sizes, batches):
+                    np.testing.assert_equal(np.arange(n), b)
+
+    def test_object_arrays(self):
+        flow = DataFlow.arrays([np.array(['a', 1], dtype=object)],
+                               batch_size=2).map(lambda x: (x,)). \
+            multiprocess(1, 1)
+        try:
+            with pytest.raises(RuntimeError,
+                               match='Arrays of object dtype cannot be '
+                                     'passed through shared memory'):
+                _ = list(flow)
+        finally:
+            flow.close()
+
+    def test_auto_init(self):
+        flow = DataFlow.seq(0, 10, batch_size=4).map(lambda x: (x + 1,)). \
+            multiprocess(workers=1, prefetch=1)
+
+        batches = [b[0] for b in flow]
+        np.testing.assert_equal([[1, 2, 3, 4], [5, 6, 7, 8], [9, 10]], batches)
+        flow.close()
+
+        batches = [b[0] for b in flow]
+        np.testing.assert_equal([[1, 2, 3, 4], [5, 6, 7, 8], [9, 10]], batches)
+        flow.close()
@@ -0,0 +1,184 @@
+import os
+import threading
+import time
+import unittest
+
+import numpy as np
+import pytest
+import six
+
+from tfsnippet.dataflows import DataFlow
+from tfsnippet.dataflows.parallel_mapper_flow import ParallelMapperFlow
+from tfsnippet.preprocessing import BernoulliSampler
+
+
+class _MyError(Exception):
+    pass
+
+
+class ParallelMapperFlowTestCase(unittest.TestCase):
+
+    def test_errors(self):
+        source = DataFlow.arrays([np.arange(10)], batch_size=2)
+        with pytest.raises(ValueError, match='`workers` must be at least 1'):
+            _ = ParallelMapperFlow(source, lambda x: (x,), workers=0)
+        with pytest.raises(ValueError, match='`prefetch` must be at least 1'):
+            _ = ParallelMapperFlow(source, lambda x: (x,), workers=1,
+                                   prefetch=0)
+        with pytest.raises(ValueError,
+                           match='Invalid value for argument `backend`'):
+            _ = ParallelMapperFlow(source, lambda x: (x,), backend='gpu')
+
+    def test_map(self):
+        source = DataFlow.arrays([np.arange(10)], batch_size=2)
+        df = source.map(lambda x: (x,), workers=3)
+        self.assertIsInstance(df, ParallelMapperFlow)
+        self.assertIs(df.source, source)
+        self.assertEqual(3, df.workers_num)
+        self.assertEqual(6, df.prefetch_num)
+        self.assertTrue(df.ordered)
+        self.assertEqual('thread', df.backend)
+
+        df = source.map(lambda x: (x,), workers=2, ordered=False,
+                        backend='process', prefetch=3)
+        self.assertEqual(2, df.workers_num)
+        self.assertEqual(3, df.prefetch_num)
+        self.assertFalse(df.ordered)
+        self.assertEqual('process', df.backend)
+
+    def test_ordered(self):
+        source = DataFlow.arrays(
+            [np.arange(50), np.arange(50, 100)], batch_size=4)
+
+        def mapper(x):
+            # let the earlier mini-batches finish later
+            time.sleep(0.01 * (x[0] % 3))
+            return x * 2,
+
+        for backend in ('thread', 'process'):
+            with source.map(mapper, array_indices=1, workers=3,
+                            backend=backend) as df:
+                for _ in range(2):
+                    b = list(df)
+                    self.assertEqual(13, len(b))
+                    np.testing.assert_equal(
+                        np.concatenate([a[0] for a in b]), np.arange(50))
+                    np.testing.assert_equal(
+                        np.concatenate([a[1] for a in b]),
+                        np.arange(50, 100) * 2
+                    )
+
+    def test_unordered(self):
+        source = DataFlow.arrays([np.arange(50)], batch_size=4)
+        thread_ids = set()
+
+        def mapper(x):
+            thread_ids.add(threading.current_thread().ident)
+            time.sleep(0.01 * (x[0] % 3))
+            return x, np.asarray(os.getpid())
+
+        with source.map(mapper, workers=3, ordered=False) as df:
+            b = list(df)
+            np.testing.assert_equal(
+                np.sort(np.concatenate([a[0] for a in b])), np.arange(50))
+            self.assertGreater(len(thread_ids), 1)
+            self.assertEqual(os.getpid(), b[0][1])
+
+        with source.map(mapper, workers=3, ordered=False,
+                        backend='process') as df:
+            b = list(df)
+            np.testing.assert_equal(
+                np.sort(np.concatenate([a[0] for a in b])), np.arange(50))
+            self.assertNotEqual(os.getpid(), b[0][1])
+
+    def test_interrupted_epoch(self):
+        source = DataFlow.arrays([np.arange(50)], batch_size=4)
+        df = source.map(lambda x: (x + 1,), workers=2)
+        try:
+            for [a] in df:
+                np.testing.assert_equal(np.arange(1, 5), a)
+                break
+            b = list(df)
+            np.testing.assert_equal(
+                np.concatenate([a[0] for a in b]), np.arange(1, 51))
+        finally:
+            df.close()
+
+    def test_mapper_error(self):
+        def mapper(x):
+            if x[0] == 4:
+                raise _MyError('mapper failed')
+            return x,
+
+        source = DataFlow.arrays([np.arange(10)], batch_size=2)
+        for backend in ('thread', 'process'):
+            df = source.map(mapper, workers=2, backend=backend)
+            try:
+                with pytest.raises(RuntimeError,
+                                   match='Error in ParallelMapperFlow') as e:
+                    _ = list(df)
+                # the traceback from the worker should be reported
+                self.assertIn('raise _MyError', str(e.value))
+                self.assertIn('_MyError: mapper failed', str(e.value))
+                if not six.PY2:
+                    self.assertIsInstance(e.value.__cause__, _MyError)
+            finally:
+                df.close()
+
+    def test_reseed_mapper(self):
+        # each process worker should draw different random numbers
+        x = np.full([8, 1000], .5, dtype=np.float32)
+        sampler = BernoulliSampler(random_state=np.random.RandomState(0))
+        df = DataFlow.arrays([x], batch_size=1). \
+            map(sampler, workers=4, backend='process', prefetch=8)
+        try:
+            batches = [b[0].tobytes() for b in df]
+            self.assertEqual(8, len(set(batches)))
+        finally:
+            df.close()
+
+    def test_unpicklable_batch(self):
+        source = DataFlow.iterator_factory(
+            lambda: iter([(np.arange(2),), (threading.Lock(),)]))
+        for ordered in (True, False):
+            df = source.map(lambda x: (x,), workers=1, ordered=ordered,
+                            backend='process')
+            try:
+                with pytest.raises(Exception, match='pickle'):
+                    _ = list(df)
+            finally:
+                df.close()
+
+    def test_unpicklable_result(self):
+        def mapper(x):
+            if x[0] == 4:
+                return threading.Lock(),
+            return x,
+
+        source = DataFlow.arrays([np.arange(10)], batch_size=2)
+        for ordered in (True, False):
+            df = source.map(mapper, workers=2, ordered=ordered,
+                            backend='process')
+            try:
+                with pytest.raises(Exception, match='pickle'):
+                    _ = list(df)
+            finally:
+                df.close()
+
+    def test_worker_died(self):
+        def mapper(x):
+            if x[0] == 4:
+                os._exit(1)
+            return x,
+
+        for ordered in (True, False):
+            df = DataFlow.arrays([np.arange(10)], batch_size=2). \
+                map(mapper, workers=2, ordered=ordered, backend='process')
+            try:
+                with pytest.raises(RuntimeError,
+                                   match='A worker process of '
+                                         'ParallelMapperFlow exited '
+                                         'unexpectedly'):
+                    _ = list(df)
+            finally:
+                df.close()
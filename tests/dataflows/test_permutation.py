@@ -0,0 +1,42 @@
+import unittest
+
+import numpy as np
+import pytest
+
+from tfsnippet.dataflows import FeistelPermutation
+
+
+class FeistelPermutationTestCase(unittest.TestCase):
+
+    def test_permutation(self):
+        for length in (0, 1, 2, 3, 10, 17, 1000, 4097):
+            perm = FeistelPermutation(length, seed=1234)
+            self.assertEqual(length, len(perm))
+            self.assertEqual(length, perm.length)
+            self.assertEqual(1234, perm.seed)
+            self.assertEqual(0, perm.epoch)
+            arr = perm.to_array()
+            self.assertEqual(np.int64, arr.dtype)
+            np.testing.assert_equal(np.arange(length), np.sort(arr))
+
+        # the permutation of any positions should match the whole one
+        perm = FeistelPermutation(1000, seed=1234, epoch=3)
+        arr = perm.to_array()
+        positions = np.asarray([[999, 0], [500, 3]], dtype=np.int32)
+        np.testing.assert_equal(arr[positions], perm(positions))
+        np.testing.assert_equal(arr[10:20], perm(np.arange(10, 20)))
+
+        # the permutation should be random, and determined by (seed, epoch)
+        self.assertFalse(np.all(arr == np.arange(1000)))
+        self.assertLess(abs(np.corrcoef(np.arange(1000), arr)[0, 1]), .1)
+        np.testing.assert_equal(
+            arr, FeistelPermutation(1000, seed=1234, epoch=3).to_array())
+        for seed, epoch in [(1234, 4), (1235, 3)]:
+            self.assertFalse(np.all(arr == FeistelPermutation(
+                1000, seed=seed, epoch=epoch).to_array()))
+
+    def test_errors(self):
+        with pytest.raises(ValueError, match='`length` must be non-negative'):
+            _ = FeistelPermutation(-1, seed=1)
+        with pytest.raises(ValueError, match='`rounds` must be at least 1'):
+            _ = FeistelPermutation(10, seed=1, rounds=0)
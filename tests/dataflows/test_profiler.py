@@ -0,0 +1,79 @@
+import time
+import unittest
+
+import numpy as np
+import pytest
+
+from tfsnippet.dataflows import DataFlow, DataFlowProfiler
+
+
+class DataFlowProfilerTestCase(unittest.TestCase):
+
+    def test_stages(self):
+        x_flow = DataFlow.arrays([np.arange(10)], batch_size=4)
+        y_flow = DataFlow.arrays([np.arange(10)], batch_size=4)
+        m_flow = DataFlow.gather([x_flow, y_flow]).map(lambda x, y: (x + y,))
+        flow = m_flow.threaded(2)
+        profiler = DataFlowProfiler(flow)
+        self.assertIs(flow, profiler.flow)
+        self.assertEqual((flow, m_flow, m_flow.source, x_flow, y_flow),
+                         profiler.stages)
+        self.assertEqual(('0_threading_flow', '1_mapper_flow',
+                          '2_gather_flow', '3_array_flow', '4_array_flow'),
+                         profiler.stage_names)
+
+        with pytest.raises(TypeError, match='Not a DataFlow'):
+            _ = DataFlowProfiler(object())
+
+    def test_metrics(self):
+        def mapper(x):
+            time.sleep(0.02)
+            return x * 2,
+
+        source = DataFlow.arrays([np.arange(10, dtype=np.int64)],
+                                 batch_size=5)
+        flow = source.map(mapper)
+
+        with DataFlowProfiler(flow, prefix='df_') as profiler:
+            b = []
+            for batch in flow:
+                b.append(batch)
+                time.sleep(0.01)
+            np.testing.assert_equal(
+                np.arange(10) * 2, np.concatenate([a[0] for a in b]))
+            metrics = profiler.get_metrics()
+
+        self.assertEqual(
+            ['df_0_mapper_flow_time', 'df_0_mapper_flow_bytes',
+             'df_1_array_flow_time', 'df_1_array_flow_bytes',
+             'df_wait_time', 'df_consumer_time'],
+            list(metrics)
+        )
+        self.assertGreater(metrics['df_0_mapper_flow_time'], 0.015)
+        self.assertLess(metrics['df_1_array_flow_time'], 0.015)
+        self.assertEqual(40., metrics['df_0_mapper_flow_bytes'])
+        self.assertEqual(40., metrics['df_1_array_flow_bytes'])
+        self.assertGreater(metrics['df_wait_time'],
+                           metrics['df_0_mapper_flow_time'])
+        self.assertGreater(metrics['df_consumer_time'], 0.005)
+
+        # the statistics should have been reset
+        self.assertEqual({}, profiler.get_metrics())
+
+        # the profiler should have been uninstalled
+        self.assertNotIn('_minibatch_iterator', flow.__dict__)
+        self.assertNotIn('_minibatch_iterator', source.__dict__)
+        _ = list(flow)
+        self.assertEqual({}, profiler.get_metrics())
+
+    def test_threaded(self):
+        source = DataFlow.arrays([np.arange(100)], batch_size=10)
+        with source.threaded(3) as flow:
+            with DataFlowProfiler(flow) as profiler:
+                for _ in flow:
+                    time.sleep(0.01)
+                metrics = profiler.get_metrics(reset=False)
+        self.assertIn('flow_0_threading_flow_queue_size', metrics)
+        self.assertGreater(metrics['flow_0_threading_flow_queue_size'], 1.)
+        self.assertEqual(10, profiler.get_metrics()['flow_1_array_flow_bytes']
+                         / np.dtype(source.the_arrays[0].dtype).itemsize)
@@ -0,0 +1,101 @@
+import unittest
+
+import numpy as np
+import pytest
+
+from tfsnippet.dataflows import DataFlow
+from tfsnippet.dataflows.rebatch_flow import RebatchFlow
+
+
+class RebatchFlowTestCase(unittest.TestCase):
+
+    def test_props(self):
+        source = DataFlow.arrays([np.arange(10)], batch_size=4)
+        df = source.rebatch(3)
+        self.assertIsInstance(df, RebatchFlow)
+        self.assertIs(source, df.source)
+        self.assertEqual(3, df.batch_size)
+        self.assertFalse(df.skip_incomplete)
+        self.assertIsNone(df.ring_buffer_size)
+        self.assertTrue(source.rebatch(3, skip_incomplete=True).
+                        skip_incomplete)
+        self.assertEqual(
+            2, source.rebatch(3, ring_buffer_size=2).ring_buffer_size)
+
+        with pytest.raises(ValueError,
+                           match='`batch_size` must be at least 1'):
+            _ = source.rebatch(0)
+        with pytest.raises(ValueError,
+                           match='`ring_buffer_size` must be at least 1'):
+            _ = source.rebatch(3, ring_buffer_size=0)
+
+    def test_rebatch(self):
+        x = np.arange(50)
+        y = np.arange(100).reshape([50, 2])
+
+        # filter the mini-batches into odd sizes
+        source = DataFlow.arrays([x, y], batch_size=7). \
+            map(lambda x, y: (x[x % 3 != 0], y[x % 3 != 0]))
+        mask = x % 3 != 0
+
+        for batch_size in (1, 4, 5, 20, 100):
+            b = list(source.rebatch(batch_size))
+            sizes = [len(a[0]) for a in b]
+            self.assertTrue(all(s == batch_size for s in sizes[:-1]))
+            self.assertEqual(33, sum(sizes))
+            np.testing.assert_equal(
+                x[mask], np.concatenate([a[0] for a in b]))
+            np.testing.assert_equal(
+                y[mask], np.concatenate([a[1] for a in b]))
+
+            b = list(source.rebatch(batch_size, skip_incomplete=True))
+            self.assertEqual(33 // batch_size, len(b))
+            self.assertTrue(all(len(a[0]) == batch_size for a in b))
+
+    def test_views(self):
+        x = np.arange(20)
+        b = list(DataFlow.arrays([x], batch_size=8).rebatch(4))
+        self.assertEqual(5, len(b))
+        # the mini-batches lying in one source mini-batch should be views
+        for i in (0, 1, 2, 3):
+            self.assertTrue(np.may_share_memory(x, b[i][0]))
+        np.testing.assert_equal(x, np.concatenate([a[0] for a in b]))
+
+        b = list(DataFlow.arrays([x], batch_size=3).rebatch(4))
+        self.assertFalse(np.may_share_memory(x, b[0][0]))
+        np.testing.assert_equal(x, np.concatenate([a[0] for a in b]))
+
+    def test_ring_buffers(self):
+        x = np.arange(50)
+        y = np.arange(100).reshape([50, 2])
+        source = DataFlow.arrays([x, y], batch_size=7)
+        df = source.rebatch(4, ring_buffer_size=2)
+
+        for epoch in range(2):
+            b = [tuple(a.copy() for a in batch) for batch in df]
+            np.testing.assert_equal(x, np.concatenate([a[0] for a in b]))
+            np.testing.assert_equal(y, np.concatenate([a[1] for a in b]))
+
+        # the stitched mini-batches should reuse the read-only buffers
+        self.assertEqual(2, len(df._ring_buffers))
+        buffers = [a[0] for a in df._ring_buffers]
+        stitched = []
+        for batch in df:
+            self.assertFalse(batch[0].flags.writeable)
+            if not np.may_share_memory(batch[0], x):
+                self.assertTrue(any(np.may_share_memory(batch[0], buf)
+                                    for buf in buffers))
+                stitched.append(batch[0])
+        self.assertGreater(len(stitched), 2)
+
+        # the buffers should be re-allocated if the arrays change
+        source = DataFlow.iterator_factory(lambda: iter([
+            (np.arange(3, dtype=np.int64),),
+            (np.arange(3, dtype=np.float32),),
+            (np.arange(3, dtype=np.float32),),
+        ]))
+        b = [a[0] for a in source.rebatch(2, ring_buffer_size=1)]
+        # the first stitched mini-batch follows the dtype of its first chunk
+        self.assertEqual(np.int64, b[1].dtype)
+        np.testing.assert_equal([2], b[-1])
+        self.assertEqual(np.float32, b[-1].dtype)
@@ -0,0 +1,200 @@
+import unittest
+
+import numpy as np
+import pytest
+
+from tfsnippet.dataflows import DataFlow
+from tfsnippet.dataflows.sampling_flow import (WeightedSamplingFlow,
+                                               StratifiedSamplingFlow,
+                                               _allocate_counts)
+
+
+class WeightedSamplingFlowTestCase(unittest.TestCase):
+
+    def test_props(self):
+        x = np.arange(10)
+        w = np.arange(10, dtype=np.float32)
+        df = DataFlow.weighted([x], w, batch_size=4)
+        self.assertIsInstance(df, WeightedSamplingFlow)
+        np.testing.assert_equal(w, df.weights)
+        self.assertTrue(df.replacement)
+        self.assertEqual(10, df.epoch_size)
+        self.assertTrue(df.is_shuffled)
+
+        df = DataFlow.weighted([x], w, batch_size=4, replacement=False,
+                               epoch_size=9)
+        self.assertFalse(df.replacement)
+        self.assertEqual(9, df.epoch_size)
+
+    def test_errors(self):
+        x = np.arange(10)
+        with pytest.raises(ValueError, match='`weights` must be a 1-d array '
+                                             'with the same data length'):
+            _ = WeightedSamplingFlow([x], np.ones(9), 4)
+        with pytest.raises(ValueError, match='`weights` must be finite and '
+                                             'non-negative'):
+            _ = WeightedSamplingFlow([x], -np.ones(10), 4)
+        with pytest.raises(ValueError, match='`weights` must have at least '
+                                             'one non-zero element'):
+            _ = WeightedSamplingFlow([x], np.zeros(10), 4)
+        with pytest.raises(ValueError, match='`epoch_size` must not exceed '
+                                             'the number of items with '
+                                             'non-zero weights, when sampling '
+                                             'without replacement: 10 vs 9'):
+            _ = WeightedSamplingFlow([x], np.arange(10), 4,
+                                     replacement=False)
+
+    def test_with_replacement(self):
+        x = np.arange(4)
+        w = np.asarray([0., 1., 2., 7.])
+        df = DataFlow.weighted([x], w, batch_size=1000, epoch_size=100000,
+                               random_state=np.random.RandomState(1234))
+        b = list(df)
+        self.assertEqual(100, len(b))
+        freq = np.bincount(np.concatenate([a[0] for a in b]), minlength=4)
+        np.testing.assert_allclose(w / 10., freq / 100000., atol=0.01)
+        self.assertEqual(0, freq[0])
+
+        # test skip incomplete
+        df = DataFlow.weighted([x], w, batch_size=3, epoch_size=10,
+                               skip_incomplete=True)
+        self.assertEqual([3, 3, 3], [len(a[0]) for a in df])
+
+    def test_without_replacement(self):
+        x = np.arange(10)
+        w = np.asarray([0., 1., 1., 1., 1., 1., 1., 1., 100., 100.])
+        df = DataFlow.weighted([x], w, batch_size=4, replacement=False,
+                               epoch_size=9)
+        epochs = []
+        for _ in range(50):
+            b = np.concatenate([a[0] for a in df])
+            np.testing.assert_equal(np.arange(1, 10), np.sort(b))
+            epochs.append(b)
+        # the sampled items should be shuffled
+        self.assertGreater(len(set(tuple(b) for b in epochs)), 40)
+
+        df = DataFlow.weighted([x], w, batch_size=4, replacement=False,
+                               epoch_size=3)
+        samples = []
+        for _ in range(50):
+            b = np.concatenate([a[0] for a in df])
+            self.assertEqual(3, len(np.unique(b)))
+            self.assertNotIn(0, b)
+            samples.append(set(b))
+        # the heavy items should mostly be sampled
+        self.assertGreater(sum({8, 9} <= s for s in samples), 40)
+
+    def test_state(self):
+        x = np.arange(100)
+        df = DataFlow.weighted([x], np.arange(100), batch_size=8)
+        self.assertEqual(0, df.get_state()['epoch'])
+        it = iter(df)
+        _ = next(it)
+        state = df.get_state()
+        self.assertEqual(0, state['epoch'])
+        self.assertEqual(1, state['batch_cursor'])
+        expected = [a[0] for a in it]
+        self.assertEqual(1, df.get_state()['epoch'])
+
+        df2 = DataFlow.weighted([x], np.arange(100), batch_size=8)
+        df2.set_state(state)
+        np.testing.assert_equal(expected, [a[0] for a in df2])
+        self.assertEqual(df.get_state()['epoch'], df2.get_state()['epoch'])
+        np.testing.assert_equal([a[0] for a in df], [a[0] for a in df2])
+
+
+class StratifiedSamplingFlowTestCase(unittest.TestCase):
+
+    def test_allocate_counts(self):
+        np.testing.assert_equal(
+            [3, 3, 4], _allocate_counts(10, np.asarray([.3, .3, .4])))
+        np.testing.assert_equal(
+            [4, 3, 3], _allocate_counts(10, np.asarray([1., 1., 1.]) / 3))
+        np.testing.assert_equal(
+            [0, 1], _allocate_counts(1, np.asarray([.4, .6])))
+        np.testing.assert_equal(
+            [0, 0], _allocate_counts(0, np.asarray([.4, .6])))
+
+    def test_props(self):
+        x = np.arange(10)
+        y = np.asarray([2, 2, 2, 2, 2, 2, 5, 5, 5, 7])
+        df = DataFlow.stratified([x], y, batch_size=4)
+        self.assertIsInstance(df, StratifiedSamplingFlow)
+        np.testing.assert_equal(y, df.labels)
+        np.testing.assert_equal([2, 5, 7], df.classes)
+        self.assertEqual((6, 3, 1), df.class_sizes)
+        np.testing.assert_allclose([.6, .3, .1], df.class_proportions)
+        self.assertEqual(10, df.epoch_size)
+
+        df = DataFlow.stratified([x], y, batch_size=4, epoch_size=20,
+                                 proportions={5: 1, 7: 1})
+        np.testing.assert_allclose([0., .5, .5], df.class_proportions)
+        self.assertEqual(20, df.epoch_size)
+
+    def test_errors(self):
+        x = np.arange(10)
+        y = np.arange(10) % 2
+        with pytest.raises(ValueError, match='`labels` must be a 1-d array '
+                                             'with the same data length'):
+            _ = StratifiedSamplingFlow([x], y[:9], 4)
+        with pytest.raises(ValueError, match='Class 3 in `proportions` does '
+                                             'not exist in `labels`'):
+            _ = StratifiedSamplingFlow([x], y, 4, proportions={3: 1.})
+        with pytest.raises(ValueError, match='`proportions` must be finite '
+                                             'and non-negative'):
+            _ = StratifiedSamplingFlow([x], y, 4, proportions={0: -1.})
+        with pytest.raises(ValueError, match='`proportions` must be finite '
+                                             'and non-negative'):
+            _ = StratifiedSamplingFlow([x], y, 4, proportions={0: 0.})
+
+    def test_sampling(self):
+        x = np.arange(1000)
+        y = (np.arange(1000) < 50).astype(np.int32)  # 50 positive samples
+
+        for ring_buffer_size in (None, 3):
+            df = DataFlow.stratified(
+                [x, y], y, batch_size=10, proportions={0: .7, 1: .3},
+                epoch_size=205, ring_buffer_size=ring_buffer_size
+            )
+            for _ in range(2):
+                b = [(bx.copy(), by.copy()) for bx, by in df]
+                self.assertEqual([10] * 20 + [5], [len(a[0]) for a in b])
+                for bx, by in b[:-1]:
+                    np.testing.assert_equal(y[bx], by)
+                    self.assertEqual(3, np.sum(by))
+                # 3.5 vs 1.5, the tie is broken by the class order
+                self.assertEqual(1, np.sum(b[-1][1]))
+
+                # the positive samples are drawn from repeated permutations
+                pos = np.concatenate([bx[by == 1] for bx, by in b])
+                self.assertEqual(61, len(pos))
+                self.assertEqual(48, len(np.unique(pos[:48])))
+                self.assertEqual(50, len(np.unique(pos)))
+
+            # test skip incomplete
+            df = DataFlow.stratified([x], y, batch_size=10, epoch_size=205,
+                                     skip_incomplete=True)
+            b = list(df)
+            self.assertEqual([10] * 20, [len(a[0]) for a in b])
+            # the proportions of the data: 0.95 vs 0.05 -> 9.5 vs 0.5
+            self.assertTrue(all(np.sum(a[0] < 50) in (0, 1) for a in b))
+
+    def test_state(self):
+        x = np.arange(100)
+        y = x % 3
+        df = DataFlow.stratified([x], y, batch_size=6)
+        _ = list(df)
+        self.assertEqual(1, df.get_state()['epoch'])
+        it = iter(df)
+        _ = next(it)
+        state = df.get_state()
+        self.assertEqual(1, state['epoch'])
+        self.assertEqual(1, state['batch_cursor'])
+        expected = [a[0] for a in it]
+        self.assertEqual(2, df.get_state()['epoch'])
+
+        df2 = DataFlow.stratified([x], y, batch_size=6)
+        df2.set_state(state)
+        np.testing.assert_equal(expected, [a[0] for a in df2])
+        self.assertEqual(df.get_state()['epoch'], df2.get_state()['epoch'])
+        np.testing.assert_equal([a[0] for a in df], [a[0] for a in df2])
@@ -0,0 +1,246 @@
+import unittest
+
+import numpy as np
+import pytest
+
+from tfsnippet.dataflows import DataFlow, SeqFlow
+from tfsnippet.dataflows.sharded_flow import ShardedArrayFlow
+
+
+class ShardedArrayFlowTestCase(unittest.TestCase):
+
+    def test_shard(self):
+        x = np.arange(20).reshape([10, 2])
+        df = DataFlow.arrays([x], batch_size=3, shuffle=True,
+                             skip_incomplete=True).shard(4, 1, seed=123)
+        self.assertIsInstance(df, ShardedArrayFlow)
+        self.assertEqual(4, df.num_shards)
+        self.assertEqual(1, df.shard_index)
+        self.assertEqual(123, df.seed)
+        self.assertEqual('pad', df.tail)
+        self.assertEqual(10, df.total_length)
+        self.assertEqual(3, df.data_length)
+        self.assertEqual(((2,),), df.data_shapes)
+        self.assertEqual(3, df.batch_size)
+        self.assertTrue(df.is_shuffled)
+        self.assertTrue(df.skip_incomplete)
+
+        df = DataFlow.seq(0, 10, batch_size=3, shuffle=True). \
+            shard(4, 0, seed=123, tail='drop')
+        self.assertIsInstance(df, ShardedArrayFlow)
+        self.assertEqual(2, df.data_length)
+        self.assertTrue(df.is_shuffled)
+        df = DataFlow.seq(0, 10, batch_size=3).shard(4, 0)
+        self.assertIsInstance(df, ShardedArrayFlow)
+        self.assertEqual(3, df.data_length)
+        self.assertFalse(df.is_shuffled)
+        self.assertIsNone(df.seed)
+
+    def test_seq_shard(self):
+        # the unshuffled shards without padding should be sub-ranges
+        seq = DataFlow.seq(3, 43, step=2, batch_size=3, skip_incomplete=True,
+                           dtype=np.int64)
+        for tail in ('pad', 'drop'):
+            for num_shards in (4, 3):
+                for i in range(num_shards):
+                    df = seq.shard(num_shards, i, tail=tail)
+                    expected = DataFlow.arrays(
+                        [np.arange(3, 43, 2)], batch_size=3,
+                        skip_incomplete=True).shard(num_shards, i, tail=tail)
+                    if tail == 'pad' and num_shards == 3:
+                        self.assertIsInstance(df, ShardedArrayFlow)
+                    else:
+                        self.assertIsInstance(df, SeqFlow)
+                        self.assertEqual(2, df.step)
+                        self.assertEqual(3, df.batch_size)
+                        self.assertTrue(df.skip_incomplete)
+                        self.assertEqual(np.int64, df.the_arrays[0].dtype)
+                    np.testing.assert_equal(list(expected), list(df))
+
+        with pytest.raises(ValueError, match=r'`shard_index` must be in the '
+                                             r'range \[0, 2\): got 2'):
+            _ = seq.shard(2, 2)
+
+    def test_errors(self):
+        x = np.arange(10)
+        with pytest.raises(ValueError, match='`num_shards` must be at '
+                                             'least 1'):
+            _ = ShardedArrayFlow([x], 3, num_shards=0, shard_index=0)
+        with pytest.raises(ValueError, match=r'`shard_index` must be in the '
+                                             r'range \[0, 2\): got 2'):
+            _ = ShardedArrayFlow([x], 3, num_shards=2, shard_index=2)
+        with pytest.raises(ValueError, match='`seed` is required when '
+                                             '`shuffle` is True'):
+            _ = ShardedArrayFlow([x], 3, num_shards=2, shard_index=0,
+                                 shuffle=True)
+        with pytest.raises(ValueError,
+                           match='Invalid value for argument `tail`'):
+            _ = ShardedArrayFlow([x], 3, num_shards=2, shard_index=0,
+                                 tail='wrap')
+        for tail in ('pad', 'drop'):
+            with pytest.raises(ValueError,
+                               match='`arrays` must not be empty to be '
+                                     'sharded'):
+                _ = ShardedArrayFlow([x[:0]], 3, num_shards=2,
+                                     shard_index=0, tail=tail)
+
+    def test_no_shuffle(self):
+        x = np.arange(10)
+
+        # test pad
+        flows = [DataFlow.arrays([x], 2).shard(3, i) for i in range(3)]
+        self.assertEqual([4, 4, 4], [f.data_length for f in flows])
+        b = [[a[0] for a in f] for f in flows]
+        np.testing.assert_equal(b[0], [[0, 1], [2, 3]])
+        np.testing.assert_equal(b[1], [[4, 5], [6, 7]])
+        np.testing.assert_equal(b[2], [[8, 9], [0, 1]])
+        # the un-padded mini-batches should be views
+        self.assertTrue(np.may_share_memory(b[0][0], x))
+
+        # test drop
+        flows = [DataFlow.arrays([x], 2).shard(3, i, tail='drop')
+                 for i in range(3)]
+        self.assertEqual([3, 3, 3], [f.data_length for f in flows])
+        b = [np.concatenate([a[0] for a in f]) for f in flows]
+        np.testing.assert_equal(b, [[0, 1, 2], [3, 4, 5], [6, 7, 8]])
+
+    def test_shuffle(self):
+        x = np.arange(23)
+
+        for tail in ('pad', 'drop'):
+            flows = [
+                DataFlow.arrays([x], 4, shuffle=True).
+                shard(4, i, seed=1234, tail=tail)
+                for i in range(4)
+            ]
+            epochs = []
+            for _ in range(3):
+                shards = [np.concatenate([a[0] for a in f]) for f in flows]
+                merged = np.concatenate(shards)
+                if tail == 'pad':
+                    self.assertEqual(24, len(merged))
+                    np.testing.assert_equal(np.unique(merged), x)
+                else:
+                    self.assertEqual(20, len(merged))
+                    self.assertEqual(20, len(np.unique(merged)))
+                epochs.append(merged)
+            self.assertFalse(np.all(epochs[0] == epochs[1]))
+
+            # a new flow with the same seed should reproduce the epochs
+            f = DataFlow.arrays([x], 4, shuffle=True). \
+                shard(4, 2, seed=1234, tail=tail)
+            for e in epochs:
+                np.testing.assert_equal(
+                    np.concatenate([a[0] for a in f]),
+                    e[2 * f.data_length: 3 * f.data_length]
+                )
+            self.assertEqual(3, f.epoch)
+
+    def test_counter_based_shuffle(self):
+        x = np.arange(23)
+        source = DataFlow.arrays([x], 4, shuffle=True, shuffle_seed=1234)
+        self.assertFalse(DataFlow.arrays([x], 4).shard(2, 0).counter_based)
+
+        # the shards should be taken from the epochs of the source flow,
+        # regardless of the number of shards
+        expected = [np.concatenate([a[0] for a in source]) for _ in range(3)]
+        for num_shards in (1, 3, 4):
+            flows = [source.shard(num_shards, i, tail='drop')
+                     for i in range(num_shards)]
+            self.assertTrue(flows[0].counter_based)
+            self.assertEqual(1234, flows[0].seed)
+            for e in expected:
+                merged = np.concatenate(
+                    [np.concatenate([a[0] for a in f]) for f in flows])
+                np.testing.assert_equal(e[:len(merged)], merged)
+
+        # test resume
+        df = source.shard(2, 1)
+        _ = list(df)
+        it = iter(df)
+        head = [next(it)[0] for _ in range(2)]
+        state = df.get_state()
+        tail = [b[0] for b in it]
+        df2 = source.shard(2, 1)
+        df2.set_state(state)
+        np.testing.assert_equal(tail, [b[0] for b in df2])
+        np.testing.assert_equal(
+            expected[1][12:],
+            np.concatenate(head + tail)[:11]
+        )
+
+    def test_block_shuffle(self):
+        x = np.arange(23)
+        source = DataFlow.arrays([x], 4, shuffle=True, shuffle_block_size=4)
+
+        for tail in ('pad', 'drop'):
+            flows = [source.shard(4, i, seed=1234, tail=tail)
+                     for i in range(4)]
+            self.assertEqual(4, flows[0].shuffle_block_size)
+            for _ in range(3):
+                batches = [list(f) for f in flows]
+                merged = np.concatenate(
+                    [np.concatenate([a[0] for a in b]) for b in batches])
+                if tail == 'pad':
+                    self.assertEqual(24, len(merged))
+                    np.testing.assert_equal(np.unique(merged), x)
+                else:
+                    self.assertEqual(20, len(merged))
+                    self.assertEqual(20, len(np.unique(merged)))
+
+                # the shards should be taken from the shuffled blocks
+                shuffled = merged[:23] if tail == 'pad' else merged
+                starts = [0] + [i for i in range(1, len(shuffled))
+                                if shuffled[i] != shuffled[i - 1] + 1]
+                for i in starts:
+                    self.assertEqual(0, shuffled[i] % 4)
+
+                # the mini-batches within one block should be views
+                for b in batches[0]:
+                    if b[0][-1] - b[0][0] == len(b[0]) - 1 and \
+                            b[0][0] // 4 == b[0][-1] // 4:
+                        self.assertIs(x, b[0].base)
+
+        with pytest.raises(ValueError, match='`counter_based` and '
+                                             '`shuffle_block_size` cannot '
+                                             'be both specified'):
+            _ = ShardedArrayFlow([x], 3, num_shards=2, shard_index=0,
+                                 shuffle=True, seed=1, shuffle_block_size=4,
+                                 counter_based=True)
+
+    def test_index_dtype(self):
+        x = np.arange(10)
+        df = ShardedArrayFlow([x], 3, num_shards=2, shard_index=0)
+        self.assertEqual(np.int32, df._index_dtype())
+        # the dtype should be determined by the length of the whole arrays
+        df._total_length = 1 << 31
+        self.assertEqual(np.int64, df._index_dtype())
+
+    def test_epoch_seeds(self):
+        # consecutive seeds should not reuse the permutations of each other
+        x = np.arange(100)
+        epochs = []
+        for seed in (1234, 1235):
+            df = DataFlow.arrays([x], 100, shuffle=True). \
+                shard(1, 0, seed=seed)
+            epochs.append([next(iter(df))[0] for _ in range(2)])
+        self.assertFalse(np.all(epochs[0][1] == epochs[1][0]))
+
+    def test_state(self):
+        x = np.arange(23)
+        df = DataFlow.arrays([x], 2, shuffle=True).shard(2, 1, seed=1234)
+        self.assertEqual({'epoch': 0, 'batch_cursor': 0}, df.get_state())
+        _ = list(df)
+
+        it = iter(df)
+        expected = [next(it)[0] for _ in range(3)]
+        state = df.get_state()
+        self.assertEqual({'epoch': 1, 'batch_cursor': 3}, state)
+        expected.extend(b[0] for b in it)
+        self.assertEqual({'epoch': 2, 'batch_cursor': 0}, df.get_state())
+
+        df2 = DataFlow.arrays([x], 2, shuffle=True).shard(2, 1, seed=1234)
+        df2.set_state(state)
+        np.testing.assert_equal(expected[3:], [b[0] for b in df2])
+        self.assertEqual(2, df2.epoch)
+        np.testing.assert_equal(list(df), list(df2))
@@ -0,0 +1,112 @@
+import unittest
+
+import numpy as np
+import pytest
+
+from tfsnippet.dataflows import DataFlow
+from tfsnippet.dataflows.shuffle_buffer_flow import ShuffleBufferFlow
+
+
+def _stream_flow(data, batch_size):
+    return DataFlow.iterator_factory(lambda: (
+        (data[i: i + batch_size], data[i: i + batch_size] * 2)
+        for i in range(0, len(data), batch_size)
+    ))
+
+
+class ShuffleBufferFlowTestCase(unittest.TestCase):
+
+    def test_props(self):
+        source = DataFlow.arrays([np.arange(10)], batch_size=4)
+        df = source.shuffle_buffer(5, seed=1)
+        self.assertIsInstance(df, ShuffleBufferFlow)
+        self.assertIs(source, df.source)
+        self.assertEqual(5, df.buffer_size)
+        self.assertEqual(4, df.batch_size)
+        self.assertFalse(df.skip_incomplete)
+        self.assertEqual(1, df.seed)
+
+        df = source.shuffle_buffer(5, batch_size=3, skip_incomplete=True)
+        self.assertEqual(3, df.batch_size)
+        self.assertTrue(df.skip_incomplete)
+        self.assertIsNone(df.seed)
+
+    def test_errors(self):
+        source = DataFlow.arrays([np.arange(10)], batch_size=4)
+        with pytest.raises(ValueError, match='`buffer_size` must be at '
+                                             'least 1'):
+            _ = ShuffleBufferFlow(source, 0)
+        with pytest.raises(ValueError, match='`batch_size` must be at '
+                                             'least 1'):
+            _ = ShuffleBufferFlow(source, 5, batch_size=0)
+        with pytest.raises(ValueError, match='`batch_size` is required when '
+                                             '`source` is not an '
+                                             'ExtraInfoDataFlow'):
+            _ = ShuffleBufferFlow(_stream_flow(np.arange(10), 3), 5)
+
+    def test_shuffle(self):
+        data = np.arange(1000)
+        source = _stream_flow(data, 7)
+
+        df = source.shuffle_buffer(100, batch_size=32, seed=1234)
+        epochs = []
+        for _ in range(2):
+            b = list(df)
+            self.assertEqual([32] * 31 + [8], [len(a[0]) for a in b])
+            x = np.concatenate([a[0] for a in b])
+            y = np.concatenate([a[1] for a in b])
+            np.testing.assert_equal(data, np.sort(x))
+            np.testing.assert_equal(x * 2, y)
+            # the items cannot be emitted before `buffer_size - 1` items
+            # after them have been read
+            self.assertTrue(np.all(x[:-100] <= np.arange(900) + 99))
+            self.assertFalse(np.all(x == data))
+            epochs.append(x)
+        self.assertFalse(np.all(epochs[0] == epochs[1]))
+
+        # test reproducibility
+        df2 = source.shuffle_buffer(100, batch_size=32, seed=1234)
+        for e in epochs:
+            np.testing.assert_equal(
+                e, np.concatenate([a[0] for a in df2]))
+
+        # test skip incomplete
+        df = source.shuffle_buffer(100, batch_size=32, skip_incomplete=True)
+        self.assertEqual([32] * 31, [len(a[0]) for a in df])
+
+        # test buffer size 1, and buffer larger than the data
+        df = source.shuffle_buffer(1, batch_size=32)
+        np.testing.assert_equal(
+            data, np.concatenate([a[0] for a in df]))
+        df = source.shuffle_buffer(2000, batch_size=1000)
+        [x, _] = next(iter(df))
+        np.testing.assert_equal(data, np.sort(x))
+        self.assertFalse(np.all(x == data))
+
+    def test_empty_batches(self):
+        sizes = [0, 4, 0, 3, 0]
+        data = np.arange(sum(sizes))
+        ends = np.cumsum(sizes)
+        source = DataFlow.iterator_factory(lambda: (
+            (data[e - n: e],) for n, e in zip(sizes, ends)))
+        df = source.shuffle_buffer(2, batch_size=2, seed=1234)
+        b = list(df)
+        self.assertEqual([2, 2, 2, 1], [len(a[0]) for a in b])
+        np.testing.assert_equal(data, np.sort(np.concatenate(
+            [a[0] for a in b])))
+
+    def test_exchange(self):
+        # the vectorized exchange should match exchanging one by one
+        df = ShuffleBufferFlow(DataFlow.arrays([np.arange(1)], 1), 5, seed=1)
+        buffer = (np.arange(5),)
+        incoming = (np.arange(100, 130),)
+        [out] = df._exchange(buffer, incoming)
+
+        slots = np.random.RandomState(1).randint(0, 5, size=30)
+        expected_buffer = list(range(5))
+        expected = []
+        for slot, item in zip(slots, incoming[0]):
+            expected.append(expected_buffer[slot])
+            expected_buffer[slot] = item
+        np.testing.assert_equal(expected, out)
+        np.testing.assert_equal(expected_buffer, buffer[0])
@@ -36,6 +36,19 @@ class CifarTestCase(unittest.TestCase):
         self.assertTupleEqual(train_x.shape, (50000, 1024, 3))
         self.assertTupleEqual(test_x.shape, (10000, 1024, 3))
 
+        # test cache_preprocessed
+        (train_x, train_y), (test_x, test_y) = load_cifar10()
+        self.assertIsInstance(train_x, np.memmap)
+        self.assertTrue(train_x.flags.writeable)  # copy-on-write
+        (train_x2, train_y2), (test_x2, test_y2) = \
+            load_cifar10(cache_preprocessed=False)
+        self.assertNotIsInstance(train_x2, np.memmap)
+        self.assertTupleEqual(train_x2.shape, (50000, 32, 32, 3))
+        np.testing.assert_equal(train_x2, train_x)
+        np.testing.assert_equal(train_y2, train_y)
+        np.testing.assert_equal(test_x2, test_x)
+        np.testing.assert_equal(test_y2, test_y)
+
         with pytest.raises(ValueError,
                            match='`x_shape` does not product to 3072'):
             _ = load_cifar10(x_shape=(1, 2, 3))
@@ -68,6 +81,32 @@ class CifarTestCase(unittest.TestCase):
         self.assertTupleEqual(train_x.shape, (50000, 1024, 3))
         self.assertTupleEqual(test_x.shape, (10000, 1024, 3))
 
+        # test cache_preprocessed
+        (train_x, train_y), (test_x, test_y) = \
+            load_cifar100(label_mode='coarse')
+        self.assertIsInstance(train_x, np.memmap)
+        self.assertTrue(train_x.flags.writeable)  # copy-on-write
+        (train_x2, train_y2), (test_x2, test_y2) = \
+            load_cifar100(label_mode='coarse', cache_preprocessed=False)
+        self.assertNotIsInstance(train_x2, np.memmap)
+        self.assertTupleEqual(train_x2.shape, (50000, 32, 32, 3))
+        np.testing.assert_equal(train_x2, train_x)
+        np.testing.assert_equal(train_y2, train_y)
+        np.testing.assert_equal(test_x2, test_x)
+        np.testing.assert_equal(test_y2, test_y)
+
         with pytest.raises(ValueError,
                            match='`x_shape` does not product to 3072'):
             _ = load_cifar100(x_shape=(1, 2, 3))
+
+    def test_load_cifar10_x_dtype_error(self):
+        with pytest.raises(ValueError,
+                           match='`x_dtype` must be a floating point type '
+                                 'when `normalize_x` is True'):
+            _ = load_cifar10(x_dtype=np.uint8, normalize_x=True)
+
+    def test_load_cifar100_x_dtype_error(self):
+        with pytest.raises(ValueError,
+                           match='`x_dtype` must be a floating point type '
+                                 'when `normalize_x` is True'):
+            _ = load_cifar100(x_dtype=np.uint8, normalize_x=True)
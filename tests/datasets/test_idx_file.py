@@ -0,0 +1,81 @@
+import gzip
+import os
+import struct
+import unittest
+
+import numpy as np
+import pytest
+from mock import Mock
+
+from tfsnippet.datasets.idx_file import *
+from tfsnippet.utils import TemporaryDirectory
+
+
+def make_idx(array, type_code):
+    header = struct.pack('>HBB', 0, type_code, len(array.shape))
+    header += struct.pack('>' + 'I' * len(array.shape), *array.shape)
+    return header + array.astype(array.dtype.newbyteorder('>')).tobytes()
+
+
+class ParseIdxTestCase(unittest.TestCase):
+
+    def test_parse_idx(self):
+        x = np.arange(24, dtype=np.uint8).reshape([2, 3, 4])
+        y = parse_idx(make_idx(x, 0x08))
+        self.assertEqual(np.uint8, y.dtype)
+        self.assertEqual((2, 3, 4), y.shape)
+        np.testing.assert_equal(x, y)
+
+        # test the big-endian types are converted into native byte order
+        for dtype, type_code in [(np.int16, 0x0B), (np.int32, 0x0C),
+                                 (np.float32, 0x0D), (np.float64, 0x0E)]:
+            x = (np.arange(10) - 5).astype(dtype)
+            y = parse_idx(make_idx(x, type_code))
+            self.assertTrue(y.dtype.isnative)
+            self.assertEqual(np.dtype(dtype), y.dtype)
+            np.testing.assert_equal(x, y)
+
+    def test_errors(self):
+        with pytest.raises(IOError, match='the header is truncated'):
+            _ = parse_idx(b'\x00\x00')
+        with pytest.raises(IOError, match='unrecognized magic number'):
+            _ = parse_idx(b'\x00\x01\x08\x01')
+        with pytest.raises(IOError, match='unrecognized magic number'):
+            _ = parse_idx(b'\x00\x00\x07\x01')
+        with pytest.raises(IOError, match='the header is truncated'):
+            _ = parse_idx(b'\x00\x00\x08\x02\x00\x00\x00\x01')
+        with pytest.raises(IOError, match='the data size does not match'):
+            _ = parse_idx(make_idx(np.arange(3, dtype=np.uint8), 0x08)[:-1])
+
+
+class FetchIdxArraysTestCase(unittest.TestCase):
+
+    def test_fetch_idx_arrays(self):
+        arrays = [np.arange(i * 10, dtype=np.uint8).reshape([i, 10])
+                  for i in range(1, 5)]
+
+        with TemporaryDirectory() as tempdir:
+            paths = {}
+            for i, arr in enumerate(arrays):
+                path = os.path.join(tempdir, 'array_{}.gz'.format(i))
+                with gzip.open(path, 'wb') as f:
+                    f.write(make_idx(arr, 0x08))
+                paths['uri_{}'.format(i)] = path
+
+            cache_dir = Mock(download=Mock(
+                side_effect=lambda uri, **kwargs: paths[uri]))
+            for n in (1, 4):
+                uris = [('uri_{}'.format(i), 'md5_{}'.format(i))
+                        for i in range(n)]
+                cache_dir.download.reset_mock()
+                ret = fetch_idx_arrays(cache_dir, uris)
+                self.assertEqual(n, len(ret))
+                for a, b in zip(arrays, ret):
+                    np.testing.assert_equal(a, b)
+                self.assertEqual(
+                    [(u,) for u, _ in uris],
+                    [c[0] for c in cache_dir.download.call_args_list])
+                self.assertEqual(
+                    [m for _, m in uris],
+                    [c[1]['expected_hash']
+                     for c in cache_dir.download.call_args_list])
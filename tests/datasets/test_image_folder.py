@@ -0,0 +1,135 @@
+import os
+import zipfile
+import unittest
+
+import numpy as np
+import pytest
+
+from tfsnippet.datasets import *
+from tfsnippet.utils import CacheDir, TemporaryDirectory
+
+
+def make_samples(root):
+    samples = {}
+    for c, count in [('cat', 3), ('dog', 2), ('rabbit', 4)]:
+        os.makedirs(os.path.join(root, c))
+        for i in range(count):
+            name = '{}/{:04d}.npy'.format(c, i)
+            samples[name] = np.full([2, 3], len(samples), dtype=np.uint8)
+            np.save(os.path.join(root, name), samples[name])
+    with open(os.path.join(root, 'cat', 'README.txt'), 'wb') as f:
+        f.write(b'not a sample')
+    return samples
+
+
+class ImageFolderTestCase(unittest.TestCase):
+
+    def check_folder(self, folder, samples, workers=None):
+        names = sorted(samples)
+        self.assertEqual(tuple(names), folder.file_names)
+        self.assertEqual(('cat', 'dog', 'rabbit'), folder.class_names)
+        np.testing.assert_equal([0, 0, 0, 1, 1, 2, 2, 2, 2], folder.labels)
+        self.assertEqual(len(samples), len(folder))
+        self.assertEqual(workers, folder.workers)
+
+        # test decode the samples by indices
+        x, y = folder([4, 0, 7])
+        self.assertEqual(np.uint8, x.dtype)
+        np.testing.assert_equal(
+            np.stack([samples[names[i]] for i in [4, 0, 7]]), x)
+        np.testing.assert_equal([1, 0, 2], y)
+
+        # test decode an empty batch
+        x, y = folder(np.zeros([0], dtype=np.int32))
+        self.assertEqual((0,) + samples[names[0]].shape, x.shape)
+        self.assertEqual(np.uint8, x.dtype)
+        self.assertEqual((0,), y.shape)
+
+        # test the data flow
+        for shuffle in (False, True):
+            batches = list(folder.as_flow(batch_size=4, shuffle=shuffle))
+            self.assertEqual([4, 4, 1], [len(b[0]) for b in batches])
+            x = np.concatenate([b[0] for b in batches])
+            y = np.concatenate([b[1] for b in batches])
+            order = np.argsort(x[:, 0, 0])
+            np.testing.assert_equal(
+                np.stack([samples[n] for n in names]), x[order])
+            np.testing.assert_equal(folder.labels, y[order])
+        folder.close()
+
+    def test_directory(self):
+        with TemporaryDirectory() as tempdir:
+            root = os.path.join(tempdir, 'data')
+            samples = make_samples(root)
+            cache_dir = CacheDir('image_folder', cache_root=tempdir)
+
+            for workers in (None, 3):
+                folder = ImageFolder(root, workers=workers,
+                                     cache_dir=cache_dir)
+                self.assertEqual(root, folder.path)
+                self.check_folder(folder, samples, workers=workers)
+
+            # test the cached index
+            np.save(os.path.join(root, 'dog', '0002.npy'), np.zeros([2, 3]))
+            folder = ImageFolder(root, cache_dir=cache_dir)
+            self.assertEqual(len(samples), len(folder))
+            folder = ImageFolder(root, cache_dir=cache_dir,
+                                 rebuild_index=True)
+            self.assertEqual(len(samples) + 1, len(folder))
+            self.assertIn('dog/0002.npy', folder.file_names)
+
+    def test_decoder_and_extensions(self):
+        with TemporaryDirectory() as tempdir:
+            root = os.path.join(tempdir, 'data')
+            samples = make_samples(root)
+            cache_dir = CacheDir('image_folder', cache_root=tempdir)
+            decoded = []
+
+            def decoder(path):
+                decoded.append(os.path.relpath(path, root).replace('\\', '/'))
+                return np.load(path)
+
+            # all files are indexed if `decoder` is specified
+            folder = ImageFolder(root, decoder=decoder, cache_dir=cache_dir)
+            self.assertEqual(len(samples) + 1, len(folder))
+            self.assertIn('cat/README.txt', folder.file_names)
+
+            # only the samples in the mini-batch should be decoded
+            folder = ImageFolder(root, decoder=decoder, extensions=['.NPY'],
+                                 cache_dir=cache_dir)
+            self.assertEqual(len(samples), len(folder))
+            _ = folder([1, 5])
+            self.assertEqual(['cat/0001.npy', 'rabbit/0000.npy'], decoded)
+
+    def test_archive_and_npz(self):
+        with TemporaryDirectory() as tempdir:
+            root = os.path.join(tempdir, 'data')
+            samples = make_samples(root)
+            cache_dir = CacheDir('image_folder', cache_root=tempdir)
+
+            # test zip archive
+            archive = os.path.join(tempdir, 'images.zip')
+            with zipfile.ZipFile(archive, 'w') as f:
+                for name in sorted(samples) + ['cat/README.txt']:
+                    f.write(os.path.join(root, name), name)
+            folder = ImageFolder(archive, cache_dir=cache_dir)
+            self.assertEqual(archive, folder.path)
+            self.assertTrue(os.path.isdir(cache_dir.resolve('images')))
+            self.check_folder(folder, samples)
+
+            # test npz file
+            npz = os.path.join(tempdir, 'images.npz')
+            np.savez(npz, **{n[:-len('.npy')]: v for n, v in samples.items()})
+            folder = ImageFolder(npz, workers=2, cache_dir=cache_dir)
+            self.assertEqual(npz, folder.path)
+            self.check_folder(folder, samples, workers=2)
+
+    def test_errors(self):
+        with TemporaryDirectory() as tempdir:
+            with pytest.raises(IOError, match='Not a dataset directory, a '
+                                              'supported archive file or a '
+                                              '".npz" file'):
+                _ = ImageFolder(os.path.join(tempdir, 'not-exist'))
+            with pytest.raises(ValueError,
+                               match='`workers` must be at least 1'):
+                _ = ImageFolder(tempdir, workers=0)
@@ -34,6 +34,25 @@ class MnistTestCase(unittest.TestCase):
         self.assertTupleEqual(train_x.shape, (60000, 784))
         self.assertTupleEqual(test_x.shape, (10000, 784))
 
+        # test cache_preprocessed
+        (train_x, train_y), (test_x, test_y) = load_mnist()
+        self.assertIsInstance(train_x, np.memmap)
+        self.assertTrue(train_x.flags.writeable)  # copy-on-write
+        (train_x2, train_y2), (test_x2, test_y2) = \
+            load_mnist(cache_preprocessed=False)
+        self.assertNotIsInstance(train_x2, np.memmap)
+        self.assertTupleEqual(train_x2.shape, (60000, 28, 28))
+        np.testing.assert_equal(train_x2, train_x)
+        np.testing.assert_equal(train_y2, train_y)
+        np.testing.assert_equal(test_x2, test_x)
+        np.testing.assert_equal(test_y2, test_y)
+
         with pytest.raises(ValueError,
                            match='`x_shape` does not product to 784'):
             _ = load_mnist(x_shape=(1, 2, 3))
+
+    def test_load_mnist_x_dtype_error(self):
+        with pytest.raises(ValueError,
+                           match='`x_dtype` must be a floating point type '
+                                 'when `normalize_x` is True'):
+            _ = load_mnist(x_dtype=np.uint8, normalize_x=True)
@@ -0,0 +1,44 @@
+import unittest
+
+import numpy as np
+import pytest
+
+from tfsnippet.preprocessing import *
+
+
+class NormalizerTestCase(unittest.TestCase):
+
+    def test_property(self):
+        normalizer = Normalizer()
+        self.assertAlmostEqual(normalizer.scale, 1. / 255)
+        self.assertEqual(normalizer.shift, 0.)
+        self.assertEqual(normalizer.dtype, np.float32)
+
+        normalizer = Normalizer(scale=2., shift=-1., dtype=np.float64)
+        self.assertEqual(normalizer.scale, 2.)
+        self.assertEqual(normalizer.shift, -1.)
+        self.assertEqual(normalizer.dtype, np.float64)
+
+        with pytest.raises(TypeError,
+                           match='`dtype` must be a floating point type'):
+            _ = Normalizer(dtype=np.int32)
+
+    def test_normalize(self):
+        x = np.arange(256, dtype=np.uint8).reshape([4, 64])
+
+        # test normalize 8-bit pixels into [0, 1]
+        normalizer = Normalizer()
+        y = normalizer.normalize(x)
+        self.assertEqual(y.shape, x.shape)
+        self.assertEqual(y.dtype, np.float32)
+        np.testing.assert_allclose(y, x / 255., rtol=1e-6)
+        self.assertEqual(normalizer(x)[0].dtype, np.float32)
+        np.testing.assert_equal(normalizer(x)[0], y)
+
+        # test normalize into [-1, 1]
+        normalizer = Normalizer(scale=2. / 255, shift=-1., dtype=np.float64)
+        y = normalizer.normalize(x)
+        self.assertEqual(y.dtype, np.float64)
+        np.testing.assert_allclose(y, x * 2. / 255 - 1.)
+        self.assertEqual(np.min(y), -1.)
+        self.assertEqual(np.max(y), 1.)
@@ -1,9 +1,26 @@
+import copy
+import pickle
 import unittest
 
 import numpy as np
+import pytest
+import tensorflow as tf
 
 from tfsnippet.preprocessing import *
 
+# `numpy.random.Generator` is only available since NumPy 1.17
+has_generator = hasattr(np.random, 'default_rng')
+requires_generator = pytest.mark.skipif(
+    not has_generator, reason='numpy.random.Generator is not available')
+
+
+def random_states(seed):
+    """Get a RandomState, and a Generator if available, seeded by `seed`."""
+    ret = [np.random.RandomState(seed)]
+    if has_generator:
+        ret.append(np.random.default_rng(seed))
+    return ret
+
 
 class BaseSamplerTestCase(unittest.TestCase):
 
@@ -23,6 +40,8 @@ class BernoulliSamplerTestCase(unittest.TestCase):
     def test_property(self):
         self.assertEqual(BernoulliSampler().dtype, np.int32)
         self.assertEqual(BernoulliSampler(np.float64).dtype, np.float64)
+        self.assertFalse(BernoulliSampler().uint8_pixels)
+        self.assertTrue(BernoulliSampler(uint8_pixels=True).uint8_pixels)
 
     def test_sample(self):
         np.random.seed(1234)
@@ -44,6 +63,65 @@ class BernoulliSamplerTestCase(unittest.TestCase):
         self.assertLessEqual(np.max(y), 1 + 1e-5)
         self.assertGreaterEqual(np.min(y), 0 - 1e-5)
 
+    def test_sample_probability(self):
+        x = np.tile(np.linspace(0, 1, 5), [20000, 1])
+        for random_state in random_states(1234):
+            sampler = BernoulliSampler(random_state=random_state)
+            y = sampler.sample(x)
+            np.testing.assert_allclose(
+                np.mean(y, axis=0), x[0], rtol=0, atol=0.02)
+
+            # the reused buffer should not affect the next samples
+            y2 = sampler.sample(x[:100])
+            self.assertEqual(y2.shape, (100, 5))
+            self.assertFalse(np.all(y[:100] == y2))
+
+    def test_sample_uint8_pixels(self):
+        x = np.tile(np.asarray([0, 1, 64, 128, 254, 255], dtype=np.uint8),
+                    [20000, 1])
+        for random_state in random_states(1234):
+            sampler = BernoulliSampler(
+                dtype=np.float32, random_state=random_state,
+                uint8_pixels=True
+            )
+            y = sampler.sample(x)
+            self.assertEqual(y.dtype, np.float32)
+            self.assertEqual(y.shape, x.shape)
+            np.testing.assert_allclose(
+                np.mean(y, axis=0), x[0] / 255., rtol=0, atol=0.02)
+            np.testing.assert_equal(0, y[:, 0])
+            np.testing.assert_equal(1, y[:, -1])
+
+        with pytest.raises(TypeError,
+                           match='The input must be a uint8 array when '
+                                 '`uint8_pixels` is True'):
+            _ = BernoulliSampler(uint8_pixels=True).sample(x / 255.)
+
+    def test_pickle(self):
+        x = np.tile(np.linspace(0, 1, 5), [100, 1])
+        for random_state in random_states(1234):
+            sampler = BernoulliSampler(dtype=np.float32,
+                                       random_state=random_state)
+            _ = sampler.sample(x)  # allocate the buffer
+
+            s2 = pickle.loads(pickle.dumps(sampler))
+            s3 = copy.deepcopy(sampler)
+            for s in (s2, s3):
+                self.assertEqual(np.float32, s.dtype)
+            y = sampler.sample(x)
+            np.testing.assert_equal(y, s2.sample(x))
+            np.testing.assert_equal(y, s3.sample(x))
+
+
+if has_generator:
+    class _MaxRandomGenerator(np.random.Generator):
+        """Generator which always draws the largest number below 1."""
+
+        def random(self, size=None, dtype=np.float64, out=None):
+            dtype = np.dtype(dtype).type
+            out[...] = np.nextafter(dtype(1), dtype(0))
+            return out
+
 
 class UniformNoiseSamplerTestCase(unittest.TestCase):
 
@@ -76,3 +154,83 @@ class UniformNoiseSamplerTestCase(unittest.TestCase):
         self.assertEqual(y.dtype, np.float32)
         self.assertLess(np.max(y - x), 2.)
         self.assertGreaterEqual(np.min(y - x), -2.)
+
+    @requires_generator
+    def test_sample_below_maxval(self):
+        x = np.zeros([10], dtype=np.float32)
+        for dtype in (np.float32, np.float64):
+            sampler = UniformNoiseSampler(
+                minval=1., maxval=2., dtype=dtype,
+                random_state=_MaxRandomGenerator(np.random.PCG64(1234))
+            )
+            y = sampler.sample(x)
+            self.assertEqual(dtype, y.dtype)
+            self.assertLess(np.max(y), 2.)
+            self.assertGreater(np.min(y), 1.99)
+
+    def test_sample_random_states(self):
+        x = np.arange(0, 10000, dtype=np.uint8)
+        for random_state in random_states(1234):
+            for dtype in (np.float32, np.float64):
+                sampler = UniformNoiseSampler(
+                    minval=-1., maxval=3., dtype=dtype,
+                    random_state=random_state
+                )
+                y = sampler.sample(x)
+                self.assertEqual(y.dtype, dtype)
+                self.assertLess(np.max(y - x), 3.)
+                self.assertGreaterEqual(np.min(y - x), -1.)
+                self.assertAlmostEqual(np.mean(y - x), 1., delta=0.1)
+
+
+class SampleTensorTestCase(tf.test.TestCase):
+
+    def test_base_sampler(self):
+        with pytest.raises(NotImplementedError):
+            _ = BaseSampler().sample_tensor(tf.constant(1.))
+
+    def test_bernoulli_sampler(self):
+        x = np.tile(np.linspace(0, 1, 5, dtype=np.float32), [20000, 1])
+        x_uint8 = np.tile(
+            np.asarray([0, 1, 64, 128, 254, 255], dtype=np.uint8), [20000, 1])
+        input_x = tf.placeholder(dtype=tf.float32, shape=[None, 5])
+        input_x_uint8 = tf.placeholder(dtype=tf.uint8, shape=[None, 6])
+
+        y = BernoulliSampler().sample_tensor(input_x)
+        self.assertEqual(tf.int32, y.dtype)
+        self.assertEqual([None, 5], y.get_shape().as_list())
+        y_uint8 = BernoulliSampler(dtype=np.float32, uint8_pixels=True). \
+            sample_tensor(input_x_uint8)
+        self.assertEqual(tf.float32, y_uint8.dtype)
+
+        with self.test_session() as sess:
+            out = sess.run(y, feed_dict={input_x: x})
+            np.testing.assert_allclose(
+                np.mean(out, axis=0), x[0], rtol=0, atol=0.02)
+            out = sess.run(y_uint8, feed_dict={input_x_uint8: x_uint8})
+            np.testing.assert_allclose(
+                np.mean(out, axis=0), x_uint8[0] / 255., rtol=0, atol=0.02)
+            np.testing.assert_equal(0, out[:, 0])
+            np.testing.assert_equal(1, out[:, -1])
+
+        with pytest.raises(TypeError,
+                           match='The input must be a uint8 tensor when '
+                                 '`uint8_pixels` is True'):
+            _ = BernoulliSampler(uint8_pixels=True).sample_tensor(input_x)
+
+    def test_uniform_noise_sampler(self):
+        x = np.arange(0, 10000, dtype=np.uint8)
+        input_x = tf.placeholder(dtype=tf.uint8, shape=[None])
+        y = UniformNoiseSampler(minval=-1., maxval=3., dtype=np.float32). \
+            sample_tensor(input_x)
+        self.assertEqual(tf.float32, y.dtype)
+        y2 = UniformNoiseSampler().sample_tensor(input_x)
+        self.assertEqual(tf.uint8, y2.dtype)
+
+        with self.test_session() as sess:
+            out = sess.run(y, feed_dict={input_x: x})
+            self.assertLess(np.max(out - x), 3.)
+            self.assertGreaterEqual(np.min(out - x), -1.)
+            self.assertAlmostEqual(np.mean(out - x), 1., delta=0.1)
+            out = sess.run(y2, feed_dict={input_x: x})
+            np.testing.assert_equal(x, out)
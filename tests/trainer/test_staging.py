@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+from mock import Mock
+
+from tfsnippet.dataflows import DataFlow
+from tfsnippet.evaluation import collect_outputs
+from tfsnippet.scaffold import TrainLoop
+from tfsnippet.trainer import *
+from tfsnippet.utils import ensure_variables_initialized
+
+
+class StagingFlowTestCase(tf.test.TestCase):
+
+    def test_props(self):
+        source = DataFlow.arrays(
+            [np.zeros([10, 3], dtype=np.float32), np.arange(10)],
+            batch_size=4
+        )
+        df = StagingFlow(source, dtypes=[tf.float32, tf.int64], prefetch=3)
+        self.assertIs(source, df.source)
+        self.assertEqual(3, df.prefetch)
+        self.assertEqual(2, len(df.inputs))
+        self.assertEqual(tf.float32, df.inputs[0].dtype)
+        self.assertEqual([None, 3], df.inputs[0].get_shape().as_list())
+        self.assertEqual(tf.int64, df.inputs[1].dtype)
+        self.assertEqual([None], df.inputs[1].get_shape().as_list())
+
+        # test specified shapes
+        df = StagingFlow(DataFlow.iterator_factory(lambda: []),
+                         dtypes=[tf.float32], shapes=[[2]])
+        self.assertEqual([None, 2], df.inputs[0].get_shape().as_list())
+        df = StagingFlow(DataFlow.iterator_factory(lambda: []),
+                         dtypes=[tf.float32])
+        self.assertIsNone(df.inputs[0].get_shape().ndims)
+
+    def test_errors(self):
+        source = DataFlow.arrays([np.arange(10)], batch_size=4)
+        with pytest.raises(ValueError, match='`dtypes` must not be empty'):
+            _ = StagingFlow(source, dtypes=[])
+        with pytest.raises(ValueError, match='The length of `shapes` does '
+                                             'not match `dtypes`'):
+            _ = StagingFlow(source, dtypes=[tf.int64, tf.int64])
+        with pytest.raises(ValueError, match='`prefetch` must be at least 1'):
+            _ = StagingFlow(source, dtypes=[tf.int64], prefetch=0)
+
+        df = StagingFlow(source, dtypes=[tf.int64])
+        loop = Mock(max_epoch=1, max_step=None)
+        with pytest.raises(ValueError, match='`inputs` must not be specified '
+                                             'when `data_flow` is a '
+                                             'StagingFlow'):
+            _ = Trainer(loop, Mock(), [df.inputs[0]], df)
+        with pytest.raises(ValueError, match='`inputs` must not be specified '
+                                             'when `data_flow` is a '
+                                             'StagingFlow'):
+            _ = Evaluator(loop, tf.constant(1.), [df.inputs[0]], df)
+        with pytest.raises(ValueError, match='`inputs` must not be specified '
+                                             'when `data_flow` is a '
+                                             'StagingFlow'):
+            _ = collect_outputs([df.inputs[0]], [df.inputs[0]], df)
+
+    def test_staging(self):
+        x = np.arange(10, dtype=np.int32)
+        df = StagingFlow(DataFlow.arrays([x], batch_size=4),
+                         dtypes=[tf.int32], prefetch=2)
+        [staged_x] = df.inputs
+
+        with self.test_session() as sess:
+            for _ in range(2):
+                for batch_x, in df:
+                    np.testing.assert_equal(batch_x, sess.run(staged_x))
+
+            # the remaining staged mini-batches should be discarded
+            for _ in df:
+                break
+            self.assertEqual(0, sess.run(df._size_op))
+            for batch_x, in df:
+                np.testing.assert_equal(batch_x, sess.run(staged_x))
+
+            # test collect outputs
+            [y] = collect_outputs([staged_x * 2], None, df)
+            np.testing.assert_equal(x * 2, y)
+
+    def test_error_in_source(self):
+        def gen():
+            yield (np.arange(2),)
+            raise ValueError('error in the flow')
+
+        df = StagingFlow(DataFlow.iterator_factory(gen), dtypes=[tf.int64])
+        with self.test_session() as sess:
+            it = iter(df)
+            _ = next(it)
+            sess.run(df.inputs[0])
+            with pytest.raises(ValueError, match='error in the flow'):
+                _ = next(it)
+
+    def test_trainer_and_evaluator(self):
+        x = np.arange(10, dtype=np.float32)
+        train_flow = StagingFlow(DataFlow.arrays([x], batch_size=4),
+                                 dtypes=[tf.float32])
+        valid_flow = StagingFlow(DataFlow.arrays([x], batch_size=3),
+                                 dtypes=[tf.float32])
+        var = tf.get_variable('var', shape=(), dtype=tf.float32,
+                              initializer=tf.zeros_initializer())
+        train_op = tf.assign_add(var, tf.reduce_sum(train_flow.inputs[0]))
+        valid_loss = tf.reduce_mean(valid_flow.inputs[0])
+
+        with self.test_session() as sess, \
+                TrainLoop([var], max_epoch=2, early_stopping=False) as loop:
+            trainer = Trainer(loop, train_op, None, train_flow)
+            evaluator = Evaluator(loop, {'valid_loss': valid_loss}, None,
+                                  valid_flow, time_metric_name=None)
+            trainer.evaluate_after_epochs(evaluator, freq=1)
+            ensure_variables_initialized()
+            trainer.run()
+
+            self.assertEqual(6, loop.step)
+            self.assertAlmostEqual(np.sum(x) * 2, sess.run(var))
+            self.assertAlmostEqual(
+                np.mean(x), evaluator.last_metrics_dict['valid_loss'])
@@ -85,6 +85,89 @@ class TrainerTestCase(tf.test.TestCase):
             )
             self.assertFalse(loop.add_summary.called)
 
+    def test_step_plan(self):
+        ph = tf.placeholder(tf.int32, [5])
+        scale = tf.placeholder(tf.int32, ())
+        var = tf.get_variable('var', shape=[5], dtype=tf.int32,
+                              initializer=tf.zeros_initializer())
+        train_op = tf.assign(var, ph * scale)
+        df = DataFlow.arrays(
+            [np.arange(10, 20, dtype=np.int32)], batch_size=5)
+        counter = [0]
+
+        def get_scale():
+            counter[0] += 1
+            return counter[0]
+
+        with self.test_session() as session, \
+                TrainLoop([var], max_epoch=2, early_stopping=False) as loop:
+            loop.collect_metrics = Mock(wraps=loop.collect_metrics)
+            session.make_callable = Mock(wraps=session.make_callable)
+            # the batch arrays should override `feed_dict`
+            t = Trainer(loop, train_op, [ph], df,
+                        feed_dict={scale: get_scale, ph: np.zeros([5])},
+                        metrics={'loss_x': tf.reduce_sum(ph * scale)})
+            ensure_variables_initialized()
+            t.run()
+
+            # the step should be compiled only once, while the dynamic
+            # feed values are resolved at each step
+            self.assertEqual(1, session.make_callable.call_count)
+            self.assertEqual(4, counter[0])
+            self.assertEqual(
+                [{'loss_x': 60}, {'loss_x': 170}, {'loss_x': 180},
+                 {'loss_x': 340}],
+                [m for m in (c[0][0] if c[0] else c[1]['metrics']
+                             for c in loop.collect_metrics.call_args_list)
+                 if 'loss_x' in m]
+            )
+            np.testing.assert_equal(
+                [60, 64, 68, 72, 76], session.run(var))
+
+    def test_step_plan_cache(self):
+        loop = Mock(max_epoch=1, max_step=None, summary_writer=None)
+        step_fn = Mock(return_value=[None, 1.])
+        session = Mock(make_callable=Mock(return_value=step_fn))
+        t = Trainer(loop, 'train_op', ['x'], Mock(), feed_dict={'a': 1},
+                    metrics={'loss': 'loss_t'})
+        x = np.arange(3)
+
+        # the plan should be compiled at the first step
+        for step in range(2):
+            t._run_step(session, (step, [x]))
+        self.assertEqual(1, session.make_callable.call_count)
+        self.assertEqual(
+            ((['train_op', 'loss_t'],), {'feed_list': ['a', 'x']}),
+            session.make_callable.call_args
+        )
+        self.assertEqual(((1, x),), step_fn.call_args)
+
+        # changes of the feed structure should take effect at the next step
+        t.metrics['acc'] = 'acc_t'
+        step_fn.return_value = [None, 1., 2.]
+        t._run_step(session, (2, [x]))
+        self.assertEqual(2, session.make_callable.call_count)
+        self.assertEqual(
+            ((['train_op', 'loss_t', 'acc_t'],), {'feed_list': ['a', 'x']}),
+            session.make_callable.call_args
+        )
+        loop.collect_metrics.assert_called_with({'loss': 1., 'acc': 2.})
+
+        del t.feed_dict['a']
+        t.feed_dict['b'] = 2
+        t._run_step(session, (3, [x]))
+        self.assertEqual(3, session.make_callable.call_count)
+        self.assertEqual(
+            ((['train_op', 'loss_t', 'acc_t'],), {'feed_list': ['b', 'x']}),
+            session.make_callable.call_args
+        )
+        self.assertEqual(((2, x),), step_fn.call_args)
+
+        # a different session should also compile the plan again
+        session2 = Mock(make_callable=Mock(return_value=step_fn))
+        t._run_step(session2, (4, [x]))
+        self.assertEqual(1, session2.make_callable.call_count)
+
 
 class LossTrainerTestCase(tf.test.TestCase):
 
@@ -7,6 +7,7 @@ import unittest
 from contextlib import contextmanager
 from threading import Thread
 
+import numpy as np
 import six
 import pytest
 from mock import mock
@@ -356,6 +357,68 @@ class CacheDirTestCase(unittest.TestCase):
                 log_file.getvalue()
             )
 
+    def test_cache_arrays(self):
+        counter = [0]
+
+        def factory():
+            counter[0] += 1
+            return np.arange(10, dtype=np.float32), np.array([[1, 2]])
+
+        with TemporaryDirectory() as tmpdir:
+            cache_dir = CacheDir('sub-dir', cache_root=tmpdir)
+            path = os.path.join(cache_dir.path, 'preprocessed/a')
+
+            # produce the arrays and cache them
+            x, y = cache_dir.cache_arrays('preprocessed/a', factory)
+            self.assertEqual(1, counter[0])
+            self.assertTrue(os.path.isfile(os.path.join(path, 'array_0.npy')))
+            self.assertFalse(os.path.isdir(path + '._saving_'))
+            self.assertIsInstance(x, np.memmap)
+            self.assertFalse(x.flags.writeable)
+            np.testing.assert_equal(np.arange(10, dtype=np.float32), x)
+            self.assertEqual(np.float32, x.dtype)
+            np.testing.assert_equal([[1, 2]], y)
+
+            # load the cached arrays
+            x, y = cache_dir.cache_arrays('preprocessed/a', factory)
+            self.assertEqual(1, counter[0])
+            np.testing.assert_equal(np.arange(10, dtype=np.float32), x)
+            np.testing.assert_equal([[1, 2]], y)
+
+            # copy-on-write arrays should not affect the cached files
+            x, y = cache_dir.cache_arrays('preprocessed/a', factory,
+                                          mmap_mode='c')
+            self.assertTrue(x.flags.writeable)
+            x += 1.
+            np.testing.assert_equal(np.arange(10, dtype=np.float32) + 1., x)
+            x, y = cache_dir.cache_arrays('preprocessed/a', factory)
+            np.testing.assert_equal(np.arange(10, dtype=np.float32), x)
+
+            x, y = cache_dir.cache_arrays('preprocessed/a', factory,
+                                          mmap_mode=None)
+            self.assertEqual(1, counter[0])
+            self.assertNotIsInstance(x, np.memmap)
+            np.testing.assert_equal(np.arange(10, dtype=np.float32), x)
+
+            # produce the arrays again
+            x, y = cache_dir.cache_arrays('preprocessed/a', factory,
+                                          refresh=True)
+            self.assertEqual(2, counter[0])
+            np.testing.assert_equal(np.arange(10, dtype=np.float32), x)
+            x, y = cache_dir.cache_arrays('preprocessed/a', factory)
+            self.assertEqual(2, counter[0])
+
+            # error in the factory should not leave a broken cache
+            def error_factory():
+                yield np.arange(3)
+                raise RuntimeError('error in the factory')
+
+            with pytest.raises(RuntimeError, match='error in the factory'):
+                _ = cache_dir.cache_arrays('preprocessed/b', error_factory)
+            path = os.path.join(cache_dir.path, 'preprocessed/b')
+            self.assertFalse(os.path.exists(path))
+            self.assertFalse(os.path.exists(path + '._saving_'))
+
     def test_download_and_extract_and_purge_all(self):
         with TemporaryDirectory() as tmpdir:
             cache_dir = CacheDir('sub-dir', cache_root=tmpdir)
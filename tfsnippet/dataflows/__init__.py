@@ -1,14 +1,32 @@
 from .array_flow import *
 from .base import *
+from .bucketed_flow import *
+from .cache_flow import *
+from .columnar import *
+from .concat_flow import *
 from .data_mappers import *
+from .filter_flow import *
 from .gather_flow import *
 from .iterator_flow import *
 from .mapper_flow import *
+from .memmap_flow import *
+from .multiprocess_flow import *
+from .parallel_mapper_flow import *
+from .permutation import *
+from .profiler import *
+from .rebatch_flow import *
+from .sampling_flow import *
 from .seq_flow import *
+from .sharded_flow import *
+from .shuffle_buffer_flow import *
 from .threading_flow import *
 
 __all__ = [
-    'ArrayFlow', 'DataFlow', 'DataMapper', 'ExtraInfoDataFlow', 'GatherFlow',
-    'IteratorFactoryFlow', 'MapperFlow', 'SeqFlow', 'SlidingWindow',
-    'ThreadingFlow',
+    'ArrayFlow', 'BucketedFlow', 'CacheFlow', 'ColumnarFlow', 'ColumnarWriter',
+    'ConcatFlow', 'DataFlow', 'DataFlowProfiler', 'DataMapper',
+    'ExtraInfoDataFlow', 'FeistelPermutation', 'FilterFlow', 'GatherFlow',
+    'IteratorFactoryFlow', 'MapperFlow', 'MemmapFlow', 'MultiprocessFlow',
+    'ParallelMapperFlow', 'RebatchFlow', 'SeqFlow', 'ShardedArrayFlow',
+    'ShuffleBufferFlow', 'SlidingWindow', 'StratifiedSamplingFlow',
+    'ThreadingFlow', 'WeightedSamplingFlow',
 ]
@@ -1,8 +1,10 @@
 import numpy as np
 from numpy.random import RandomState
 
-from tfsnippet.utils import minibatch_slices_iterator, generate_random_seed
+from tfsnippet.utils import (minibatch_slices_iterator, generate_random_seed,
+                             CheckpointSavableObject)
 from .base import ExtraInfoDataFlow
+from .permutation import FeistelPermutation
 
 __all__ = ['ArrayFlow']
 
@@ -13,7 +15,7 @@ def _make_readonly(arr):
     return arr
 
 
-class ArrayFlow(ExtraInfoDataFlow):
+class ArrayFlow(ExtraInfoDataFlow, CheckpointSavableObject):
     """
     Using numpy-like arrays as data source flow.
 
@@ -23,10 +25,25 @@ class ArrayFlow(ExtraInfoDataFlow):
                                      skip_incomplete=True)
         for batch_x, batch_y in array_flow:
             ...
+
+    The iteration state (the random state at the beginning of the current
+    epoch, and the number of mini-batches obtained in this epoch) can be
+    saved along with the :class:`~tfsnippet.scaffold.TrainLoop`, such that
+    a resumed training skips directly to the next mini-batch::
+
+        with TrainLoop(...,
+                       checkpoint_dir='./checkpoint',
+                       checkpoint_save_objects={'train_flow': array_flow}):
+            ...
+
+    Note that the state of this flow is ahead of the consumer, if it is
+    wrapped by prefetching flows (e.g., :class:`ThreadingFlow`).
     """
 
     def __init__(self, arrays, batch_size,
-                 shuffle=False, skip_incomplete=False, random_state=None):
+                 shuffle=False, skip_incomplete=False, random_state=None,
+                 ring_buffer_size=None, shuffle_block_size=None,
+                 shuffle_seed=None):
         """
         Construct an :class:`ArrayFlow`.
 
@@ -42,6 +59,36 @@ class ArrayFlow(ExtraInfoDataFlow):
             random_state (RandomState): Optional numpy RandomState for
                 shuffling data before each epoch.  (default :obj:`None`,
                 construct a new :class:`RandomState`).
+            ring_buffer_size (None or int): If specified, gather shuffled
+                mini-batches into this number of pre-allocated buffers,
+                which are reused in a round-robin manner, instead of
+                allocating new arrays for each mini-batch.  `arrays` must
+                be numpy arrays in this case.
+
+                A mini-batch gathered into the buffers remains valid only
+                until another `ring_buffer_size` mini-batches have been
+                obtained from this flow, after which its content will be
+                overwritten.  Thus it should be larger than the number of
+                mini-batches retained by the consumer at the same time
+                (e.g., ``prefetch + 2`` for :class:`ThreadingFlow`),
+                and consumers which keep all mini-batches (e.g.,
+                :meth:`get_arrays`) must not be used.
+                (default :obj:`None`, allocate new arrays)
+            shuffle_block_size (None or int): If specified, shuffle the
+                data by contiguous blocks of this size, rather than by
+                individual items.  A mini-batch lying within a single block
+                is then returned as a read-only view of `arrays`, without
+                any copy.  It should better be a multiple of `batch_size`.
+                Only used when `shuffle` is :obj:`True`.
+                (default :obj:`None`, shuffle individual items)
+            shuffle_seed (None or int): If specified, shuffle the data by
+                a :class:`~tfsnippet.dataflows.FeistelPermutation` determined
+                by ``(shuffle_seed, epoch)``, which computes the shuffled
+                indices of each mini-batch on the fly, with O(1) extra
+                memory, instead of shuffling the indices by `random_state`.
+                Cannot be specified along with `shuffle_block_size`.
+                Only used when `shuffle` is :obj:`True`.
+                (default :obj:`None`)
         """
         # validate parameters
         arrays = tuple(arrays)
@@ -56,6 +103,23 @@ class ArrayFlow(ExtraInfoDataFlow):
         for a in arrays[1:]:
             if len(a) != data_length:
                 raise ValueError('`arrays` must have the same data length.')
+        if ring_buffer_size is not None:
+            ring_buffer_size = int(ring_buffer_size)
+            if ring_buffer_size < 1:
+                raise ValueError('`ring_buffer_size` must be at least 1.')
+            for a in arrays:
+                if not isinstance(a, np.ndarray):
+                    raise ValueError('`arrays` must be numpy arrays when '
+                                     '`ring_buffer_size` is specified.')
+        if shuffle_block_size is not None:
+            shuffle_block_size = int(shuffle_block_size)
+            if shuffle_block_size < 1:
+                raise ValueError('`shuffle_block_size` must be at least 1.')
+        if shuffle_seed is not None:
+            shuffle_seed = int(shuffle_seed)
+            if shuffle_block_size is not None:
+                raise ValueError('`shuffle_seed` and `shuffle_block_size` '
+                                 'cannot be both specified.')
 
         # memorize the parameters
         super(ArrayFlow, self).__init__(
@@ -69,35 +133,241 @@ class ArrayFlow(ExtraInfoDataFlow):
         self._arrays = arrays
         self._random_state = \
             random_state or np.random.RandomState(generate_random_seed())
+        self._ring_buffer_size = ring_buffer_size
+        self._shuffle_block_size = shuffle_block_size
+        self._shuffle_seed = shuffle_seed
+
+        # internal ring buffers for gathering mini-batches
+        self._ring_buffers = None
+        self._ring_cursor = 0
 
-        # internal indices buffer
-        self._indices_buffer = None
+        # the iteration state
+        self._epoch = 0
+        self._epoch_random_state = None
+        self._indices_buffer = None  # shuffled in place at each epoch
+        self._reuse_indices = False  # whether to reuse the restored indices
+        self._batch_cursor = 0
+        self._skip_batches = 0
 
     @property
     def the_arrays(self):
         """Get the tuple of arrays accessed by this :class:`ArrayFlow`."""
         return self._arrays
 
+    @property
+    def ring_buffer_size(self):
+        """Get the number of pre-allocated buffers for mini-batches."""
+        return self._ring_buffer_size
+
+    @property
+    def shuffle_block_size(self):
+        """Get the size of contiguous blocks for shuffling."""
+        return self._shuffle_block_size
+
+    @property
+    def shuffle_seed(self):
+        """Get the seed of the counter-based permutations for shuffling."""
+        return self._shuffle_seed
+
+    def shard(self, num_shards, shard_index, seed=None, tail='pad'):
+        """
+        Construct a :class:`~tfsnippet.dataflows.ShardedArrayFlow`, which
+        iterates through one shard of the arrays of this flow.
+
+        The batch size, shuffling and other options are inherited from
+        this flow, except that the shuffling is driven by `seed`, rather
+        than the random state of this flow.  If `shuffle_seed` of this
+        flow is specified, the shards are taken from the same counter-based
+        permutations as this flow, i.e., the union of the shards is
+        identical to an epoch of this flow (apart from the tail).  If
+        `shuffle_block_size` of this flow is specified, the shards are
+        taken from the same block-shuffled order, determined by `seed`.
+
+        Args:
+            num_shards (int): The number of shards.
+            shard_index (int): The index of the shard, ranging from ``0``
+                to ``num_shards - 1``.
+            seed (int): The seed of the permutations shared by all the
+                shards.  Required if this flow is shuffled, unless
+                `shuffle_seed` of this flow is specified.
+                (default :obj:`None`, use `shuffle_seed` of this flow)
+            tail ({'pad', 'drop'}): Whether to pad or to drop the data
+                which cannot be evenly divided into shards?
+                (default "pad")
+
+        Returns:
+            tfsnippet.dataflows.ShardedArrayFlow: The sharded data flow.
+        """
+        from .sharded_flow import ShardedArrayFlow
+        counter_based = self._shuffle_seed is not None
+        if seed is None:
+            seed = self._shuffle_seed
+        return ShardedArrayFlow(
+            arrays=self.the_arrays, batch_size=self.batch_size,
+            num_shards=num_shards, shard_index=shard_index,
+            shuffle=self.is_shuffled, skip_incomplete=self.skip_incomplete,
+            seed=seed, tail=tail, ring_buffer_size=self.ring_buffer_size,
+            shuffle_block_size=self.shuffle_block_size,
+            counter_based=counter_based
+        )
+
+    def get_state(self):
+        """
+        Get the iteration state of this flow.
+
+        Returns:
+            dict: The state dict, with the state of the random state and
+                the index of the current epoch (or of the next epoch, if no
+                epoch is in progress), and the number of mini-batches which
+                have been obtained in the current epoch.  If the flow is
+                shuffled by its random state, the shuffled indices are also
+                included, since the permutation of each epoch is shuffled
+                in place from that of the previous epoch.
+        """
+        epoch = self._epoch
+        if self._batch_cursor:
+            epoch -= 1
+        state = {'epoch': epoch, 'batch_cursor': self._batch_cursor}
+        if self._indices_buffer is not None:
+            # the random state has been advanced by the shuffling of the
+            # epoch in progress, which is thus resumed from the indices
+            state['random_state'] = self._random_state.get_state()
+            state['indices'] = self._indices_buffer.copy()
+            state['reuse_indices'] = \
+                bool(self._batch_cursor) or self._reuse_indices
+        elif self._batch_cursor:
+            state['random_state'] = self._epoch_random_state
+        else:
+            state['random_state'] = self._random_state.get_state()
+        return state
+
+    def set_state(self, state):
+        """
+        Set the iteration state of this flow.
+
+        The next epoch will reproduce the permutation of the epoch in
+        progress when the state was taken, skipping the mini-batches which
+        have already been obtained.
+
+        Args:
+            state (dict): The state dict, obtained by :meth:`get_state`.
+        """
+        self._random_state.set_state(state['random_state'])
+        indices = state.get('indices')
+        if indices is not None:
+            self._indices_buffer = np.array(indices, dtype=self._index_dtype())
+            self._reuse_indices = bool(state.get('reuse_indices'))
+        else:
+            self._indices_buffer = None
+            self._reuse_indices = False
+        self._epoch = state.get('epoch', self._epoch)
+        self._batch_cursor = 0
+        self._skip_batches = state['batch_cursor']
+
+    def _iter_batch_slices(self, length=None):
+        # iterate through the mini-batch slices of an epoch, skipping the
+        # mini-batches restored by `set_state`, and tracking the cursor
+        skip_batches = self._skip_batches
+        self._skip_batches = 0
+        for i, batch_s in enumerate(minibatch_slices_iterator(
+                length=self.data_length if length is None else length,
+                batch_size=self.batch_size,
+                skip_incomplete=self.skip_incomplete)):
+            if i >= skip_batches:
+                self._batch_cursor = i + 1
+                yield batch_s
+        self._batch_cursor = 0
+
+    def _index_dtype(self):
+        return np.int32 if self._data_length < (1 << 31) else np.int64
+
+    def _gather(self, indices):
+        if self._ring_buffer_size is None:
+            return tuple(_make_readonly(a[indices]) for a in self.the_arrays)
+
+        if self._ring_buffers is None:
+            self._ring_buffers = [
+                tuple(np.empty((self.batch_size,) + a.shape[1:],
+                               dtype=a.dtype)
+                      for a in self.the_arrays)
+                for _ in range(self._ring_buffer_size)
+            ]
+        buffers = self._ring_buffers[self._ring_cursor]
+        self._ring_cursor = (self._ring_cursor + 1) % self._ring_buffer_size
+
+        # ``mode='clip'`` avoids the internal buffering of ``np.take``,
+        # and the indices are always valid here.
+        count = len(indices)
+        return tuple(
+            _make_readonly(np.take(a, indices, axis=0, out=buf[:count],
+                                   mode='clip'))
+            for a, buf in zip(self.the_arrays, buffers)
+        )
+
+    def _block_shuffled_getter(self, random_state, length):
+        # shuffle the blocks of the first `length` items by `random_state`,
+        # and get the mini-batches by slices of positions in the shuffled
+        # order, where the positions beyond `length` wrap around
+        block_size = self._shuffle_block_size
+        t = self._index_dtype()
+        block_count = (length + block_size - 1) // block_size
+        block_starts = np.arange(block_count, dtype=t) * block_size
+        random_state.shuffle(block_starts)
+        block_lengths = np.minimum(block_size, length - block_starts)
+        # the offsets of the blocks in the shuffled order
+        offsets = np.concatenate([[0], np.cumsum(block_lengths)]).astype(t)
+
+        def get_slice(s):
+            i = np.searchsorted(offsets, s.start, side='right') - 1
+            if s.stop <= offsets[i + 1]:
+                # the mini-batch lies within one block, return a view
+                start = block_starts[i] + (s.start - offsets[i])
+                view_s = slice(start, start + (s.stop - s.start))
+                return tuple(_make_readonly(a[view_s])
+                             for a in self.the_arrays)
+
+            # the mini-batch crosses blocks, gather the indices
+            positions = np.arange(s.start, s.stop, dtype=t) % length
+            k = np.searchsorted(offsets, positions, side='right') - 1
+            return self._gather(block_starts[k] + (positions - offsets[k]))
+
+        return get_slice
+
     def _minibatch_iterator(self):
+        self._epoch_random_state = self._random_state.get_state()
+        epoch = self._epoch
+        self._epoch += 1
+
         # shuffle the source arrays if necessary
-        if self.is_shuffled:
+        if self.is_shuffled and self._shuffle_seed is not None:
+            permutation = FeistelPermutation(
+                self._data_length, seed=self._shuffle_seed, epoch=epoch)
+            t = self._index_dtype()
+
+            def get_slice(s):
+                positions = np.arange(s.start, s.stop, dtype=t)
+                return self._gather(permutation(positions).astype(t))
+        elif self.is_shuffled and self._shuffle_block_size is not None:
+            get_slice = self._block_shuffled_getter(
+                self._random_state, self._data_length)
+        elif self.is_shuffled:
+            # shuffle the indices in place from the last epoch, unless the
+            # permutation of an epoch in progress has been restored
             if self._indices_buffer is None:
-                t = np.int32 if self._data_length < (1 << 31) else np.int64
-                self._indices_buffer = np.arange(self._data_length, dtype=t)
-            self._random_state.shuffle(self._indices_buffer)
+                self._indices_buffer = np.arange(
+                    self._data_length, dtype=self._index_dtype())
+            if self._reuse_indices:
+                self._reuse_indices = False
+            else:
+                self._random_state.shuffle(self._indices_buffer)
+            indices = self._indices_buffer
 
             def get_slice(s):
-                return tuple(
-                    _make_readonly(a[self._indices_buffer[s]])
-                    for a in self.the_arrays
-                )
+                return self._gather(indices[s])
         else:
             def get_slice(s):
                 return tuple(_make_readonly(a[s]) for a in self.the_arrays)
 
         # now iterator through the mini-batches
-        for batch_s in minibatch_slices_iterator(
-                length=self.data_length,
-                batch_size=self.batch_size,
-                skip_incomplete=self.skip_incomplete):
+        for batch_s in self._iter_batch_slices():
             yield get_slice(batch_s)
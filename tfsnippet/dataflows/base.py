@@ -154,9 +154,12 @@ class DataFlow(object):
             raise
 
     # -------- here starts the transforming methods --------
-    def map(self, mapper, array_indices=None):
+    def map(self, mapper, array_indices=None, workers=None, ordered=True,
+            backend='thread', prefetch=None):
         """
-        Construct a :class:`~tfsnippet.dataflows.MapperFlow`.
+        Construct a :class:`~tfsnippet.dataflows.MapperFlow`, or a
+        :class:`~tfsnippet.dataflows.ParallelMapperFlow` if `workers`
+        is specified.
 
         Args:
             mapper ((\*np.ndarray) -> tuple[np.ndarray])): The mapper
@@ -171,10 +174,28 @@ class DataFlow(object):
 
                 If not specified, apply the mapper on all arrays, and do
                 not require the number of output arrays to match the inputs.
+            workers (None or int): If specified, apply the mapper on the
+                upcoming mini-batches with this number of workers.
+                (default :obj:`None`, apply the mapper serially)
+            ordered (bool): Whether or not to preserve the order of the
+                mini-batches?  Ignored if `workers` is not specified.
+                (default :obj:`True`)
+            backend ({'thread', 'process'}): Whether to run the mapper in
+                worker threads or in worker processes?  Ignored if `workers`
+                is not specified. (default "thread")
+            prefetch (int): Maximum number of mini-batches in flight.
+                Ignored if `workers` is not specified.
+                (default ``2 * workers``)
 
         Returns:
             tfsnippet.dataflow.MapperFlow: The data flow with `mapper` applied.
         """
+        if workers is not None:
+            from .parallel_mapper_flow import ParallelMapperFlow
+            return ParallelMapperFlow(
+                self, mapper, array_indices=array_indices, workers=workers,
+                ordered=ordered, backend=backend, prefetch=prefetch
+            )
         from .mapper_flow import MapperFlow
         return MapperFlow(self, mapper, array_indices=array_indices)
 
@@ -193,6 +214,29 @@ class DataFlow(object):
         from .threading_flow import ThreadingFlow
         return ThreadingFlow(self, prefetch=prefetch)
 
+    def multiprocess(self, workers, prefetch, worker_init_func=None):
+        """
+        Construct a :class:`~tfsnippet.dataflows.MultiprocessFlow` from
+        this flow.
+
+        Args:
+            workers (int): Number of worker processes.  It should be at
+                least 1.
+            prefetch (int): Number of mini-batches to prefetch ahead,
+                including those being processed by the workers.
+                It should be at least 1.
+            worker_init_func ((int) -> None): Optional function to be called
+                in each worker process before it starts working, with the
+                index of the worker as argument.
+
+        Returns:
+            tfsnippet.dataflow.MultiprocessFlow: The data flow to prefetch
+                mini-batches from this flow with worker processes.
+        """
+        from .multiprocess_flow import MultiprocessFlow
+        return MultiprocessFlow(self, workers=workers, prefetch=prefetch,
+                                worker_init_func=worker_init_func)
+
     def select(self, indices):
         """
         Construct a :class:`DataFlow`, which selects and rearranges arrays
@@ -210,9 +254,115 @@ class DataFlow(object):
         indices = tuple(indices)
         return self.map(lambda *arrays: tuple(arrays[i] for i in indices))
 
+    def filter(self, predicate, array_indices=None, batch_size=None,
+               skip_incomplete=False):
+        """
+        Construct a :class:`~tfsnippet.dataflows.FilterFlow`, which drops
+        the samples from this flow according to `predicate`.  For example::
+
+            flow = DataFlow.arrays([x, y], batch_size=64)
+            # keeps only the samples with positive `y`, and re-batch the
+            # remaining samples into mini-batches of 64
+            flow.filter(lambda x, y: y > 0, batch_size=64)
+
+        Args:
+            predicate ((\*np.ndarray) -> np.ndarray): The predicate function,
+                which receives the arrays of a mini-batch, and returns a 1-d
+                boolean mask, indicating which samples should be kept.
+            array_indices (int or Iterable[int]): The indices of the arrays
+                to be passed to the predicate.  If not specified, all the
+                arrays of a mini-batch will be passed to the predicate.
+            batch_size (None or int): If specified, re-batch the filtered
+                samples into mini-batches of this size, by a
+                :class:`~tfsnippet.dataflows.RebatchFlow`.
+                (default :obj:`None`, do not re-batch)
+            skip_incomplete (bool): Whether or not to exclude the last
+                mini-batch if it is incomplete?  Ignored if `batch_size`
+                is not specified. (default :obj:`False`)
+
+        Returns:
+            DataFlow: The filtered data flow.
+        """
+        from .filter_flow import FilterFlow
+        flow = FilterFlow(self, predicate, array_indices=array_indices)
+        if batch_size is not None:
+            flow = flow.rebatch(batch_size, skip_incomplete=skip_incomplete)
+        return flow
+
+    def rebatch(self, batch_size, skip_incomplete=False,
+                ring_buffer_size=None):
+        """
+        Construct a :class:`~tfsnippet.dataflows.RebatchFlow`, which splits
+        and stitches the mini-batches from this flow into mini-batches of
+        `batch_size`.
+
+        Args:
+            batch_size (int): Size of each mini-batch.
+            skip_incomplete (bool): Whether or not to exclude the last
+                mini-batch if it is incomplete? (default :obj:`False`)
+            ring_buffer_size (None or int): If specified, stitch mini-batches
+                into this number of reused buffers.  See
+                :class:`~tfsnippet.dataflows.RebatchFlow` for the lifetime
+                of the mini-batches in this case. (default :obj:`None`)
+
+        Returns:
+            tfsnippet.dataflow.RebatchFlow: The re-batched data flow.
+        """
+        from .rebatch_flow import RebatchFlow
+        return RebatchFlow(self, batch_size=batch_size,
+                           skip_incomplete=skip_incomplete,
+                           ring_buffer_size=ring_buffer_size)
+
+    def shuffle_buffer(self, buffer_size, batch_size=None,
+                       skip_incomplete=False, seed=None):
+        """
+        Construct a :class:`~tfsnippet.dataflows.ShuffleBufferFlow`, which
+        shuffles the items from this flow with a bounded buffer.
+
+        Args:
+            buffer_size (int): The number of items in the shuffle buffer.
+            batch_size (int): Size of each mini-batch.
+                (default :obj:`None`, use the batch size of this flow)
+            skip_incomplete (bool): Whether or not to exclude the last
+                mini-batch if it is incomplete? (default :obj:`False`)
+            seed (int): The seed of the random state for choosing items
+                from the buffer.  (default :obj:`None`, use a random seed)
+
+        Returns:
+            tfsnippet.dataflow.ShuffleBufferFlow: The shuffled data flow.
+        """
+        from .shuffle_buffer_flow import ShuffleBufferFlow
+        return ShuffleBufferFlow(
+            self, buffer_size=buffer_size, batch_size=batch_size,
+            skip_incomplete=skip_incomplete, seed=seed
+        )
+
+    def cache(self, path=None, max_bytes=None, cache_key=None):
+        """
+        Construct a :class:`~tfsnippet.dataflows.CacheFlow`, which records
+        the mini-batches from this flow in the first epoch, and replays them
+        from the second epoch on.
+
+        Args:
+            path (str): If specified, record the mini-batches into this
+                directory.  (default :obj:`None`, record in memory)
+            max_bytes (int): If specified, give up caching if the recorded
+                mini-batches exceed this number of bytes.
+                (default :obj:`None`, no limit)
+            cache_key (str): If specified, use this key to identify the
+                mappers of this flow, instead of computing their identities.
+                (default :obj:`None`)
+
+        Returns:
+            tfsnippet.dataflow.CacheFlow: The cached data flow.
+        """
+        from .cache_flow import CacheFlow
+        return CacheFlow(self, path=path, max_bytes=max_bytes,
+                         cache_key=cache_key)
+
     # -------- here starts the factory methods for data flows --------
     @staticmethod
-    def gather(flows):
+    def gather(flows, prefetch=None):
         """
         Gather multiple data flows into a single flow.
 
@@ -220,6 +370,10 @@ class DataFlow(object):
             flows(Iterable[DataFlow]): The data flows to gather.
                 At least one data flow should be specified, otherwise a
                 :class:`ValueError` will be raised.
+            prefetch (None or int): If specified, fetch from the flows
+                concurrently in background threads, with this number of
+                mini-batches prefetched ahead for each flow.
+                (default :obj:`None`, fetch serially)
 
         Returns:
             tfsnippet.dataflow.GatherFlow: The gathered data flow.
@@ -229,7 +383,27 @@ class DataFlow(object):
             TypeError: If a specified flow is not a :class:`DataFlow`.
         """
         from .gather_flow import GatherFlow
-        return GatherFlow(tuple(flows))
+        return GatherFlow(tuple(flows), prefetch=prefetch)
+
+    @staticmethod
+    def concat(flows):
+        """
+        Concatenate multiple data flows into a single flow.
+
+        Args:
+            flows(Iterable[DataFlow]): The data flows to concatenate.
+                At least one data flow should be specified, otherwise a
+                :class:`ValueError` will be raised.
+
+        Returns:
+            tfsnippet.dataflow.ConcatFlow: The concatenated data flow.
+
+        Raises:
+            ValueError: If not even one data flow is specified.
+            TypeError: If a specified flow is not a :class:`DataFlow`.
+        """
+        from .concat_flow import ConcatFlow
+        return ConcatFlow(tuple(flows))
 
     @staticmethod
     def seq(start, stop, step=1, batch_size=None, shuffle=False,
@@ -263,7 +437,8 @@ class DataFlow(object):
 
     @staticmethod
     def arrays(arrays, batch_size, shuffle=False, skip_incomplete=False,
-               random_state=None):
+               random_state=None, ring_buffer_size=None,
+               shuffle_block_size=None, shuffle_seed=None):
         """
         Construct an :class:`~tfsnippet.dataflows.ArrayFlow`.
 
@@ -279,6 +454,15 @@ class DataFlow(object):
             random_state (RandomState): Optional numpy RandomState for
                 shuffling data before each epoch.  (default :obj:`None`,
                 construct a new :class:`RandomState`).
+            ring_buffer_size (None or int): If specified, gather shuffled
+                mini-batches into this number of reused buffers.  See
+                :class:`~tfsnippet.dataflows.ArrayFlow` for the lifetime
+                of the mini-batches in this case. (default :obj:`None`)
+            shuffle_block_size (None or int): If specified, shuffle the
+                data by contiguous blocks of this size. (default :obj:`None`)
+            shuffle_seed (None or int): If specified, shuffle the data by
+                counter-based permutations determined by ``(shuffle_seed,
+                epoch)``, computed on the fly. (default :obj:`None`)
 
         Returns:
             tfsnippet.dataflow.ArrayFlow: The data flow from arrays.
@@ -286,7 +470,217 @@ class DataFlow(object):
         from .array_flow import ArrayFlow
         return ArrayFlow(
             arrays=arrays, batch_size=batch_size, shuffle=shuffle,
-            skip_incomplete=skip_incomplete, random_state=random_state
+            skip_incomplete=skip_incomplete, random_state=random_state,
+            ring_buffer_size=ring_buffer_size,
+            shuffle_block_size=shuffle_block_size,
+            shuffle_seed=shuffle_seed
+        )
+
+    @staticmethod
+    def weighted(arrays, weights, batch_size, replacement=True,
+                 epoch_size=None, skip_incomplete=False, random_state=None,
+                 ring_buffer_size=None):
+        """
+        Construct a :class:`~tfsnippet.dataflows.WeightedSamplingFlow`.
+
+        Args:
+            arrays: List of numpy-like arrays, to be iterated through
+                mini-batches.  These arrays should be at least 1-d,
+                with identical first dimension.
+            weights: 1-d array, the non-negative weights of the items.
+            batch_size (int): Size of each mini-batch.
+            replacement (bool): Whether or not to sample the items with
+                replacement? (default :obj:`True`)
+            epoch_size (int): The number of items to sample in each epoch.
+                (default :obj:`None`, the length of `arrays`)
+            skip_incomplete (bool): Whether or not to exclude the last
+                mini-batch if it is incomplete? (default :obj:`False`)
+            random_state (RandomState): Optional numpy RandomState for
+                sampling data in each epoch.  (default :obj:`None`,
+                construct a new :class:`RandomState`).
+            ring_buffer_size (None or int): If specified, gather mini-batches
+                into this number of reused buffers.  See
+                :class:`~tfsnippet.dataflows.ArrayFlow` for the lifetime
+                of the mini-batches in this case. (default :obj:`None`)
+
+        Returns:
+            tfsnippet.dataflow.WeightedSamplingFlow: The data flow.
+        """
+        from .sampling_flow import WeightedSamplingFlow
+        return WeightedSamplingFlow(
+            arrays=arrays, weights=weights, batch_size=batch_size,
+            replacement=replacement, epoch_size=epoch_size,
+            skip_incomplete=skip_incomplete, random_state=random_state,
+            ring_buffer_size=ring_buffer_size
+        )
+
+    @staticmethod
+    def stratified(arrays, labels, batch_size, proportions=None,
+                   epoch_size=None, skip_incomplete=False, random_state=None,
+                   ring_buffer_size=None):
+        """
+        Construct a :class:`~tfsnippet.dataflows.StratifiedSamplingFlow`.
+
+        Args:
+            arrays: List of numpy-like arrays, to be iterated through
+                mini-batches.  These arrays should be at least 1-d,
+                with identical first dimension.
+            labels: 1-d array, the class labels of the items.
+            batch_size (int): Size of each mini-batch.
+            proportions (dict): The proportions of the classes in each
+                mini-batch, ``{label: proportion}``.  (default :obj:`None`,
+                the proportions of the classes in `labels`)
+            epoch_size (int): The number of items to sample in each epoch.
+                (default :obj:`None`, the length of `arrays`)
+            skip_incomplete (bool): Whether or not to exclude the last
+                mini-batch if it is incomplete? (default :obj:`False`)
+            random_state (RandomState): Optional numpy RandomState for
+                sampling data in each epoch.  (default :obj:`None`,
+                construct a new :class:`RandomState`).
+            ring_buffer_size (None or int): If specified, gather mini-batches
+                into this number of reused buffers.  See
+                :class:`~tfsnippet.dataflows.ArrayFlow` for the lifetime
+                of the mini-batches in this case. (default :obj:`None`)
+
+        Returns:
+            tfsnippet.dataflow.StratifiedSamplingFlow: The data flow.
+        """
+        from .sampling_flow import StratifiedSamplingFlow
+        return StratifiedSamplingFlow(
+            arrays=arrays, labels=labels, batch_size=batch_size,
+            proportions=proportions, epoch_size=epoch_size,
+            skip_incomplete=skip_incomplete, random_state=random_state,
+            ring_buffer_size=ring_buffer_size
+        )
+
+    @staticmethod
+    def memmap(paths, batch_size, shuffle=False, skip_incomplete=False,
+               random_state=None, dtypes=None, shapes=None,
+               sort_indices=True, advice=None, ring_buffer_size=None,
+               shuffle_block_size=None):
+        """
+        Construct a :class:`~tfsnippet.dataflows.MemmapFlow`.
+
+        Args:
+            paths (Iterable[str]): Paths of the ".npy" files, or the raw
+                binary files if `dtypes` is specified.
+            batch_size (int): Size of each mini-batch.
+            shuffle (bool): Whether or not to shuffle data before iterating?
+                (default :obj:`False`)
+            skip_incomplete (bool): Whether or not to exclude the last
+                mini-batch if it is incomplete? (default :obj:`False`)
+            random_state (RandomState): Optional numpy RandomState for
+                shuffling data before each epoch.  (default :obj:`None`,
+                construct a new :class:`RandomState`).
+            dtypes: The data types of the raw binary files.
+                (default :obj:`None`, the files are ".npy" files)
+            shapes: The shapes of each item in the raw binary files,
+                excluding the first dimension.  (default :obj:`None`)
+            sort_indices (bool): Whether or not to sort the indices of each
+                shuffled mini-batch before gathering? (default :obj:`True`)
+            advice (None or str): The access pattern to advise the kernel,
+                one of {"normal", "sequential", "random", "willneed"}.
+                (default :obj:`None`)
+            ring_buffer_size (None or int): If specified, gather shuffled
+                mini-batches into this number of reused buffers.  See
+                :class:`~tfsnippet.dataflows.ArrayFlow` for the lifetime
+                of the mini-batches in this case. (default :obj:`None`)
+            shuffle_block_size (None or int): If specified, shuffle the
+                data by contiguous blocks of this size. (default :obj:`None`)
+
+        Returns:
+            tfsnippet.dataflow.MemmapFlow: The data flow from memory-mapped
+                files.
+        """
+        from .memmap_flow import MemmapFlow
+        return MemmapFlow(
+            paths=paths, batch_size=batch_size, shuffle=shuffle,
+            skip_incomplete=skip_incomplete, random_state=random_state,
+            dtypes=dtypes, shapes=shapes, sort_indices=sort_indices,
+            advice=advice, ring_buffer_size=ring_buffer_size,
+            shuffle_block_size=shuffle_block_size
+        )
+
+    @staticmethod
+    def columnar(path, batch_size, shuffle=False, skip_incomplete=False,
+                 random_state=None, shuffle_block_size=None, workers=None,
+                 cache_chunks=4):
+        """
+        Construct a :class:`~tfsnippet.dataflows.ColumnarFlow`.
+
+        Args:
+            path (str): Path of the columnar record file, written by
+                :class:`~tfsnippet.dataflows.ColumnarWriter`.
+            batch_size (int): Size of each mini-batch.
+            shuffle (bool): Whether or not to shuffle data before iterating?
+                (default :obj:`False`)
+            skip_incomplete (bool): Whether or not to exclude the last
+                mini-batch if it is incomplete? (default :obj:`False`)
+            random_state (RandomState): Optional numpy RandomState for
+                shuffling data before each epoch.  (default :obj:`None`,
+                construct a new :class:`RandomState`).
+            shuffle_block_size (None or int): If specified, shuffle the
+                data by contiguous blocks of this size. (default :obj:`None`)
+            workers (None or int): If specified, decompress the blocks with
+                a pool of this number of threads. (default :obj:`None`)
+            cache_chunks (int): The number of decompressed chunks to keep
+                in the cache.  (default ``4``)
+
+        Returns:
+            tfsnippet.dataflow.ColumnarFlow: The data flow from the
+                columnar record file.
+        """
+        from .columnar import ColumnarFlow
+        return ColumnarFlow(
+            path=path, batch_size=batch_size, shuffle=shuffle,
+            skip_incomplete=skip_incomplete, random_state=random_state,
+            shuffle_block_size=shuffle_block_size, workers=workers,
+            cache_chunks=cache_chunks
+        )
+
+    @staticmethod
+    def bucketed(sequences, lengths, batch_size, bucket_boundaries,
+                 arrays=None, shuffle=False, skip_incomplete=False,
+                 random_state=None, pad_value=0, mask_dtype=np.bool_,
+                 ring_buffer_size=None):
+        """
+        Construct a :class:`~tfsnippet.dataflows.BucketedFlow`.
+
+        Args:
+            sequences: List of variable-length sequence collections, each
+                being a list of numpy arrays, or a padded numpy array.
+            lengths: 1-d integer array, the lengths of the sequences.
+            batch_size (int): Size of each mini-batch.
+            bucket_boundaries (Iterable[int]): Increasing upper boundaries
+                (exclusive) of the sequence lengths of the buckets.
+            arrays: List of fixed-shape numpy-like arrays, to be iterated
+                along with the sequences.  (default :obj:`None`)
+            shuffle (bool): Whether or not to shuffle data before iterating?
+                (default :obj:`False`)
+            skip_incomplete (bool): Whether or not to exclude the last
+                incomplete mini-batch of each bucket? (default :obj:`False`)
+            random_state (RandomState): Optional numpy RandomState for
+                shuffling data before each epoch.  (default :obj:`None`,
+                construct a new :class:`RandomState`).
+            pad_value: The value for padding the list of sequences.
+                (default 0)
+            mask_dtype: The data type of the mask array.
+                (default :obj:`np.bool_`)
+            ring_buffer_size (None or int): If specified, pad the mini-batches
+                into this number of reused buffers.  See
+                :class:`~tfsnippet.dataflows.ArrayFlow` for the lifetime
+                of the mini-batches in this case. (default :obj:`None`)
+
+        Returns:
+            tfsnippet.dataflow.BucketedFlow: The data flow from sequences.
+        """
+        from .bucketed_flow import BucketedFlow
+        return BucketedFlow(
+            sequences=sequences, lengths=lengths, batch_size=batch_size,
+            bucket_boundaries=bucket_boundaries, arrays=arrays,
+            shuffle=shuffle, skip_incomplete=skip_incomplete,
+            random_state=random_state, pad_value=pad_value,
+            mask_dtype=mask_dtype, ring_buffer_size=ring_buffer_size
         )
 
     @staticmethod
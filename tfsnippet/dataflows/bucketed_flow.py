@@ -0,0 +1,277 @@
+import numpy as np
+
+from tfsnippet.utils import minibatch_slices_iterator, generate_random_seed
+from .array_flow import _make_readonly
+from .base import ExtraInfoDataFlow
+
+__all__ = ['BucketedFlow']
+
+
+class BucketedFlow(ExtraInfoDataFlow):
+    """
+    Using variable-length sequences as data source flow, grouping the
+    sequences of similar lengths into the same mini-batches.
+
+    The sequences are assigned to buckets according to their lengths and
+    `bucket_boundaries`, and each mini-batch is taken from one bucket.
+    The sequences in a mini-batch are padded to the maximum length within
+    this mini-batch (rather than the maximum length of all the data), and
+    a mask array is yielded after the padded sequence arrays, followed by
+    the other fixed-shape arrays.
+
+    Usage::
+
+        # `tokens` is a list of 1-d int arrays, `labels` is an array
+        lengths = np.asarray([len(t) for t in tokens])
+        bucketed_flow = DataFlow.bucketed(
+            [tokens], lengths, batch_size=64, bucket_boundaries=[16, 32, 64],
+            arrays=[labels], shuffle=True
+        )
+        for batch_tokens, batch_mask, batch_labels in bucketed_flow:
+            # batch_tokens.shape == batch_mask.shape == (64, max_length)
+            ...
+    """
+
+    def __init__(self, sequences, lengths, batch_size, bucket_boundaries,
+                 arrays=None, shuffle=False, skip_incomplete=False,
+                 random_state=None, pad_value=0, mask_dtype=np.bool_,
+                 ring_buffer_size=None):
+        """
+        Construct a :class:`BucketedFlow`.
+
+        Args:
+            sequences: List of variable-length sequence collections.  Each
+                collection is either a list of numpy arrays, whose first
+                dimensions are the lengths of the sequences, or a padded
+                numpy array of shape ``(data_length, max_length, ...)``.
+                The padded parts of the latter are copied as they are.
+            lengths: 1-d integer array, the lengths of the sequences.
+            batch_size (int): Size of each mini-batch.
+            bucket_boundaries (Iterable[int]): Increasing upper boundaries
+                (exclusive) of the sequence lengths of the buckets.  There
+                will be ``len(bucket_boundaries) + 1`` buckets.
+            arrays: List of fixed-shape numpy-like arrays, to be iterated
+                along with the sequences.  (default :obj:`None`)
+            shuffle (bool): Whether or not to shuffle the sequences within
+                each bucket, as well as the mini-batches across the buckets,
+                before iterating? (default :obj:`False`)
+            skip_incomplete (bool): Whether or not to exclude the last
+                incomplete mini-batch of each bucket? (default :obj:`False`)
+            random_state (RandomState): Optional numpy RandomState for
+                shuffling data before each epoch.  (default :obj:`None`,
+                construct a new :class:`RandomState`).
+            pad_value: The value for padding the list of sequences.
+                (default 0)
+            mask_dtype: The data type of the mask array, whose elements are
+                ones at the valid steps and zeros at the padded steps.
+                (default :obj:`np.bool_`)
+            ring_buffer_size (None or int): If specified, pad the mini-batches
+                into this number of pre-allocated buffers, which are reused
+                in a round-robin manner.  See :class:`ArrayFlow` for the
+                lifetime of the mini-batches in this case.
+                (default :obj:`None`, allocate new arrays)
+        """
+        # validate parameters
+        sequences = tuple(sequences)
+        arrays = tuple(arrays or ())
+        if not sequences:
+            raise ValueError('`sequences` must not be empty.')
+        lengths = np.asarray(lengths)
+        if len(lengths.shape) != 1 or \
+                not np.issubdtype(lengths.dtype, np.integer):
+            raise ValueError('`lengths` must be a 1-d integer array.')
+        data_length = len(lengths)
+        max_length = int(lengths.max()) if data_length else 0
+
+        data_shapes = []
+        seq_specs = []  # list of (is_padded, dtype, step_shape)
+        for s in sequences:
+            if isinstance(s, np.ndarray) and s.dtype != np.object_:
+                if len(s.shape) < 2:
+                    raise ValueError('Padded `sequences` must be at least '
+                                     '2-d arrays.')
+                if s.shape[1] < max_length:
+                    raise ValueError('Padded `sequences` are shorter than '
+                                     '`lengths`: {} vs {}.'.
+                                     format(s.shape[1], max_length))
+                seq_specs.append((True, s.dtype, s.shape[2:]))
+            else:
+                if not len(s):
+                    raise ValueError('`sequences` must not be empty lists.')
+                first = np.asarray(s[0])
+                if len(first.shape) < 1:
+                    raise ValueError('`sequences` must be lists of at least '
+                                     '1-d arrays.')
+                seq_specs.append((False, first.dtype, first.shape[1:]))
+            if len(s) != data_length:
+                raise ValueError('`sequences` and `lengths` must have the '
+                                 'same data length.')
+            data_shapes.append((None,) + tuple(seq_specs[-1][2]))
+        data_shapes.append((None,))
+        for a in arrays:
+            if not hasattr(a, 'shape') or len(a.shape) < 1:
+                raise ValueError('`arrays` must be at least 1-d numpy-like '
+                                 'arrays.')
+            if len(a) != data_length:
+                raise ValueError('`arrays` and `lengths` must have the same '
+                                 'data length.')
+            data_shapes.append(tuple(a.shape[1:]))
+
+        bucket_boundaries = np.asarray(bucket_boundaries, dtype=np.int64)
+        if len(bucket_boundaries.shape) != 1 or \
+                np.any(np.diff(bucket_boundaries) <= 0):
+            raise ValueError('`bucket_boundaries` must be a strictly '
+                             'increasing sequence of integers.')
+        if ring_buffer_size is not None:
+            ring_buffer_size = int(ring_buffer_size)
+            if ring_buffer_size < 1:
+                raise ValueError('`ring_buffer_size` must be at least 1.')
+
+        # memorize the parameters
+        super(BucketedFlow, self).__init__(
+            array_count=len(sequences) + 1 + len(arrays),
+            data_length=data_length,
+            data_shapes=tuple(data_shapes),
+            batch_size=batch_size,
+            skip_incomplete=skip_incomplete,
+            is_shuffled=shuffle
+        )
+        self._sequences = sequences
+        self._seq_specs = tuple(seq_specs)
+        self._lengths = lengths
+        self._max_length = max_length
+        self._bucket_boundaries = bucket_boundaries
+        self._arrays = arrays
+        self._random_state = \
+            random_state or np.random.RandomState(generate_random_seed())
+        self._pad_value = pad_value
+        self._mask_dtype = np.dtype(mask_dtype)
+        self._ring_buffer_size = ring_buffer_size
+
+        # the indices of the sequences in each bucket
+        bucket_ids = np.searchsorted(bucket_boundaries, lengths, side='right')
+        order = np.argsort(bucket_ids, kind='mergesort')
+        splits = np.searchsorted(bucket_ids[order],
+                                 np.arange(1, len(bucket_boundaries) + 1))
+        self._bucket_indices = tuple(np.split(order, splits))
+
+        # the steps for building the masks
+        self._steps = np.arange(max_length, dtype=lengths.dtype)
+
+        # internal ring buffers for padding mini-batches
+        self._ring_buffers = None
+        self._ring_cursor = 0
+
+    @property
+    def the_sequences(self):
+        """Get the tuple of sequence collections."""
+        return self._sequences
+
+    @property
+    def the_arrays(self):
+        """Get the tuple of fixed-shape arrays."""
+        return self._arrays
+
+    @property
+    def lengths(self):
+        """Get the lengths of the sequences."""
+        return self._lengths
+
+    @property
+    def bucket_boundaries(self):
+        """Get the upper boundaries of the sequence lengths of the buckets."""
+        return self._bucket_boundaries
+
+    @property
+    def bucket_sizes(self):
+        """Get the number of sequences in each bucket."""
+        return tuple(len(idx) for idx in self._bucket_indices)
+
+    @property
+    def ring_buffer_size(self):
+        """Get the number of pre-allocated buffers for mini-batches."""
+        return self._ring_buffer_size
+
+    def _allocate_buffers(self):
+        # the buffers are flat, such that the padded mini-batches
+        # taken from them are always contiguous
+        buffers = []
+        for _, dtype, step_shape in self._seq_specs:
+            size = self.batch_size * self._max_length * \
+                int(np.prod(step_shape, dtype=np.int64))
+            buffers.append(np.empty([size], dtype=dtype))
+        buffers.append(np.empty([self.batch_size * self._max_length],
+                                dtype=self._mask_dtype))
+        return buffers
+
+    def _pad_batch(self, indices):
+        count = len(indices)
+        batch_lengths = self._lengths[indices]
+        max_length = int(batch_lengths.max())
+
+        # obtain the output buffers
+        if self._ring_buffer_size is None:
+            buffers = None
+        else:
+            if self._ring_buffers is None:
+                self._ring_buffers = [self._allocate_buffers()
+                                      for _ in range(self._ring_buffer_size)]
+            buffers = self._ring_buffers[self._ring_cursor]
+            self._ring_cursor = \
+                (self._ring_cursor + 1) % self._ring_buffer_size
+
+        def get_buffer(i, shape, dtype):
+            if buffers is None:
+                return np.empty(shape, dtype=dtype)
+            size = int(np.prod(shape, dtype=np.int64))
+            return buffers[i][:size].reshape(shape)
+
+        # pad the sequences
+        ret = []
+        for i, (s, (is_padded, dtype, step_shape)) in \
+                enumerate(zip(self._sequences, self._seq_specs)):
+            out = get_buffer(i, (count, max_length) + tuple(step_shape),
+                             dtype)
+            if is_padded:
+                # ``mode='clip'`` avoids the internal buffering of
+                # ``np.take``, and the indices are always valid here.
+                np.take(s[:, :max_length], indices, axis=0, out=out,
+                        mode='clip')
+            else:
+                out.fill(self._pad_value)
+                for j, (idx, length) in enumerate(zip(indices,
+                                                      batch_lengths)):
+                    out[j, :length] = s[idx][:length]
+            ret.append(out)
+
+        # build the mask
+        mask = get_buffer(len(self._sequences), (count, max_length),
+                          self._mask_dtype)
+        np.less(self._steps[:max_length], batch_lengths[:, np.newaxis],
+                out=mask, casting='unsafe')
+        ret.append(mask)
+
+        # gather the fixed-shape arrays
+        ret.extend(a[indices] for a in self._arrays)
+        return tuple(_make_readonly(a) for a in ret)
+
+    def _minibatch_iterator(self):
+        # split the buckets into mini-batches
+        batches = []
+        for indices in self._bucket_indices:
+            if self.is_shuffled:
+                indices = indices.copy()
+                self._random_state.shuffle(indices)
+            for batch_s in minibatch_slices_iterator(
+                    length=len(indices),
+                    batch_size=self.batch_size,
+                    skip_incomplete=self.skip_incomplete):
+                batches.append(indices[batch_s])
+
+        # shuffle the mini-batches across the buckets if necessary
+        if self.is_shuffled:
+            self._random_state.shuffle(batches)
+
+        # now iterator through the mini-batches
+        for indices in batches:
+            yield self._pad_batch(indices)
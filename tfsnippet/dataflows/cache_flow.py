@@ -0,0 +1,450 @@
+import codecs
+import functools
+import hashlib
+import json
+import os
+import types
+
+import numpy as np
+import six
+
+from .array_flow import ArrayFlow
+from .base import DataFlow, ExtraInfoDataFlow
+from .mapper_flow import MapperFlow
+from .memmap_flow import _open_memmap
+
+__all__ = ['CacheFlow']
+
+_META_FILE = 'meta.json'
+
+
+class _Unidentifiable(Exception):
+    """Raised when a value cannot be hashed reliably."""
+
+
+_SIMPLE_TYPES = (type(None), bool, float, complex, bytes) + \
+    six.integer_types + six.string_types
+
+
+def _hash_function(h, fn, seen):
+    h.update('{}.{}'.format(
+        fn.__module__, getattr(fn, '__qualname__', fn.__name__)).
+        encode('utf-8'))
+    if id(fn) in seen:
+        return
+    seen.add(id(fn))
+    code = six.get_function_code(fn)
+    _hash_value(h, code, seen)
+    _hash_value(h, six.get_function_defaults(fn), seen)
+    _hash_value(h, getattr(fn, '__kwdefaults__', None), seen)
+    closure = six.get_function_closure(fn) or ()
+    _hash_value(h, [c.cell_contents for c in closure], seen)
+    # the simple global constants referred to by the function
+    fn_globals = six.get_function_globals(fn)
+    for name in code.co_names:
+        v = fn_globals.get(name)
+        if isinstance(v, _SIMPLE_TYPES) and v is not None:
+            _hash_value(h, (name, v), seen)
+
+
+def _hash_value(h, v, seen):
+    """Update the hasher `h` with the value `v`."""
+    if isinstance(v, _SIMPLE_TYPES):
+        h.update(repr((type(v).__name__, v)).encode('utf-8'))
+    elif isinstance(v, (tuple, list)):
+        h.update('{}:{}'.format(type(v).__name__, len(v)).encode('utf-8'))
+        for item in v:
+            _hash_value(h, item, seen)
+    elif isinstance(v, dict):
+        h.update('dict:{}'.format(len(v)).encode('utf-8'))
+        for key in sorted(v, key=repr):
+            _hash_value(h, key, seen)
+            _hash_value(h, v[key], seen)
+    elif isinstance(v, np.ndarray):
+        if v.dtype.hasobject:
+            raise _Unidentifiable()
+        h.update('ndarray:{}:{}'.format(v.dtype.str, v.shape).
+                 encode('utf-8'))
+        h.update(np.ascontiguousarray(v).tobytes())
+    elif isinstance(v, np.generic):
+        h.update(repr((v.dtype.str, v.item())).encode('utf-8'))
+    elif isinstance(v, types.CodeType):
+        h.update(v.co_code)
+        _hash_value(h, v.co_names, seen)
+        _hash_value(h, v.co_consts, seen)  # including nested code objects
+    elif isinstance(v, functools.partial):
+        h.update(b'partial')
+        _hash_value(h, v.func, seen)
+        _hash_value(h, v.args, seen)
+        _hash_value(h, v.keywords, seen)
+    elif isinstance(v, types.FunctionType):
+        _hash_function(h, v, seen)
+    elif isinstance(v, (types.BuiltinFunctionType, np.ufunc, type)):
+        h.update('{}.{}'.format(
+            getattr(v, '__module__', None),
+            getattr(v, '__qualname__', v.__name__)).encode('utf-8'))
+    else:
+        # e.g., the instances of DataMapper, which may have internal states
+        raise _Unidentifiable()
+
+
+def _callable_identity(fn):
+    """
+    Get a string identifying the callable `fn` across processes.
+
+    The identity covers the qualified name, the byte-code, the constants,
+    the default arguments and the closure values of `fn`, as well as the
+    simple global constants it refers to.
+
+    Returns:
+        str or None: The identity, or :obj:`None` if `fn` cannot be
+            identified reliably (e.g., an object with `__call__` method).
+    """
+    h = hashlib.md5()
+    try:
+        _hash_value(h, fn, set())
+    except _Unidentifiable:
+        return None
+    return h.hexdigest()
+
+
+def _cached_array_file(path, i):
+    return os.path.join(path, 'array_{}.bin'.format(i))
+
+
+class _MemoryRecorder(object):
+
+    def __init__(self):
+        self.pieces = None
+
+    def append(self, batch):
+        if self.pieces is None:
+            self.pieces = [[] for _ in batch]
+        for pieces, a in zip(self.pieces, batch):
+            pieces.append(np.array(a, copy=True))
+
+    def finish(self, meta):
+        arrays = []
+        for pieces, info in zip(self.pieces or (), meta['arrays']):
+            if pieces:
+                a = np.concatenate(pieces, axis=0)
+            else:  # pragma: no cover
+                a = np.empty([0] + info['shape'], dtype=info['dtype'])
+            a.setflags(write=False)
+            arrays.append(a)
+        self.pieces = None
+        return arrays
+
+    def abort(self):
+        self.pieces = None
+
+
+class _DiskRecorder(object):
+
+    def __init__(self, path):
+        self.path = path
+        self.files = None
+
+    def append(self, batch):
+        if self.files is None:
+            if not os.path.isdir(self.path):
+                os.makedirs(self.path)
+            self.files = [open(_cached_array_file(self.path, i), 'wb')
+                          for i in range(len(batch))]
+        for f, a in zip(self.files, batch):
+            np.ascontiguousarray(a).tofile(f)
+
+    def _close_files(self):
+        for f in self.files or ():
+            f.close()
+        self.files = None
+
+    def finish(self, meta):
+        self._close_files()
+        meta_path = os.path.join(self.path, _META_FILE)
+        with codecs.open(meta_path + '.tmp', 'wb', 'utf-8') as f:
+            f.write(json.dumps(meta))
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        os.rename(meta_path + '.tmp', meta_path)
+
+    def abort(self):
+        self._close_files()
+        if not os.path.isdir(self.path):
+            return
+        for name in os.listdir(self.path):
+            if name.startswith('array_') and name.endswith('.bin'):
+                os.remove(os.path.join(self.path, name))
+
+
+class CacheFlow(DataFlow):
+    """
+    Data flow which records the mini-batches from the source flow in the
+    first epoch, and replays them from the second epoch on.
+
+    This is mainly used for avoiding the re-computation of expensive but
+    deterministic mappers in each epoch.  The mini-batches are recorded in
+    memory, or into a directory on disk if `path` is specified, in which
+    case the recorded arrays are memory-mapped for replaying, and can be
+    reused by later processes.
+
+    Usage::
+
+        cached_flow = DataFlow.arrays([x], batch_size=256, shuffle=True). \\
+            map(expensive_preprocess).cache('./preprocessed')
+        for [batch_x] in cached_flow:
+            ...
+
+    If the source flow is merely a chain of :class:`MapperFlow` over a
+    shuffled :class:`ExtraInfoDataFlow` (e.g., :class:`ArrayFlow`), the
+    recorded items are re-shuffled in each epoch, with the batch size,
+    the `skip_incomplete` option and the random state of that flow.
+    Otherwise the recorded mini-batches are replayed in the same order.
+    Note that the items dropped in the first epoch (e.g., due to
+    `skip_incomplete`) are not recorded, thus will not be replayed.
+
+    The cache on disk is invalidated if the identities of the mappers in
+    the source flow (the qualified names, the byte-codes, the constants,
+    the default arguments, the closure values and the simple global
+    constants of the functions), or the data length of the underlying data
+    flow has changed.  Mappers which cannot be identified reliably (e.g.,
+    :class:`~tfsnippet.dataflows.DataMapper` instances, whose internal
+    states are unknown) require `cache_key` to be specified instead, which
+    should be changed whenever the mappers change.
+    """
+
+    def __init__(self, source, path=None, max_bytes=None, cache_key=None):
+        """
+        Construct a :class:`CacheFlow`.
+
+        Args:
+            source (DataFlow): The source data flow.
+            path (str): If specified, record the mini-batches into this
+                directory.  (default :obj:`None`, record in memory)
+            max_bytes (int): If specified, give up caching if the recorded
+                mini-batches exceed this number of bytes, and always
+                obtain the mini-batches from the source flow afterwards.
+                (default :obj:`None`, no limit)
+            cache_key (str): If specified, use this key to identify the
+                mappers in the source flow, instead of computing their
+                identities.  Required if `path` is specified, and any of
+                the mappers cannot be identified reliably.
+                (default :obj:`None`)
+        """
+        if max_bytes is not None:
+            max_bytes = int(max_bytes)
+            if max_bytes < 0:
+                raise ValueError('`max_bytes` must be non-negative.')
+        if path is not None:
+            path = os.path.abspath(path)
+
+        # find the underlying data flow through the chain of mappers
+        root = source
+        while isinstance(root, MapperFlow):
+            root = root.source
+        replay_flow = root if isinstance(root, ExtraInfoDataFlow) else None
+
+        # the identities of all the mappers in the source flow
+        mapper_ids = []
+        queue = [source]
+        visited = []
+        while queue:
+            stage = queue.pop(0)
+            if any(s is stage for s in visited):
+                continue
+            visited.append(stage)
+            if isinstance(stage, MapperFlow):
+                mapper_id = _callable_identity(stage._mapper)
+                if mapper_id is None and path is not None and \
+                        cache_key is None:
+                    raise ValueError(
+                        'The mapper {!r} cannot be identified reliably, '
+                        '`cache_key` must be specified for caching on '
+                        'disk.'.format(stage._mapper)
+                    )
+                mapper_ids.append(mapper_id)
+                mapper_ids.append(stage.array_indices)
+            if isinstance(getattr(stage, 'source', None), DataFlow):
+                queue.append(stage.source)
+            for f in getattr(stage, 'flows', None) or ():
+                queue.append(f)
+
+        self._source = source
+        self._path = path
+        self._max_bytes = max_bytes
+        self._replay_flow = replay_flow
+        if cache_key is not None:
+            mapper_ids = [str(cache_key)]
+        self._key = {
+            'mappers': [list(v) if isinstance(v, tuple) else v
+                        for v in mapper_ids],
+            'data_length': (replay_flow.data_length
+                            if replay_flow is not None else None),
+        }
+
+        # the cached arrays
+        self._cached_arrays = None
+        self._cached_mmaps = None
+        self._batch_lengths = None
+        self._cached_flow = None
+        self._exceeded = False
+
+    @property
+    def source(self):
+        """Get the source data flow."""
+        return self._source
+
+    @property
+    def path(self):
+        """Get the directory of the cache, or :obj:`None` if in memory."""
+        return self._path
+
+    @property
+    def max_bytes(self):
+        """Get the maximum number of bytes to be cached."""
+        return self._max_bytes
+
+    @property
+    def is_cached(self):
+        """Whether or not the mini-batches have been cached?"""
+        return self._cached_arrays is not None
+
+    def clear(self):
+        """
+        Clear the cache, such that the mini-batches will be recorded again
+        in the next epoch.  The cached files on disk will also be deleted.
+        """
+        self._cached_arrays = self._cached_mmaps = None
+        self._batch_lengths = self._cached_flow = None
+        self._exceeded = False
+        if self._path is not None and os.path.isdir(self._path):
+            meta_path = os.path.join(self._path, _META_FILE)
+            if os.path.exists(meta_path):
+                os.remove(meta_path)
+            _DiskRecorder(self._path).abort()
+
+    def _load_from_disk(self):
+        meta_path = os.path.join(self._path, _META_FILE)
+        if not os.path.exists(meta_path):
+            return False
+        with codecs.open(meta_path, 'rb', 'utf-8') as f:
+            meta = json.loads(f.read())
+        if meta.get('key') != self._key:
+            return False
+        arrays = []
+        mmaps = []
+        for i, info in enumerate(meta['arrays']):
+            a, mm = _open_memmap(_cached_array_file(self._path, i),
+                                 dtype=info['dtype'], shape=info['shape'])
+            if len(a) != meta['length']:
+                return False
+            arrays.append(a)
+            mmaps.append(mm)
+        self._set_cached(arrays, meta['batch_lengths'])
+        self._cached_mmaps = mmaps
+        return True
+
+    def _set_cached(self, arrays, batch_lengths):
+        self._cached_arrays = tuple(arrays)
+        self._batch_lengths = tuple(batch_lengths)
+        root = self._replay_flow
+        if root is not None and root.is_shuffled and self._cached_arrays:
+            self._cached_flow = ArrayFlow(
+                self._cached_arrays,
+                batch_size=root.batch_size,
+                shuffle=True,
+                skip_incomplete=root.skip_incomplete,
+                random_state=getattr(root, '_random_state', None)
+            )
+
+    def _record(self):
+        if self._path is not None:
+            recorder = _DiskRecorder(self._path)
+        else:
+            recorder = _MemoryRecorder()
+        arrays_info = None
+        batch_lengths = []
+        total_bytes = 0
+        completed = False
+
+        try:
+            for batch in self._source:
+                batch = tuple(np.asarray(a) for a in batch)
+
+                # check the consistency of the mini-batches
+                if arrays_info is None:
+                    if self._path is not None:
+                        for a in batch:
+                            if a.dtype.hasobject or a.dtype.fields:
+                                raise TypeError(
+                                    'Arrays of dtype {} cannot be cached '
+                                    'on disk.'.format(a.dtype))
+                    arrays_info = [
+                        {'dtype': a.dtype.str, 'shape': list(a.shape[1:])}
+                        for a in batch
+                    ]
+                elif len(batch) != len(arrays_info) or any(
+                        a.dtype.str != info['dtype'] or
+                        list(a.shape[1:]) != info['shape']
+                        for a, info in zip(batch, arrays_info)):
+                    raise ValueError('The mini-batches to be cached must '
+                                     'have identical array count, dtypes '
+                                     'and item shapes.')
+
+                # record the mini-batch, unless exceeding `max_bytes`
+                if not self._exceeded:
+                    total_bytes += sum(a.nbytes for a in batch)
+                    if self._max_bytes is not None and \
+                            total_bytes > self._max_bytes:
+                        self._exceeded = True
+                        recorder.abort()
+                    else:
+                        recorder.append(batch)
+                        batch_lengths.append(len(batch[0]))
+
+                yield batch
+            completed = True
+
+        finally:
+            if self._exceeded:
+                pass
+            elif not completed or arrays_info is None:
+                recorder.abort()
+            else:
+                meta = {
+                    'key': self._key,
+                    'arrays': arrays_info,
+                    'batch_lengths': batch_lengths,
+                    'length': int(sum(batch_lengths)),
+                }
+                arrays = recorder.finish(meta)
+                if self._path is not None:
+                    self._load_from_disk()
+                else:
+                    self._set_cached(arrays, batch_lengths)
+
+    def _replay(self):
+        if self._cached_flow is not None:
+            for batch in self._cached_flow:
+                yield batch
+        else:
+            start = 0
+            for length in self._batch_lengths:
+                batch_s = slice(start, start + length)
+                yield tuple(a[batch_s] for a in self._cached_arrays)
+                start += length
+
+    def _minibatch_iterator(self):
+        if self._cached_arrays is None and not self._exceeded and \
+                self._path is not None:
+            self._load_from_disk()
+
+        if self._cached_arrays is not None:
+            iterator = self._replay()
+        elif self._exceeded:
+            iterator = iter(self._source)
+        else:
+            iterator = self._record()
+
+        for batch in iterator:
+            yield batch
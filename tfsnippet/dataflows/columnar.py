@@ -0,0 +1,446 @@
+import bz2
+import codecs
+import json
+import mmap
+import struct
+import zlib
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+
+from tfsnippet.utils import AutoInitAndCloseable, validate_enum_arg
+from .array_flow import ArrayFlow
+
+__all__ = ['ColumnarWriter', 'ColumnarFlow']
+
+_MAGIC = b'TFSCOL01'
+_FOOTER = struct.Struct('<Q8s')  # the length of the header, and the magic
+_ALIGNMENT = 64
+
+_COMPRESSORS = {
+    'zlib': (lambda data, level: zlib.compress(data, 6 if level is None
+                                               else level),
+             zlib.decompress),
+    'bz2': (lambda data, level: bz2.compress(data, 9 if level is None
+                                             else level),
+            bz2.decompress),
+}
+
+
+class ColumnarWriter(AutoInitAndCloseable):
+    """
+    Writer of the columnar record files, which can be read by
+    :class:`ColumnarFlow`.
+
+    A columnar record file stores the items of several arrays in chunks of
+    `chunk_size` items.  Within each chunk, the items of each array are
+    stored in a contiguous block, which may be compressed.  The data types
+    and the item shapes of the arrays, as well as the offsets of the blocks,
+    are stored in a JSON header at the end of the file, such that the items
+    can be written in a streaming manner::
+
+        with ColumnarWriter('train.col', compression='zlib') as writer:
+            writer.write_flow(DataFlow.arrays([x, y], batch_size=1024))
+
+    A block is stored uncompressed if the compression does not reduce its
+    size.  The uncompressed blocks are aligned to 64 bytes, such that they
+    can be memory-mapped by :class:`ColumnarFlow` without copying.
+    """
+
+    def __init__(self, path, chunk_size=8192, compression=None,
+                 compress_level=None):
+        """
+        Construct a :class:`ColumnarWriter`.
+
+        Args:
+            path (str): Path of the file to write.
+            chunk_size (int): The number of items in each chunk.
+                (default ``8192``)
+            compression (None or str): One of {"zlib", "bz2"}.  If specified,
+                compress each block with this method.  (default :obj:`None`)
+            compress_level (None or int): The compression level.
+                (default :obj:`None`, 6 for "zlib" and 9 for "bz2")
+        """
+        chunk_size = int(chunk_size)
+        if chunk_size < 1:
+            raise ValueError('`chunk_size` must be at least 1.')
+        compression = validate_enum_arg(
+            'compression', compression, tuple(sorted(_COMPRESSORS)),
+            nullable=True
+        )
+
+        self._path = path
+        self._chunk_size = chunk_size
+        self._compression = compression
+        self._compress_level = compress_level
+
+        # the writing states
+        self._file = None
+        self._arrays_info = None
+        self._pending = None
+        self._pending_count = 0
+        self._chunks = []
+        self._item_count = 0
+
+    @property
+    def path(self):
+        """Get the path of the file."""
+        return self._path
+
+    @property
+    def chunk_size(self):
+        """Get the number of items in each chunk."""
+        return self._chunk_size
+
+    @property
+    def compression(self):
+        """Get the compression method of the blocks."""
+        return self._compression
+
+    @property
+    def item_count(self):
+        """Get the number of items which have been written."""
+        return self._item_count
+
+    def _init(self):
+        self._arrays_info = self._pending = None
+        self._pending_count = self._item_count = 0
+        self._chunks = []
+        self._file = open(self._path, 'wb')
+        self._file.write(_MAGIC)
+
+    def _close(self):
+        try:
+            self._flush(final=True)
+            header = json.dumps({
+                'arrays': self._arrays_info or [],
+                'chunk_size': self._chunk_size,
+                'compression': self._compression,
+                'chunks': self._chunks,
+            }).encode('utf-8')
+            self._file.write(header)
+            self._file.write(_FOOTER.pack(len(header), _MAGIC))
+        finally:
+            self._file.close()
+            self._file = None
+
+    def _write_block(self, arr):
+        data = np.ascontiguousarray(arr).tobytes()
+        compressed = False
+        if self._compression is not None:
+            compress = _COMPRESSORS[self._compression][0]
+            packed = compress(data, self._compress_level)
+            if len(packed) < len(data):
+                data, compressed = packed, True
+        if not compressed:
+            # align the uncompressed blocks for memory-mapped reads
+            padding = -self._file.tell() % _ALIGNMENT
+            self._file.write(b'\x00' * padding)
+        offset = self._file.tell()
+        self._file.write(data)
+        return [offset, len(data), compressed]
+
+    def _flush(self, final=False):
+        while self._pending_count >= self._chunk_size or \
+                (final and self._pending_count > 0):
+            size = min(self._chunk_size, self._pending_count)
+            arrays = [np.concatenate(p, axis=0) if len(p) > 1 else p[0]
+                      for p in self._pending]
+            blocks = [self._write_block(a[:size]) for a in arrays]
+            self._chunks.append({'length': size, 'blocks': blocks})
+            self._pending = [[a[size:]] for a in arrays]
+            self._pending_count -= size
+
+    def write(self, arrays):
+        """
+        Write a mini-batch of items.
+
+        Args:
+            arrays (Iterable[np.ndarray]): The arrays of the mini-batch.
+                The data types and the item shapes must be identical in
+                every mini-batch.
+        """
+        self.init()
+        arrays = tuple(np.asarray(a) for a in arrays)
+        if self._arrays_info is None:
+            if not arrays:
+                raise ValueError('`arrays` must not be empty.')
+            for a in arrays:
+                if len(a.shape) < 1:
+                    raise ValueError('`arrays` must be at least 1-d arrays.')
+                if a.dtype.hasobject or a.dtype.fields:
+                    raise TypeError('Arrays of dtype {} cannot be written '
+                                    'into columnar record files.'.
+                                    format(a.dtype))
+            self._arrays_info = [
+                {'dtype': a.dtype.str, 'shape': list(a.shape[1:])}
+                for a in arrays
+            ]
+            self._pending = [[] for _ in arrays]
+        elif len(arrays) != len(self._arrays_info) or any(
+                a.dtype.str != info['dtype'] or
+                list(a.shape[1:]) != info['shape']
+                for a, info in zip(arrays, self._arrays_info)):
+            raise ValueError('The mini-batches to be written must have '
+                             'identical array count, dtypes and item '
+                             'shapes.')
+        length = len(arrays[0])
+        for a in arrays[1:]:
+            if len(a) != length:
+                raise ValueError('`arrays` must have the same data length.')
+
+        if length:
+            # copy the arrays, since the source mini-batches may be reused
+            for pending, a in zip(self._pending, arrays):
+                pending.append(np.array(a, copy=True))
+            self._pending_count += length
+            self._item_count += length
+            self._flush()
+
+    def write_flow(self, flow):
+        """
+        Write all the mini-batches of a data flow.
+
+        Args:
+            flow (DataFlow): The data flow.
+        """
+        for batch in flow:
+            self.write(batch)
+
+
+class _ColumnarFile(object):
+    """The shared states for reading a columnar record file."""
+
+    def __init__(self, path, cache_chunks):
+        with open(path, 'rb') as f:
+            f.seek(0, 2)
+            file_size = f.tell()
+            if file_size < len(_MAGIC) + _FOOTER.size:
+                raise IOError('Not a columnar record file: {!r}'.
+                              format(path))
+            f.seek(file_size - _FOOTER.size)
+            header_size, magic = _FOOTER.unpack(f.read(_FOOTER.size))
+            f.seek(0)
+            if magic != _MAGIC or f.read(len(_MAGIC)) != _MAGIC:
+                raise IOError('Not a columnar record file: {!r}'.
+                              format(path))
+            f.seek(file_size - _FOOTER.size - header_size)
+            header = json.loads(codecs.decode(f.read(header_size), 'utf-8'))
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.dtypes = tuple(np.dtype(a['dtype']) for a in header['arrays'])
+        self.shapes = tuple(tuple(a['shape']) for a in header['arrays'])
+        self.chunk_size = header['chunk_size']
+        self.compression = header['compression']
+        self.chunks = header['chunks']
+        lengths = [c['length'] for c in self.chunks]
+        self.chunk_starts = np.concatenate([[0], np.cumsum(lengths)]). \
+            astype(np.int64)
+        self.length = int(self.chunk_starts[-1])
+
+        # the LRU cache of the decompressed blocks
+        self.cache_size = cache_chunks * len(self.dtypes)
+        self.cache = OrderedDict()
+        self.pool = None
+
+    def _decompress(self, key):
+        chunk, i = key
+        offset, size, _ = self.chunks[chunk]['blocks'][i]
+        data = _COMPRESSORS[self.compression][1](
+            self.mmap[offset: offset + size])
+        arr = np.frombuffer(data, dtype=self.dtypes[i])
+        return arr.reshape((-1,) + self.shapes[i])
+
+    def get_blocks(self, chunks, i):
+        """Get the blocks of the `i`-th array in `chunks`."""
+        ret = {}
+        missing = []
+        for chunk in chunks:
+            offset, size, compressed = self.chunks[chunk]['blocks'][i]
+            if not compressed:
+                # memory-mapped block
+                length = self.chunks[chunk]['length']
+                ret[chunk] = np.ndarray(
+                    (length,) + self.shapes[i], dtype=self.dtypes[i],
+                    buffer=self.mmap, offset=offset
+                )
+            elif (chunk, i) in self.cache:
+                ret[chunk] = self.cache.pop((chunk, i))
+                self.cache[(chunk, i)] = ret[chunk]
+            else:
+                missing.append((chunk, i))
+
+        # decompress the missing blocks, in parallel if possible
+        if self.pool is not None and len(missing) > 1:
+            blocks = self.pool.map(self._decompress, missing)
+        else:
+            blocks = [self._decompress(key) for key in missing]
+        for key, block in zip(missing, blocks):
+            ret[key[0]] = block
+            self.cache[key] = block
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return ret
+
+
+class _ChunkedArray(object):
+    """Read-only numpy-like array of a columnar record file."""
+
+    def __init__(self, col_file, i):
+        self.file = col_file
+        self.index = i
+        self.dtype = col_file.dtypes[i]
+        self.shape = (col_file.length,) + col_file.shapes[i]
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, item):
+        starts = self.file.chunk_starts
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            if step != 1:  # pragma: no cover
+                return self[np.arange(start, stop, step)]
+            if start >= stop:
+                return np.empty((0,) + self.shape[1:], dtype=self.dtype)
+            first = np.searchsorted(starts, start, side='right') - 1
+            last = np.searchsorted(starts, stop, side='left')
+            chunks = list(range(first, last))
+            blocks = self.file.get_blocks(chunks, self.index)
+            pieces = [
+                blocks[c][max(start, starts[c]) - starts[c]:
+                          min(stop, starts[c + 1]) - starts[c]]
+                for c in chunks
+            ]
+            # a slice within one chunk is a view of the block
+            return pieces[0] if len(pieces) == 1 else np.concatenate(pieces)
+
+        indices = np.asarray(item)
+        if indices.ndim != 1:  # pragma: no cover
+            raise TypeError('Only slices and 1-d index arrays are supported.')
+        indices = np.where(indices < 0, indices + len(self), indices)
+        chunk_ids = np.searchsorted(starts, indices, side='right') - 1
+        order = np.argsort(chunk_ids, kind='mergesort')
+        sorted_ids = chunk_ids[order]
+        chunks = np.unique(sorted_ids)
+        blocks = self.file.get_blocks(chunks.tolist(), self.index)
+        bounds = np.searchsorted(sorted_ids, chunks, side='left').tolist() + \
+            [len(order)]
+
+        out = np.empty((len(indices),) + self.shape[1:], dtype=self.dtype)
+        for k, c in enumerate(chunks):
+            pos = order[bounds[k]: bounds[k + 1]]
+            out[pos] = blocks[c][indices[pos] - starts[c]]
+        return out
+
+
+class ColumnarFlow(ArrayFlow, AutoInitAndCloseable):
+    """
+    Using a columnar record file written by :class:`ColumnarWriter` as
+    data source flow.
+
+    Usage::
+
+        columnar_flow = DataFlow.columnar('train.col', batch_size=256,
+                                          shuffle=True, workers=4)
+        for batch_x, batch_y in columnar_flow:
+            ...
+
+    The uncompressed blocks are memory-mapped, while the compressed blocks
+    are decompressed on demand, and kept in a LRU cache of the latest
+    `cache_chunks` chunks.  If `workers` is specified, the blocks required
+    by a mini-batch are decompressed in parallel by a pool of threads.
+    The file remains opened until this flow is garbage-collected.
+
+    For compressed files, shuffling individual items requires decompressing
+    many chunks for each mini-batch.  Specify `shuffle_block_size` as a
+    multiple of the chunk size to shuffle the chunks instead, in which
+    case each mini-batch is taken from only a few chunks.
+    """
+
+    def __init__(self, path, batch_size, shuffle=False,
+                 skip_incomplete=False, random_state=None,
+                 shuffle_block_size=None, shuffle_seed=None, workers=None,
+                 cache_chunks=4):
+        """
+        Construct a :class:`ColumnarFlow`.
+
+        Args:
+            path (str): Path of the columnar record file.
+            batch_size (int): Size of each mini-batch.
+            shuffle (bool): Whether or not to shuffle data before iterating?
+                (default :obj:`False`)
+            skip_incomplete (bool): Whether or not to exclude the last
+                mini-batch if it is incomplete? (default :obj:`False`)
+            random_state (RandomState): Optional numpy RandomState for
+                shuffling data before each epoch.  (default :obj:`None`,
+                construct a new :class:`RandomState`).
+            shuffle_block_size (None or int): If specified, shuffle the
+                data by contiguous blocks of this size.  (default :obj:`None`)
+            shuffle_seed (None or int): If specified, shuffle the data by
+                counter-based permutations.  See :class:`ArrayFlow`.
+                (default :obj:`None`)
+            workers (None or int): If specified, decompress the blocks with
+                a pool of this number of threads. (default :obj:`None`)
+            cache_chunks (int): The number of decompressed chunks to keep
+                in the cache.  (default ``4``)
+        """
+        if workers is not None:
+            workers = int(workers)
+            if workers < 1:
+                raise ValueError('`workers` must be at least 1.')
+        cache_chunks = int(cache_chunks)
+        if cache_chunks < 1:
+            raise ValueError('`cache_chunks` must be at least 1.')
+
+        col_file = _ColumnarFile(path, cache_chunks=cache_chunks)
+        super(ColumnarFlow, self).__init__(
+            arrays=[_ChunkedArray(col_file, i)
+                    for i in range(len(col_file.dtypes))],
+            batch_size=batch_size,
+            shuffle=shuffle,
+            skip_incomplete=skip_incomplete,
+            random_state=random_state,
+            shuffle_block_size=shuffle_block_size,
+            shuffle_seed=shuffle_seed
+        )
+        self._path = path
+        self._file = col_file
+        self._workers = workers
+
+    @property
+    def path(self):
+        """Get the path of the columnar record file."""
+        return self._path
+
+    @property
+    def chunk_size(self):
+        """Get the number of items in each chunk."""
+        return self._file.chunk_size
+
+    @property
+    def compression(self):
+        """Get the compression method of the blocks."""
+        return self._file.compression
+
+    @property
+    def workers(self):
+        """Get the number of threads for decompressing the blocks."""
+        return self._workers
+
+    def _init(self):
+        if self._workers is not None:
+            self._file.pool = ThreadPool(self._workers)
+
+    def _close(self):
+        pool = self._file.pool
+        self._file.pool = None
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    def _minibatch_iterator(self):
+        self.init()
+        for batch in super(ColumnarFlow, self)._minibatch_iterator():
+            yield batch
@@ -0,0 +1,56 @@
+from .base import DataFlow
+
+__all__ = ['ConcatFlow']
+
+
+class ConcatFlow(DataFlow):
+    """
+    Concatenating multiple data flows into a single flow, which iterates
+    through the mini-batches of these flows one after another.
+
+    Usage::
+
+        train_flow = DataFlow.arrays([train_x, train_y], batch_size=256)
+        valid_flow = DataFlow.arrays([valid_x, valid_y], batch_size=256)
+        all_flow = DataFlow.concat([train_flow, valid_flow])
+
+    The mini-batch at the boundary of two flows may be incomplete.
+    Use :meth:`~DataFlow.rebatch` to stitch these mini-batches, if
+    mini-batches of fixed size are required.
+    """
+
+    def __init__(self, flows):
+        """
+        Construct a :class:`ConcatFlow`.
+
+        Args:
+            flows(Iterable[DataFlow]): The data flows to concatenate.
+                At least one data flow should be specified, otherwise a
+                :class:`ValueError` will be raised.
+
+        Raises:
+            ValueError: If not even one data flow is specified.
+            TypeError: If a specified flow is not a :class:`DataFlow`.
+        """
+        flows = tuple(flows)
+        if not flows:
+            raise ValueError('At least one flow must be specified.')
+        for flow in flows:
+            if not isinstance(flow, DataFlow):
+                raise TypeError('Not a DataFlow: {!r}'.format(flow))
+        self._flows = flows
+
+    @property
+    def flows(self):
+        """
+        Get the data flows to be concatenated.
+
+        Returns:
+            tuple[DataFlow]: The data flows to be concatenated.
+        """
+        return self._flows
+
+    def _minibatch_iterator(self):
+        for flow in self._flows:
+            for batch in flow:
+                yield batch
@@ -53,21 +53,68 @@ class SlidingWindow(DataMapper):
         # or equivalently
         sw_flow = DataFlow.seq(
             0, len(data) - sw.window_size + 1, batch_size=64).map(sw)
+
+    The windows are taken from a read-only strided view of the data array,
+    such that a mini-batch of consecutive windows (e.g., from an unshuffled
+    flow) is also a strided view without any copy.  Other mini-batches are
+    gathered from this view in one pass.
+
+    Multiple arrays of the same length (e.g., values and labels) can be
+    windowed together::
+
+        sw = SlidingWindow([values, labels], window_size=100, stride=10)
+        for batch_values, batch_labels in sw.as_flow(batch_size=64):
+            ...
     """
 
-    def __init__(self, data_array, window_size):
+    def __init__(self, data_array, window_size, stride=1):
         """
         Construct a :class:`SlidingWindow`.
 
         Args:
-            data_array (np.ndarray): The array from which to extract
-                sliding windows.
+            data_array (np.ndarray or list[np.ndarray]): The array from
+                which to extract sliding windows, or a list of numpy arrays
+                with the same length, from which to extract sliding windows
+                at the same positions.
             window_size (int): Size of each window.
+            stride (int): The distance between the starting positions of
+                two adjacent windows.  The window with index ``i`` starts
+                at position ``i * stride``. (default 1)
         """
+        if isinstance(data_array, (list, tuple)) and data_array and \
+                all(isinstance(a, np.ndarray) for a in data_array):
+            data_arrays = tuple(data_array)
+        else:
+            data_arrays = (np.asarray(data_array),)
+        for a in data_arrays:
+            if len(a.shape) < 1:
+                raise ValueError('`data_array` must be at least 1-d arrays.')
+            if len(a) != len(data_arrays[0]):
+                raise ValueError('`data_array` must have the same length.')
+        window_size = int(window_size)
+        if window_size < 1:
+            raise ValueError('`window_size` must be at least 1.')
+        stride = int(stride)
+        if stride < 1:
+            raise ValueError('`stride` must be at least 1.')
+
         self._data_array = data_array
+        self._data_arrays = data_arrays
         self._window_size = window_size
-        offset_dtype = (np.int32 if window_size < (1 << 32) else np.int64)
-        self._offset = np.arange(0, window_size, 1, dtype=offset_dtype)
+        self._stride = stride
+
+        # the read-only strided views of windows
+        data_length = len(data_arrays[0])
+        self._window_count = max(0, (data_length - window_size) // stride + 1)
+        self._windows = tuple(
+            np.lib.stride_tricks.as_strided(
+                a,
+                shape=(self._window_count, window_size) + a.shape[1:],
+                strides=(a.strides[0] * stride,) + a.strides,
+                writeable=False
+            )
+            for a in data_arrays
+        )
 
     def as_flow(self, batch_size, shuffle=False, skip_incomplete=False):
         """
@@ -84,17 +131,16 @@ class SlidingWindow(DataMapper):
         Returns:
             DataFlow: The data flow for sliding windows.
         """
-        data_length = len(self.data_array)
-        seq_dtype = (np.int32 if data_length < (1 << 32) else np.int64)
+        seq_dtype = (np.int32 if self.window_count < (1 << 31) else np.int64)
         seq_flow = DataFlow.seq(
-            0, data_length - self.window_size + 1, 1, batch_size=batch_size,
+            0, self.window_count, 1, batch_size=batch_size,
             shuffle=shuffle, skip_incomplete=skip_incomplete, dtype=seq_dtype
         )
         return seq_flow.map(self)
 
     @property
     def data_array(self):
-        """Get the data array."""
+        """Get the data array (or the list of data arrays)."""
         return self._data_array
 
     @property
@@ -102,9 +148,24 @@ class SlidingWindow(DataMapper):
         """Get the window size."""
         return self._window_size
 
+    @property
+    def stride(self):
+        """Get the distance between the starting positions of windows."""
+        return self._stride
+
+    @property
+    def window_count(self):
+        """Get the number of windows."""
+        return self._window_count
+
     def _transform(self, indices):
-        return (
-            self._data_array[
-                indices.reshape(indices.shape + (1,)) + self._offset
-            ],
-        )
+        indices = np.asarray(indices)
+        count = indices.size
+        if len(indices.shape) == 1 and count > 0:
+            start = int(indices[0])
+            if 0 <= start and int(indices[-1]) == start + count - 1 and \
+                    start + count <= self._window_count and \
+                    (count < 3 or np.all(np.diff(indices) == 1)):
+                # consecutive windows, return the strided views
+                return tuple(w[start: start + count] for w in self._windows)
+        return tuple(np.take(w, indices, axis=0) for w in self._windows)
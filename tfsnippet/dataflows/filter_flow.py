@@ -0,0 +1,79 @@
+import numpy as np
+
+from .base import DataFlow
+
+__all__ = ['FilterFlow']
+
+
+class FilterFlow(DataFlow):
+    """
+    Data flow which drops the samples from the source flow, according to
+    the boolean masks given by a vectorized predicate.
+
+    Usage::
+
+        source_flow = DataFlow.arrays([x, y], batch_size=256)
+        filter_flow = source_flow.filter(lambda x, y: np.abs(x) < 10.)
+
+    The mini-batches of this flow have variable sizes, and the mini-batches
+    with all samples dropped are skipped.  Use :meth:`~DataFlow.rebatch`,
+    or specify `batch_size` for :meth:`~DataFlow.filter`, if mini-batches
+    of fixed size are required.
+    """
+
+    def __init__(self, source, predicate, array_indices=None):
+        """
+        Construct a :class:`FilterFlow`.
+
+        Args:
+            source (DataFlow): The source data flow.
+            predicate ((\*np.ndarray) -> np.ndarray): The predicate function,
+                which receives the arrays of a mini-batch, and returns a 1-d
+                boolean mask, indicating which samples should be kept.
+            array_indices (int or Iterable[int]): The indices of the arrays
+                to be passed to the predicate.  If not specified, all the
+                arrays of a mini-batch will be passed to the predicate.
+        """
+        if array_indices is not None:
+            try:
+                array_indices = (int(array_indices),)
+            except TypeError:
+                array_indices = tuple(map(int, array_indices))
+        self._source = source
+        self._predicate = predicate
+        self._array_indices = array_indices
+
+    @property
+    def source(self):
+        """Get the source data flow."""
+        return self._source
+
+    @property
+    def array_indices(self):
+        """Get the indices of the arrays to be passed to the predicate."""
+        return self._array_indices
+
+    def _filter_batch(self, batch):
+        if self._array_indices is not None:
+            inputs = [batch[i] for i in self._array_indices]
+        else:
+            inputs = batch
+        mask = np.asarray(self._predicate(*inputs))
+        length = len(batch[0])
+        if mask.dtype != np.bool_ or mask.shape != (length,):
+            raise ValueError('The output of the predicate is expected to be '
+                             'a 1-d boolean mask of length {}, but got an '
+                             'array of dtype {} and shape {}.'.
+                             format(length, mask.dtype, mask.shape))
+
+        count = np.count_nonzero(mask)
+        if count == length:
+            return batch
+        if count:
+            return tuple(np.compress(mask, a, axis=0) for a in batch)
+
+    def _minibatch_iterator(self):
+        for batch in self._source:
+            batch = self._filter_batch(batch)
+            if batch is not None:
+                yield batch
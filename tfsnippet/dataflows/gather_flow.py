@@ -1,7 +1,21 @@
+import sys
+from threading import Thread, Event
+
+import six
+
 from .base import DataFlow
 
+if six.PY2:
+    from Queue import Queue, Full
+else:
+    from queue import Queue, Full
+
 __all__ = ['GatherFlow']
 
+_BATCH = 0
+_EPOCH_END = 1
+_ERROR = 2
+
 
 class GatherFlow(DataFlow):
     """
@@ -12,16 +26,33 @@ class GatherFlow(DataFlow):
         x_flow = DataFlow.arrays([x], batch_size=256)
         y_flow = DataFlow.arrays([y], batch_size=256)
         xy_flow = DataFlow.gather([x_flow, y_flow])
+
+    The epoch ends as soon as any of the flows is exhausted, and the
+    remaining mini-batches of the other flows are discarded.
+
+    By default, the mini-batches are obtained from the flows one after
+    another, thus the latencies of the flows add up.  If `prefetch` is
+    specified, each flow is iterated in a background thread during each
+    epoch, which puts the mini-batches into a queue of at most `prefetch`
+    mini-batches, such that the flows are fetched concurrently, and the
+    gathered flow only waits for the slowest one.  In this case, the
+    flows may be iterated ahead of the consumer (e.g., the iteration
+    states of :class:`ArrayFlow` are ahead), and the errors raised by
+    the flows are re-raised by the gathered flow.
     """
 
-    def __init__(self, flows):
+    def __init__(self, flows, prefetch=None):
         """
-        Construct an :class:`IteratorFlow`.
+        Construct a :class:`GatherFlow`.
 
         Args:
             flows(Iterable[DataFlow]): The data flows to gather.
                 At least one data flow should be specified, otherwise a
                 :class:`ValueError` will be raised.
+            prefetch (None or int): If specified, fetch from the flows
+                concurrently in background threads, with this number of
+                mini-batches prefetched ahead for each flow.  It should be
+                at least 1.  (default :obj:`None`, fetch serially)
 
         Raises:
             ValueError: If not even one data flow is specified.
@@ -33,7 +64,12 @@ class GatherFlow(DataFlow):
         for flow in flows:
             if not isinstance(flow, DataFlow):
                 raise TypeError('Not a DataFlow: {!r}'.format(flow))
+        if prefetch is not None:
+            prefetch = int(prefetch)
+            if prefetch < 1:
+                raise ValueError('`prefetch` must be at least 1.')
         self._flows = flows
+        self._prefetch = prefetch
 
     @property
     def flows(self):
@@ -45,6 +81,75 @@ class GatherFlow(DataFlow):
         """
         return self._flows
 
+    @property
+    def prefetch(self):
+        """
+        Get the number of mini-batches to prefetch ahead for each flow.
+
+        Returns:
+            None or int: The number of mini-batches, or :obj:`None` if the
+                flows are fetched serially.
+        """
+        return self._prefetch
+
+    @staticmethod
+    def _put(queue, item, stopping):
+        # put `item` into `queue`, unless the epoch is being stopped
+        while not stopping.is_set():
+            try:
+                queue.put(item, timeout=.05)
+                return True
+            except Full:
+                pass
+        return False
+
+    def _worker_func(self, flow, queue, stopping):
+        try:
+            iterator = iter(flow)
+            try:
+                for batch in iterator:
+                    if not self._put(queue, (_BATCH, batch), stopping):
+                        break
+            finally:
+                # close the iterator in this thread, such that the flow
+                # can be iterated again in the next epoch
+                iterator.close()
+            self._put(queue, (_EPOCH_END, None), stopping)
+        except Exception:
+            self._put(queue, (_ERROR, sys.exc_info()), stopping)
+
+    def _concurrent_iterator(self):
+        stopping = Event()
+        queues = [Queue(self._prefetch) for _ in self._flows]
+        workers = [
+            Thread(target=self._worker_func, args=(flow, queue, stopping))
+            for flow, queue in zip(self._flows, queues)
+        ]
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+
+        try:
+            while True:
+                batches = []
+                for queue in queues:
+                    kind, payload = queue.get()
+                    if kind == _ERROR:
+                        six.reraise(*payload)
+                    elif kind == _EPOCH_END:
+                        return
+                    batches.append(payload)
+                yield batches
+        finally:
+            # stop the workers, and wait for them to close the flows
+            stopping.set()
+            for worker in workers:
+                worker.join()
+
     def _minibatch_iterator(self):
-        for batches in zip(*self._flows):
+        if self._prefetch is None:
+            iterator = zip(*self._flows)
+        else:
+            iterator = self._concurrent_iterator()
+        for batches in iterator:
             yield sum([tuple(b) for b in batches], ())
@@ -1,7 +1,76 @@
+import functools
+import types
+
+import numpy as np
+
 from .base import DataFlow
 
 __all__ = ['MapperFlow']
 
+_Generator = getattr(np.random, 'Generator', None)
+
+
+def _reseed_random_states(obj, seed):
+    """
+    Re-seed the NumPy random states owned by a (chain of) mapper in place.
+
+    Mappers copied into worker processes would otherwise share identical
+    random states, e.g., every worker would draw the same noise with a
+    copied :class:`~tfsnippet.preprocessing.BernoulliSampler`.
+    The :class:`MapperFlow`, :class:`DataMapper` and :class:`DataFlow`
+    objects are walked through along with their attributes, as well as
+    containers, bound methods and :func:`functools.partial` objects.
+    For other objects, only the `random_state` and `_random_state`
+    attributes are visited.
+
+    Args:
+        obj: The mapper, the mapper flow, or a container of them.
+        seed (int): The seed, from which the new seeds of the random
+            states are derived in the visiting order.
+
+    Returns:
+        int: The number of random states being re-seeded.
+    """
+    from .data_mappers import DataMapper
+    seeds = np.random.RandomState(seed)
+    visited = set()
+    count = [0]
+
+    def next_seed():
+        count[0] += 1
+        return seeds.randint(0xffffffff)
+
+    def visit(o):
+        if o is None or id(o) in visited:
+            return
+        visited.add(id(o))
+        if isinstance(o, np.random.RandomState):
+            o.seed(next_seed())
+        elif _Generator is not None and isinstance(o, _Generator):
+            bit_generator = o.bit_generator
+            bit_generator.state = type(bit_generator)(next_seed()).state
+        elif isinstance(o, (list, tuple)):
+            for v in o:
+                visit(v)
+        elif isinstance(o, dict):
+            for v in o.values():
+                visit(v)
+        elif isinstance(o, types.MethodType):
+            visit(o.__self__)
+        elif isinstance(o, functools.partial):
+            visit(o.func)
+            visit(o.args)
+            visit(o.keywords)
+        elif isinstance(o, (DataFlow, DataMapper)):
+            visit(getattr(o, '__dict__', None))
+        elif not isinstance(o, (type, types.ModuleType, types.FunctionType,
+                                np.ndarray)):
+            for attr in ('random_state', '_random_state'):
+                visit(getattr(o, attr, None))
+
+    visit(obj)
+    return count[0]
+
 
 class MapperFlow(DataFlow):
     """
@@ -61,21 +130,33 @@ class MapperFlow(DataFlow):
                             format(outputs.__class__.__name__))
         return outputs
 
+    def _map_batch(self, batch):
+        """
+        Apply the mapper on a single mini-batch.
+
+        Args:
+            batch (tuple[np.ndarray]): The source mini-batch arrays.
+
+        Returns:
+            tuple[np.ndarray]: The mapped mini-batch arrays.
+        """
+        if self._array_indices is not None:
+            mapped_b = list(batch)
+            inputs = [mapped_b[i] for i in self._array_indices]
+            outputs = self._validate_outputs(self._mapper(*inputs))
+            if len(outputs) != len(inputs):
+                raise ValueError('The number of output arrays of the '
+                                 'mapper is required to match the inputs, '
+                                 'since `array_indices` is specified: '
+                                 'outputs {} != inputs {}.'.
+                                 format(len(outputs), len(inputs)))
+            for i, o in zip(self._array_indices, outputs):
+                mapped_b[i] = o
+            mapped_b = tuple(mapped_b)
+        else:
+            mapped_b = self._validate_outputs(self._mapper(*batch))
+        return mapped_b
+
     def _minibatch_iterator(self):
         for batch in self._source:
-            if self._array_indices is not None:
-                mapped_b = list(batch)
-                inputs = [mapped_b[i] for i in self._array_indices]
-                outputs = self._validate_outputs(self._mapper(*inputs))
-                if len(outputs) != len(inputs):
-                    raise ValueError('The number of output arrays of the '
-                                     'mapper is required to match the inputs, '
-                                     'since `array_indices` is specified: '
-                                     'outputs {} != inputs {}.'.
-                                     format(len(outputs), len(inputs)))
-                for i, o in zip(self._array_indices, outputs):
-                    mapped_b[i] = o
-                mapped_b = tuple(mapped_b)
-            else:
-                mapped_b = self._validate_outputs(self._mapper(*batch))
-            yield mapped_b
+            yield self._map_batch(batch)
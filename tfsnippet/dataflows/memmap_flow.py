@@ -0,0 +1,195 @@
+import mmap
+import os
+
+import numpy as np
+
+from tfsnippet.utils import validate_enum_arg
+from .array_flow import ArrayFlow
+
+__all__ = ['MemmapFlow']
+
+_MADVISE_OPTIONS = {
+    'normal': 'MADV_NORMAL',
+    'sequential': 'MADV_SEQUENTIAL',
+    'random': 'MADV_RANDOM',
+    'willneed': 'MADV_WILLNEED',
+}
+
+
+def _open_memmap(path, dtype=None, shape=None):
+    """
+    Open a read-only memory-mapped array.
+
+    Args:
+        path (str): Path of the file.
+        dtype: If specified, `path` is treated as a raw binary file of
+            this data type.  Otherwise `path` is treated as a ".npy" file.
+        shape (tuple[int]): The shape of each item in a raw binary file,
+            excluding the first dimension.
+
+    Returns:
+        (np.ndarray, mmap.mmap): The array and the memory map object,
+            which is :obj:`None` if the array is not memory-mapped.
+    """
+    if dtype is None:
+        arr = np.load(path, mmap_mode='r')
+    else:
+        dtype = np.dtype(dtype)
+        shape = tuple(int(v) for v in (shape or ()))
+        item_size = dtype.itemsize * int(np.prod(shape))
+        file_size = os.path.getsize(path)
+        if item_size == 0 or file_size % item_size != 0:
+            raise ValueError('The size of file {!r} is not a multiple of '
+                             'the item size {}.'.format(path, item_size))
+        shape = (file_size // item_size,) + shape
+        if file_size == 0:
+            return np.empty(shape, dtype=dtype), None
+        arr = np.memmap(path, dtype=dtype, mode='r', shape=shape)
+
+    # expose the array as a plain ndarray, which keeps the memory map alive
+    mm = arr.base if isinstance(arr.base, mmap.mmap) else None
+    return arr.view(np.ndarray), mm
+
+
+class MemmapFlow(ArrayFlow):
+    """
+    Using memory-mapped ".npy" or raw binary files as data source flow.
+
+    The files are mapped into memory without being loaded, so that the
+    data may exceed the RAM.  Shuffled mini-batches are gathered with
+    sorted indices, such that the pages are read in ascending order.
+
+    Usage::
+
+        np.save('x.npy', x)
+        np.save('y.npy', y)
+
+        memmap_flow = DataFlow.memmap(['x.npy', 'y.npy'], batch_size=256,
+                                      shuffle=True, advice='random')
+        for batch_x, batch_y in memmap_flow:
+            ...
+        memmap_flow.close()
+
+    The memory maps are released by :meth:`close`, or when the flow is
+    garbage collected.  Since the mini-batches may be views of the memory
+    maps, each map is unmapped once the mini-batches viewing it are also
+    released, rather than being closed explicitly.
+    """
+
+    def __init__(self, paths, batch_size, shuffle=False,
+                 skip_incomplete=False, random_state=None, dtypes=None,
+                 shapes=None, sort_indices=True, advice=None,
+                 ring_buffer_size=None, shuffle_block_size=None):
+        """
+        Construct a :class:`MemmapFlow`.
+
+        Args:
+            paths (Iterable[str]): Paths of the files.
+            batch_size (int): Size of each mini-batch.
+            shuffle (bool): Whether or not to shuffle data before iterating?
+                (default :obj:`False`)
+            skip_incomplete (bool): Whether or not to exclude the last
+                mini-batch if it is incomplete? (default :obj:`False`)
+            random_state (RandomState): Optional numpy RandomState for
+                shuffling data before each epoch.  (default :obj:`None`,
+                construct a new :class:`RandomState`).
+            dtypes: If specified, the files are treated as raw binary files
+                of these data types, one for each file, instead of ".npy"
+                files.  (default :obj:`None`)
+            shapes: The shapes of each item in the raw binary files,
+                excluding the first dimension.  Ignored if `dtypes` is not
+                specified.  (default :obj:`None`, all items are scalars)
+            sort_indices (bool): Whether or not to sort the indices of each
+                shuffled mini-batch before gathering?  If :obj:`True`, the
+                data within a mini-batch will be in their original order,
+                while the set of data in each mini-batch is still shuffled.
+                (default :obj:`True`)
+            advice (None or str): One of {"normal", "sequential", "random",
+                "willneed"}.  If specified, advise the kernel about the
+                access pattern of the memory maps with ``madvise``, which
+                affects the readahead of pages.  Silently ignored if not
+                supported by the platform.  (default :obj:`None`)
+            ring_buffer_size (None or int): If specified, gather shuffled
+                mini-batches into this number of reused buffers.  See
+                :class:`ArrayFlow` for the lifetime of the mini-batches in
+                this case.  (default :obj:`None`)
+            shuffle_block_size (None or int): If specified, shuffle the
+                data by contiguous blocks of this size.  (default :obj:`None`)
+        """
+        paths = tuple(paths)
+        if dtypes is not None:
+            dtypes = tuple(dtypes)
+            shapes = tuple(shapes) if shapes is not None else \
+                ((),) * len(dtypes)
+            if len(dtypes) != len(paths) or len(shapes) != len(paths):
+                raise ValueError('The number of `dtypes` and `shapes` must '
+                                 'match the number of `paths`.')
+        else:
+            dtypes = shapes = (None,) * len(paths)
+        advice = validate_enum_arg(
+            'advice', advice, ('normal', 'sequential', 'random', 'willneed'),
+            nullable=True
+        )
+
+        # open the memory maps
+        arrays = []
+        mmaps = []
+        for path, dtype, shape in zip(paths, dtypes, shapes):
+            arr, mm = _open_memmap(path, dtype=dtype, shape=shape)
+            arrays.append(arr)
+            if mm is not None:
+                mmaps.append(mm)
+
+        super(MemmapFlow, self).__init__(
+            arrays=arrays,
+            batch_size=batch_size,
+            shuffle=shuffle,
+            skip_incomplete=skip_incomplete,
+            random_state=random_state,
+            ring_buffer_size=ring_buffer_size,
+            shuffle_block_size=shuffle_block_size
+        )
+        self._paths = paths
+        self._sort_indices = bool(sort_indices)
+        self._advice = advice
+        self._mmaps = tuple(mmaps)
+
+        # advise the kernel about the access pattern
+        if advice is not None:
+            flag = getattr(mmap, _MADVISE_OPTIONS[advice], None)
+            if flag is not None:
+                for mm in self._mmaps:
+                    if hasattr(mm, 'madvise'):
+                        mm.madvise(flag)
+
+    @property
+    def paths(self):
+        """Get the paths of the memory-mapped files."""
+        return self._paths
+
+    @property
+    def sort_indices(self):
+        """Whether or not to sort the indices of shuffled mini-batches?"""
+        return self._sort_indices
+
+    @property
+    def advice(self):
+        """Get the access pattern advised to the kernel."""
+        return self._advice
+
+    def close(self):
+        """
+        Release the memory maps.  This flow cannot be iterated any more.
+        """
+        self._arrays = self._mmaps = self._ring_buffers = None
+
+    def _minibatch_iterator(self):
+        if self._mmaps is None:
+            raise RuntimeError('The memory maps of {} have been closed.'.
+                               format(self.__class__.__name__))
+        return super(MemmapFlow, self)._minibatch_iterator()
+
+    def _gather(self, indices):
+        if self._sort_indices:
+            indices = np.sort(indices)
+        return super(MemmapFlow, self)._gather(indices)
@@ -0,0 +1,443 @@
+import mmap
+import multiprocessing
+import os
+import shutil
+import tempfile
+import traceback
+from logging import getLogger
+from threading import Thread
+
+import numpy as np
+import six
+
+from tfsnippet.utils import AutoInitAndCloseable, generate_random_seed
+from .base import DataFlow
+from .mapper_flow import MapperFlow, _reseed_random_states
+
+if six.PY2:
+    from Queue import Queue, Empty
+else:
+    from queue import Queue, Empty
+
+__all__ = ['MultiprocessFlow']
+
+_POLL_INTERVAL = 0.1  # seconds between liveness checks of the workers
+
+
+class _SharedMemoryFile(object):
+    """
+    A memory-mapped file, shared between the worker processes and the
+    main process.  The file grows on demand, and is never shrunk.
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._mmap = None
+
+    def _map(self, size, grow):
+        if self._mmap is not None and len(self._mmap) >= size:
+            return self._mmap
+        # the old map is released along with the arrays still viewing it
+        self._mmap = None
+        with open(self._path, 'r+b' if os.path.exists(self._path) else 'w+b') \
+                as f:
+            file_size = os.fstat(f.fileno()).st_size
+            if grow and file_size < size:
+                f.truncate(size)
+                file_size = size
+            self._mmap = mmap.mmap(f.fileno(), file_size)
+        return self._mmap
+
+    def write(self, arr):
+        """
+        Write the content of `arr` into this file.
+
+        Args:
+            arr (np.ndarray): A C-contiguous numpy array.
+        """
+        if arr.nbytes > 0:
+            buf = self._map(arr.nbytes, grow=True)
+            dst = np.frombuffer(buf, dtype=np.uint8, count=arr.nbytes)
+            dst[:] = arr.reshape(-1).view(np.uint8)
+            del dst
+
+    def read(self, dtype, shape, copy=True):
+        """
+        Read the array from this file.
+
+        Args:
+            dtype (np.dtype): The data type of the array.
+            shape (tuple[int]): The shape of the array.
+            copy (bool): Whether or not to copy the array out of this file?
+                If :obj:`False`, return a view of the file, which is only
+                valid until the file is written again.  (default :obj:`True`)
+
+        Returns:
+            np.ndarray: The array.
+        """
+        count = int(np.prod(shape))
+        if count == 0:
+            return np.empty(shape, dtype=dtype)
+        buf = self._map(count * dtype.itemsize, grow=False)
+        ret = np.frombuffer(buf, dtype=dtype, count=count).reshape(shape)
+        if copy:
+            ret = ret.copy()
+        return ret
+
+    def close(self):
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:  # pragma: no cover
+                pass  # released along with the arrays still viewing it
+            self._mmap = None
+
+
+class _SharedBatchSlots(object):
+    """Shared memory slots for handing over mini-batches."""
+
+    def __init__(self, buffer_dir, name):
+        self._buffer_dir = buffer_dir
+        self._name = name
+        self._files = {}
+
+    def _get_file(self, slot, index):
+        key = (slot, index)
+        if key not in self._files:
+            self._files[key] = _SharedMemoryFile(os.path.join(
+                self._buffer_dir,
+                '{}{}-{}.buf'.format(self._name, slot, index)
+            ))
+        return self._files[key]
+
+    def write(self, slot, batch):
+        """
+        Write a mini-batch into `slot`.
+
+        Returns:
+            list[(np.dtype, tuple[int])]: Dtype and shape of each array.
+        """
+        specs = []
+        for i, arr in enumerate(batch):
+            arr = np.asarray(arr, order='C')
+            if arr.dtype.hasobject:
+                raise TypeError('Arrays of object dtype cannot be passed '
+                                'through shared memory.')
+            self._get_file(slot, i).write(arr)
+            specs.append((arr.dtype, arr.shape))
+        return specs
+
+    def read(self, slot, specs, copy=True):
+        """Read the mini-batch from `slot`."""
+        return tuple(self._get_file(slot, i).read(dtype, shape, copy=copy)
+                     for i, (dtype, shape) in enumerate(specs))
+
+    def close(self):
+        for f in six.itervalues(self._files):
+            f.close()
+        self._files.clear()
+
+
+def _worker_main(worker_index, mappers, buffer_dir, task_queue, result_queue,
+                 seed, worker_init_func):
+    np.random.seed(seed)
+    _reseed_random_states(mappers, seed)
+    if worker_init_func is not None:
+        worker_init_func(worker_index)
+    input_slots = _SharedBatchSlots(buffer_dir, 'input')
+    output_slots = _SharedBatchSlots(buffer_dir, 'output')
+    try:
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+            epoch, seq, slot, specs = task
+            try:
+                # the input arrays are views of the shared memory, which
+                # remain valid until the slot is released by the main process
+                batch = input_slots.read(slot, specs, copy=False)
+                for mapper in mappers:
+                    batch = mapper._map_batch(batch)
+                specs = output_slots.write(slot, batch)
+            except Exception:
+                result_queue.put(
+                    ('error', epoch, seq, slot, traceback.format_exc()))
+            else:
+                result_queue.put(('batch', epoch, seq, slot, specs))
+            batch = None
+    finally:
+        input_slots.close()
+        output_slots.close()
+
+
+class MultiprocessFlow(DataFlow, AutoInitAndCloseable):
+    """
+    Data flow to prefetch from the source data flow with a pool of
+    worker processes.
+
+    If the source flow is a (chain of) :class:`MapperFlow`, the mappers
+    will be applied in the worker processes, which is not limited by the
+    Python GIL.  The underlying data source of the mapper chain is still
+    iterated in a background thread of the main process, thus the shuffling
+    states remain owned by this flow.  The source mini-batches and the
+    mapped mini-batches are handed over between the main process and the
+    workers through shared memory, rather than by pickling, thus arrays of
+    object dtype are not supported.  Each mapped mini-batch is copied out
+    of the shared memory once in the main process, such that its slot can
+    be reused before the mini-batch is released.
+
+    Usage::
+
+        mapper_flow = DataFlow.arrays([x], batch_size=256).map(sampler)
+        with mapper_flow.multiprocess(workers=4, prefetch=8) as df:
+            for epoch in epochs:
+                for [batch_x] in df:
+                    ...
+
+    The global NumPy random state, as well as the random states owned by
+    the mappers (e.g., that of a
+    :class:`~tfsnippet.preprocessing.BernoulliSampler`), are re-seeded in
+    each worker process with a different seed, such that the workers would
+    not draw identical random numbers.  Specify `worker_init_func` for
+    further per-worker initialization.
+    """
+
+    def __init__(self, source, workers, prefetch, worker_init_func=None):
+        """
+        Construct a :class:`MultiprocessFlow`.
+
+        Args:
+            source (DataFlow): The source data flow.
+            workers (int): Number of worker processes.  It should be at
+                least 1.
+            prefetch (int): Number of mini-batches to prefetch ahead,
+                including those being processed by the workers.
+                It should be at least 1, and should better be no less
+                than `workers` to keep all the workers busy.
+            worker_init_func ((int) -> None): Optional function to be called
+                in each worker process before it starts working, with the
+                index of the worker as argument.
+        """
+        # check the parameters
+        if workers < 1:
+            raise ValueError('`workers` must be at least 1')
+        if prefetch < 1:
+            raise ValueError('`prefetch` must be at least 1')
+
+        # split the source flow into the data source and the mapper chain
+        mappers = []
+        feeder = source
+        while isinstance(feeder, MapperFlow):
+            # detach the mapper from the source flow, such that only the
+            # mapper (not the data source) is sent to the workers
+            mappers.append(MapperFlow(None, feeder._mapper,
+                                      feeder.array_indices))
+            feeder = feeder.source
+        mappers.reverse()
+
+        # memorize the parameters
+        self._source = source
+        self._workers_num = workers
+        self._prefetch_num = prefetch
+        self._worker_init_func = worker_init_func
+        self._feeder_source = feeder
+        self._mappers = tuple(mappers)
+
+        # internal states for background workers
+        self._workers = None  # type: list[multiprocessing.Process]
+        self._feeder = None  # type: Thread
+        self._task_queue = None  # type: multiprocessing.Queue
+        self._result_queue = None  # type: multiprocessing.Queue
+        self._free_slots = None  # type: Queue
+        self._buffer_dir = None
+        self._input_slots = None  # type: _SharedBatchSlots
+        self._output_slots = None  # type: _SharedBatchSlots
+        self._pending = None  # results arrived ahead of their turn
+        self._epoch_counter = None  # counter for tracking the active epoch
+        self._stopping = None
+
+    @property
+    def source(self):
+        """Get the source data flow."""
+        return self._source
+
+    @property
+    def workers_num(self):
+        """Get the number of worker processes."""
+        return self._workers_num
+
+    @property
+    def prefetch_num(self):
+        """Get the number of batches to prefetch."""
+        return self._prefetch_num
+
+    def _acquire_slot(self, active_epoch):
+        while not self._stopping and active_epoch >= self._epoch_counter:
+            try:
+                return self._free_slots.get(timeout=_POLL_INTERVAL)
+            except Empty:
+                pass
+
+    def _feeder_func(self):
+        active_epoch = self._epoch_counter
+        seq = 0
+        try:
+            while not self._stopping:
+                # dispatch the mini-batches in the current epoch
+                seq = 0
+                for batch in self._feeder_source:
+                    slot = self._acquire_slot(active_epoch)
+                    if slot is None:
+                        break
+                    specs = self._input_slots.write(slot, batch)
+                    self._task_queue.put((active_epoch, seq, slot, specs))
+                    seq += 1
+
+                # put the epoch ending mark into the queue
+                if not self._stopping:
+                    self._result_queue.put(('end', active_epoch, seq, None,
+                                            None))
+
+                # move to the next epoch
+                active_epoch += 1
+        except Exception:
+            if not self._stopping:
+                self._result_queue.put(('error', active_epoch, seq, None,
+                                        traceback.format_exc()))
+                getLogger(__name__).warning(
+                    '{} feeder exited because of error.'.
+                    format(self.__class__.__name__),
+                    exc_info=True
+                )
+
+    def _init(self):
+        # prepare for the shared states
+        shm_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+        self._buffer_dir = tempfile.mkdtemp(prefix='tfsnippet-mp-flow-',
+                                            dir=shm_dir)
+        self._input_slots = _SharedBatchSlots(self._buffer_dir, 'input')
+        self._output_slots = _SharedBatchSlots(self._buffer_dir, 'output')
+        self._task_queue = multiprocessing.Queue()
+        self._result_queue = multiprocessing.Queue()
+        self._free_slots = Queue()
+        for slot in range(self.prefetch_num):
+            self._free_slots.put(slot)
+        self._pending = {}
+        self._epoch_counter = 0
+        self._stopping = False
+
+        # create and start the workers
+        self._workers = []
+        for i in range(self.workers_num):
+            worker = multiprocessing.Process(
+                target=_worker_main,
+                args=(i, self._mappers, self._buffer_dir, self._task_queue,
+                      self._result_queue, generate_random_seed(),
+                      self._worker_init_func)
+            )
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+
+        # create and start the feeder
+        self._feeder = Thread(target=self._feeder_func)
+        self._feeder.daemon = True
+        self._feeder.start()
+
+    def _close(self):
+        try:
+            # prevent the feeder and the workers from further work
+            self._stopping = True
+            self._feeder.join()
+            for _ in self._workers:
+                self._task_queue.put(None)
+            for worker in self._workers:
+                worker.join(timeout=1.)
+                if worker.is_alive():  # pragma: no cover
+                    worker.terminate()
+                    worker.join()
+        finally:
+            for q in (self._task_queue, self._result_queue):
+                q.cancel_join_thread()
+                q.close()
+            self._input_slots.close()
+            self._output_slots.close()
+            shutil.rmtree(self._buffer_dir, ignore_errors=True)
+            self._workers = None
+            self._feeder = None
+            self._task_queue = None
+            self._result_queue = None
+            self._free_slots = None
+            self._buffer_dir = None
+            self._input_slots = None
+            self._output_slots = None
+            self._pending = None
+            self._initialized = False
+
+    def _get_message(self):
+        while True:
+            # check the feeder before waiting, such that any message it has
+            # put before exiting would be received first
+            feeder_alive = self._feeder.is_alive()
+            try:
+                return self._result_queue.get(timeout=_POLL_INTERVAL)
+            except Empty:
+                if not feeder_alive:
+                    raise RuntimeError(
+                        'The feeder of {} has exited because of an error in '
+                        'the source flow.  Close the flow to restart it.'.
+                        format(self.__class__.__name__))
+                for worker in self._workers:
+                    if not worker.is_alive():
+                        raise RuntimeError(
+                            'Worker process {} exited unexpectedly with code '
+                            '{}.'.format(worker.pid, worker.exitcode))
+
+    def _discard(self, message):
+        slot = message[3]
+        if slot is not None:
+            self._free_slots.put(slot)
+
+    def _minibatch_iterator(self):
+        self.init()
+
+        try:
+            seq = 0
+            while True:
+                key = (self._epoch_counter, seq)
+                if key not in self._pending:
+                    message = self._get_message()
+                    if message[1] < self._epoch_counter:
+                        # we've got a remaining item from the last epoch,
+                        # skip it
+                        self._discard(message)
+                    else:
+                        # we've got an item for the current epoch, or one
+                        # from the future epoch, wait for its turn
+                        self._pending[message[1:3]] = message
+                    continue
+
+                kind, _, _, slot, payload = self._pending.pop(key)
+                if kind == 'end':
+                    # we've got the epoch ending mark for the current epoch,
+                    # so we should break the loop
+                    break
+                elif kind == 'error':
+                    self._discard((kind, None, None, slot))
+                    raise RuntimeError('Error in {}:\n{}'.format(
+                        self.__class__.__name__, payload))
+                else:
+                    # we've got a normal batch for the current epoch, so copy
+                    # it out of the shared memory and yield it
+                    try:
+                        batch = self._output_slots.read(slot, payload)
+                    finally:
+                        self._free_slots.put(slot)
+                    seq += 1
+                    yield batch
+        finally:
+            self._epoch_counter += 1
+            if self._pending:
+                for key in list(self._pending):
+                    if key[0] < self._epoch_counter:
+                        self._discard(self._pending.pop(key))
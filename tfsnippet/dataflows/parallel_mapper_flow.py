@@ -0,0 +1,259 @@
+import os
+import sys
+import traceback
+from multiprocessing import Pool, TimeoutError, active_children
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+import six
+
+from tfsnippet.utils import (AutoInitAndCloseable, generate_random_seed,
+                             validate_enum_arg)
+from .mapper_flow import MapperFlow, _reseed_random_states
+
+if six.PY2:
+    from Queue import Queue, Empty
+else:
+    from queue import Queue, Empty
+
+__all__ = ['ParallelMapperFlow']
+
+_POLL_INTERVAL = 0.1  # seconds between liveness checks of the workers
+_process_worker_flow = None  # the mapper flow in a process worker
+
+
+def _init_process_worker(flow, seed):
+    global _process_worker_flow
+    _process_worker_flow = flow
+    seed = (seed ^ os.getpid()) & 0xffffffff
+    np.random.seed(seed)
+    _reseed_random_states(flow, seed)
+
+
+def _process_map_batch(batch):
+    return _process_worker_flow._map_batch(batch)
+
+
+def _safe_call(func, batch):
+    try:
+        return True, func(batch)
+    except Exception:
+        # the traceback would be lost when the error is sent back from a
+        # worker process, thus it is formatted here
+        return False, (sys.exc_info()[1], traceback.format_exc())
+
+
+class ParallelMapperFlow(MapperFlow, AutoInitAndCloseable):
+    """
+    Data flow which transforms the mini-batch arrays from source flow
+    by a specified mapper function, with a pool of workers.
+
+    The mapper is called on the upcoming mini-batches concurrently, while
+    at most `prefetch` mini-batches are in flight at the same time.
+    The thread backend suits mappers which release the GIL (e.g., most
+    heavy NumPy routines), while the process backend suits pure Python
+    mappers.  The arrays are pickled between the processes in the latter
+    case, see :class:`MultiprocessFlow` for a shared memory alternative.
+    Only the mapper (not the source flow) is sent to the worker processes,
+    where the global NumPy random state and the random states owned by the
+    mapper are re-seeded with a different seed in each worker.
+
+    An error raised by the mapper is reported as a :class:`RuntimeError`
+    with the formatted traceback from the worker.  Other errors (e.g.,
+    failing to pickle a mini-batch for the process backend) are re-raised
+    as they are, and a worker process which exits unexpectedly is reported
+    as a :class:`RuntimeError`.  The process backend requires Python 3,
+    since the worker pool of Python 2 may hang on such errors.
+
+    Usage::
+
+        source_flow = DataFlow.arrays([x, y], batch_size=256)
+        mapper_flow = source_flow.map(augment, workers=4)
+        with mapper_flow:
+            for batch_x, batch_y in mapper_flow:
+                ...
+    """
+
+    def __init__(self, source, mapper, array_indices=None, workers=1,
+                 ordered=True, backend='thread', prefetch=None):
+        """
+        Construct a :class:`ParallelMapperFlow`.
+
+        Args:
+            source (DataFlow): The source data flow.
+            mapper ((\*np.ndarray) -> tuple[np.ndarray])): The mapper
+                function, which transforms numpy arrays into a tuple
+                of other numpy arrays.
+            array_indices (int or Iterable[int]): The indices of the arrays
+                to be processed within a mini-batch.  See :class:`MapperFlow`.
+            workers (int): Number of workers.  It should be at least 1.
+            ordered (bool): Whether or not to preserve the order of the
+                mini-batches?  If :obj:`False`, the mini-batches will be
+                yielded as soon as they are mapped. (default :obj:`True`)
+            backend ({'thread', 'process'}): Whether to run the mapper in
+                worker threads or in worker processes?  The latter requires
+                Python 3. (default "thread")
+            prefetch (int): Maximum number of mini-batches in flight.
+                (default ``2 * workers``)
+        """
+        super(ParallelMapperFlow, self).__init__(
+            source=source, mapper=mapper, array_indices=array_indices)
+
+        # check the parameters
+        if workers < 1:
+            raise ValueError('`workers` must be at least 1')
+        backend = validate_enum_arg('backend', backend, ('thread', 'process'))
+        if backend == 'process' and six.PY2:  # pragma: no cover
+            raise ValueError('`backend` "process" requires Python 3.')
+        if prefetch is None:
+            prefetch = 2 * workers
+        if prefetch < 1:
+            raise ValueError('`prefetch` must be at least 1')
+
+        # memorize the parameters
+        self._workers_num = workers
+        self._ordered = bool(ordered)
+        self._backend = backend
+        self._prefetch_num = prefetch
+
+        # the worker pool, and the pids of the worker processes
+        self._pool = None
+        self._worker_pids = None
+
+    @property
+    def workers_num(self):
+        """Get the number of workers."""
+        return self._workers_num
+
+    @property
+    def ordered(self):
+        """Whether or not to preserve the order of the mini-batches?"""
+        return self._ordered
+
+    @property
+    def backend(self):
+        """Get the backend of the workers, either "thread" or "process"."""
+        return self._backend
+
+    @property
+    def prefetch_num(self):
+        """Get the maximum number of mini-batches in flight."""
+        return self._prefetch_num
+
+    def _init(self):
+        if self._backend == 'thread':
+            self._pool = ThreadPool(self._workers_num)
+        else:
+            # detach the mapper from the source flow, such that only the
+            # mapper (not the data source) is sent to the workers
+            mapper_flow = MapperFlow(None, self._mapper, self._array_indices)
+            children = self._get_children_pids()
+            self._pool = Pool(self._workers_num,
+                              initializer=_init_process_worker,
+                              initargs=(mapper_flow, generate_random_seed()))
+            self._worker_pids = self._get_children_pids() - children
+
+    def _close(self):
+        try:
+            self._pool.terminate()
+            self._pool.join()
+        finally:
+            self._pool = None
+            self._worker_pids = None
+
+    @staticmethod
+    def _get_children_pids():
+        return frozenset(p.pid for p in active_children())
+
+    def _check_workers(self):
+        # a worker process died with a task would never finish the task,
+        # and the pool would have replaced it with a new process
+        if self._worker_pids is not None and \
+                not self._worker_pids.issubset(self._get_children_pids()):
+            raise RuntimeError('A worker process of {} exited unexpectedly.'.
+                               format(self.__class__.__name__))
+
+    def _wait_result(self, async_result):
+        while True:
+            try:
+                return async_result.get(timeout=_POLL_INTERVAL)
+            except TimeoutError:
+                self._check_workers()
+
+    def _wait_any(self, in_flight, done):
+        while True:
+            try:
+                seq = done.get(timeout=_POLL_INTERVAL)
+            except Empty:
+                # the tasks which failed outside of the mapper (e.g., failing
+                # to pickle the mini-batch) would not call back
+                ready = [k for k, r in six.iteritems(in_flight) if r.ready()]
+                if ready:
+                    return min(ready)
+                self._check_workers()
+            else:
+                # the task might have been found ready by polling
+                if seq in in_flight:
+                    return seq
+
+    def _minibatch_iterator(self):
+        self.init()
+
+        # the mapped mini-batches are obtained from the `AsyncResult`s in
+        # flight, while the results of an interrupted epoch will be dropped.
+        # If unordered, the completed tasks of each epoch are announced via
+        # a separated queue.
+        in_flight = {}
+        done = Queue()
+        func = self._map_batch if self._backend == 'thread' \
+            else _process_map_batch
+
+        def submit(seq, batch):
+            kwargs = {}
+            if not self._ordered:
+                kwargs['callback'] = lambda r: done.put(seq)
+            in_flight[seq] = self._pool.apply_async(
+                _safe_call, (func, batch), **kwargs)
+
+        source_iterator = iter(self._source)
+        exhausted = False
+        submitted = 0
+        yielded = 0
+
+        try:
+            while True:
+                # dispatch the upcoming mini-batches
+                while not exhausted and \
+                        submitted - yielded < self._prefetch_num:
+                    try:
+                        batch = next(source_iterator)
+                    except StopIteration:
+                        exhausted = True
+                    else:
+                        submit(submitted, batch)
+                        submitted += 1
+
+                if yielded >= submitted:
+                    break
+
+                # wait for the next mapped mini-batch, where the errors
+                # outside of the mapper are raised by `AsyncResult.get`
+                if self._ordered:
+                    seq = yielded
+                    ok, payload = self._wait_result(in_flight.pop(seq))
+                else:
+                    seq = self._wait_any(in_flight, done)
+                    ok, payload = in_flight.pop(seq).get()
+
+                yielded += 1
+                if not ok:
+                    error, formatted_tb = payload
+                    six.raise_from(
+                        RuntimeError('Error in {}:\n{}'.format(
+                            self.__class__.__name__, formatted_tb)),
+                        error
+                    )
+                yield payload
+        finally:
+            if hasattr(source_iterator, 'close'):
+                source_iterator.close()
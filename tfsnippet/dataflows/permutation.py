@@ -0,0 +1,140 @@
+import numpy as np
+
+__all__ = ['FeistelPermutation']
+
+_MASK64 = 0xffffffffffffffff
+
+
+def _splitmix64(state):
+    """Advance the splitmix64 generator, returning ``(state, value)``."""
+    state = (state + 0x9e3779b97f4a7c15) & _MASK64
+    z = state
+    z = ((z ^ (z >> 30)) * 0xbf58476d1ce4e5b9) & _MASK64
+    z = ((z ^ (z >> 27)) * 0x94d049bb133111eb) & _MASK64
+    return state, z ^ (z >> 31)
+
+
+def _mix(x):
+    """The splitmix64 finalizer on uint64 arrays."""
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xbf58476d1ce4e5b9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94d049bb133111eb)
+    return x ^ (x >> np.uint64(31))
+
+
+class FeistelPermutation(object):
+    """
+    A pseudo-random permutation of ``range(length)``, computed on the fly
+    by a Feistel network, which is determined by ``(seed, epoch)``.
+
+    Unlike shuffling an array of indices, which takes O(length) memory,
+    the permuted index of any position is computed directly from the
+    position, thus the permutation of a mini-batch can be computed with
+    O(batch_size) memory, starting from any position in an epoch::
+
+        perm = FeistelPermutation(len(x), seed=1234, epoch=epoch)
+        batch_x = x[perm(np.arange(start, start + batch_size))]
+
+    The Feistel network is a bijection on ``range(4 ** half_bits)``, where
+    ``4 ** half_bits`` is the smallest power of 4 not less than `length`.
+    The positions mapped outside of ``range(length)`` are mapped again
+    (i.e., cycle-walking) until they fall into the range, which takes
+    less than 4 evaluations on average.
+    """
+
+    def __init__(self, length, seed, epoch=0, rounds=6):
+        """
+        Construct a :class:`FeistelPermutation`.
+
+        Args:
+            length (int): The length of the permutation.
+            seed (int): The seed of the permutation.
+            epoch (int): The index of the epoch.  Different epochs with
+                the same seed have independent permutations.
+                (default ``0``)
+            rounds (int): The number of Feistel rounds. (default ``6``)
+        """
+        length = int(length)
+        if length < 0:
+            raise ValueError('`length` must be non-negative.')
+        rounds = int(rounds)
+        if rounds < 1:
+            raise ValueError('`rounds` must be at least 1.')
+        half_bits = 1
+        while (1 << (2 * half_bits)) < length:
+            half_bits += 1
+
+        # derive the round keys from `(seed, epoch)`
+        state, _ = _splitmix64(int(seed) & _MASK64)
+        state ^= (int(epoch) * 0xd1b54a32d192ed03) & _MASK64
+        keys = []
+        for _ in range(rounds):
+            state, value = _splitmix64(state)
+            keys.append(np.uint64(value))
+
+        self._length = length
+        self._seed = int(seed)
+        self._epoch = int(epoch)
+        self._half_bits = np.uint64(half_bits)
+        self._half_mask = np.uint64((1 << half_bits) - 1)
+        self._keys = tuple(keys)
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def length(self):
+        """Get the length of the permutation."""
+        return self._length
+
+    @property
+    def seed(self):
+        """Get the seed of the permutation."""
+        return self._seed
+
+    @property
+    def epoch(self):
+        """Get the index of the epoch."""
+        return self._epoch
+
+    def _encrypt(self, x):
+        left = x >> self._half_bits
+        right = x & self._half_mask
+        for key in self._keys:
+            left, right = right, left ^ (_mix(right ^ key) & self._half_mask)
+        return (left << self._half_bits) | right
+
+    def __call__(self, positions):
+        """
+        Get the permuted indices of `positions`.
+
+        Args:
+            positions (np.ndarray): Integer array of positions, ranging
+                from ``0`` to ``length - 1``.
+
+        Returns:
+            np.ndarray: The permuted indices, an int64 array with the same
+                shape as `positions`.
+        """
+        positions = np.asarray(positions)
+        x = positions.astype(np.uint64).reshape([-1])
+        bound = np.uint64(self._length)
+        with np.errstate(over='ignore'):
+            x = self._encrypt(x)
+            # cycle-walk the indices outside of the range
+            outside = np.where(x >= bound)[0]
+            while len(outside):
+                y = self._encrypt(x[outside])
+                x[outside] = y
+                outside = outside[y >= bound]
+        return x.astype(np.int64).reshape(positions.shape)
+
+    def to_array(self):
+        """
+        Get the whole permutation as an array.
+
+        Returns:
+            np.ndarray: The int64 array of ``self(np.arange(length))``.
+        """
+        return self(np.arange(self._length))
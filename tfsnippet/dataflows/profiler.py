@@ -0,0 +1,216 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+
+from tfsnippet.utils import AutoInitAndCloseable, camel_to_underscore
+from .base import DataFlow
+
+__all__ = ['DataFlowProfiler']
+
+_timer = getattr(time, 'perf_counter', time.time)
+
+
+def _batch_nbytes(batch):
+    return sum(getattr(a, 'nbytes', 0) for a in batch)
+
+
+class _StageStats(object):
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.batches = 0
+        self.time = 0.
+        self.nbytes = 0
+        self.queue_samples = 0
+        self.queue_size = 0
+
+
+class DataFlowProfiler(AutoInitAndCloseable):
+    """
+    Opt-in instrumentation of a data flow pipeline, which measures the time
+    spent by each stage of the pipeline, per mini-batch.
+
+    The stages are discovered from the data flow by following the `source`
+    and `flows` attributes.  While the profiler is installed (i.e., entered),
+    the mini-batch iterators of these stages are wrapped, such that the
+    time of obtaining each mini-batch from a stage is measured, excluding
+    the time spent by its upstream stages in the same thread.  Thus for a
+    prefetching stage (e.g., :class:`ThreadingFlow`), the measured time is
+    the time waiting for its queue, while its upstream stages are measured
+    in the background thread.
+
+    Usage::
+
+        train_flow = DataFlow.arrays([x, y], batch_size=256). \\
+            map(augment).threaded(5)
+        with DataFlowProfiler(train_flow) as profiler:
+            for epoch in loop.iter_epochs():
+                for step, (x, y) in loop.iter_steps(train_flow):
+                    ...
+                    loop.collect_metrics(profiler.get_metrics())
+
+    The metrics are the averages since the last reset, including:
+
+    *   ``<prefix><i>_<stage>_time``: the time of each stage per mini-batch.
+    *   ``<prefix><i>_<stage>_bytes``: the bytes produced by each stage
+        per mini-batch.
+    *   ``<prefix><i>_<stage>_queue_size``: the number of prefetched
+        mini-batches in the queue of a threaded stage, sampled before
+        obtaining each mini-batch.
+    *   ``<prefix>wait_time``: the time the consumer waits for each
+        mini-batch from the pipeline.
+    *   ``<prefix>consumer_time``: the time the consumer spends between
+        obtaining two mini-batches.
+    """
+
+    def __init__(self, flow, prefix='flow_'):
+        """
+        Construct a :class:`DataFlowProfiler`.
+
+        Args:
+            flow (DataFlow): The data flow to be profiled.
+            prefix (str): The prefix of the metric names.
+                (default ``"flow_"``)
+        """
+        if not isinstance(flow, DataFlow):
+            raise TypeError('Not a DataFlow: {!r}'.format(flow))
+
+        # discover the stages of the pipeline
+        stages = []
+        queue = [flow]
+        while queue:
+            stage = queue.pop(0)
+            if any(s is stage for s in stages):
+                continue
+            stages.append(stage)
+            source = getattr(stage, 'source', None)
+            if isinstance(source, DataFlow):
+                queue.append(source)
+            for f in getattr(stage, 'flows', None) or ():
+                if isinstance(f, DataFlow):
+                    queue.append(f)
+
+        self._flow = flow
+        self._prefix = prefix
+        self._stages = tuple(stages)
+        self._stage_names = tuple(
+            '{}_{}'.format(i, camel_to_underscore(s.__class__.__name__))
+            for i, s in enumerate(stages)
+        )
+        self._stats = [_StageStats() for _ in stages]
+        self._wait_stats = _StageStats()
+        self._consumer_stats = _StageStats()
+        self._local = threading.local()
+
+    @property
+    def flow(self):
+        """Get the profiled data flow."""
+        return self._flow
+
+    @property
+    def stages(self):
+        """Get the stages of the pipeline, starting from the profiled flow."""
+        return self._stages
+
+    @property
+    def stage_names(self):
+        """Get the names of the stages in the metrics."""
+        return self._stage_names
+
+    def _get_frames(self):
+        frames = getattr(self._local, 'frames', None)
+        if frames is None:
+            frames = self._local.frames = []
+        return frames
+
+    def _profiled_iterator(self, index, iterator_factory):
+        stage = self._stages[index]
+        stats = self._stats[index]
+        is_root = index == 0
+        iterator = iterator_factory()
+
+        while True:
+            # sample the queue size of prefetching stages
+            q = getattr(stage, '_batch_queue', None)
+            if q is not None:
+                stats.queue_samples += 1
+                stats.queue_size += q.qsize()
+
+            # obtain the next mini-batch, measuring the time of this stage
+            # excluding the nested stages in the same thread
+            frames = self._get_frames()
+            frame = [0.]
+            frames.append(frame)
+            start = _timer()
+            try:
+                batch = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                elapsed = _timer() - start
+                frames.pop()
+                if frames:
+                    frames[-1][0] += elapsed
+
+            stats.batches += 1
+            stats.time += elapsed - frame[0]
+            stats.nbytes += _batch_nbytes(batch)
+            if not is_root:
+                yield batch
+            else:
+                self._wait_stats.batches += 1
+                self._wait_stats.time += elapsed
+                yielded_at = _timer()
+                yield batch
+                self._consumer_stats.batches += 1
+                self._consumer_stats.time += _timer() - yielded_at
+
+    def _init(self):
+        for i, stage in enumerate(self._stages):
+            stage._minibatch_iterator = partial(
+                self._profiled_iterator, i, stage._minibatch_iterator)
+
+    def _close(self):
+        for stage in self._stages:
+            stage.__dict__.pop('_minibatch_iterator', None)
+
+    def reset(self):
+        """Reset the collected statistics."""
+        for stats in self._stats:
+            stats.reset()
+        self._wait_stats.reset()
+        self._consumer_stats.reset()
+
+    def get_metrics(self, reset=True):
+        """
+        Get the averaged metrics since the last reset.
+
+        Args:
+            reset (bool): Whether or not to reset the statistics after
+                obtaining the metrics? (default :obj:`True`)
+
+        Returns:
+            dict[str, float]: The metrics.  The stages which have not
+                produced any mini-batch since the last reset are excluded.
+        """
+        ret = OrderedDict()
+        for name, stats in zip(self._stage_names, self._stats):
+            prefix = self._prefix + name
+            if stats.batches:
+                ret[prefix + '_time'] = stats.time / stats.batches
+                ret[prefix + '_bytes'] = float(stats.nbytes) / stats.batches
+            if stats.queue_samples:
+                ret[prefix + '_queue_size'] = \
+                    float(stats.queue_size) / stats.queue_samples
+        if self._wait_stats.batches:
+            ret[self._prefix + 'wait_time'] = \
+                self._wait_stats.time / self._wait_stats.batches
+        if self._consumer_stats.batches:
+            ret[self._prefix + 'consumer_time'] = \
+                self._consumer_stats.time / self._consumer_stats.batches
+        if reset:
+            self.reset()
+        return ret
@@ -0,0 +1,161 @@
+import numpy as np
+
+from .array_flow import _make_readonly
+from .base import DataFlow
+
+__all__ = ['RebatchFlow']
+
+
+def _empty_batch(chunk, batch_size):
+    """Allocate the output arrays of a mini-batch, resembling `chunk`."""
+    return tuple(np.empty((batch_size,) + a.shape[1:], dtype=a.dtype)
+                 for a in chunk)
+
+
+def _rebatch(chunks, batch_size, skip_incomplete, allocate=None):
+    """
+    Re-batch an iterator of array tuples into mini-batches of `batch_size`.
+
+    Slices of an incoming tuple which cover a whole mini-batch are yielded
+    as views, while the other mini-batches are stitched into the output
+    arrays obtained from ``allocate(chunk)``, or newly allocated arrays
+    if `allocate` is not specified.
+    """
+    out = None
+    filled = 0
+    for chunk in chunks:
+        length = len(chunk[0])
+        start = 0
+        while start < length:
+            # the mini-batch lies within this chunk, yield the views
+            if not filled and length - start >= batch_size:
+                yield tuple(a[start: start + batch_size] for a in chunk)
+                start += batch_size
+                continue
+
+            # otherwise copy the items into the output arrays
+            if out is None:
+                if allocate is None:
+                    out = _empty_batch(chunk, batch_size)
+                else:
+                    out = allocate(chunk)
+            count = min(batch_size - filled, length - start)
+            for o, a in zip(out, chunk):
+                o[filled: filled + count] = a[start: start + count]
+            filled += count
+            start += count
+            if filled == batch_size:
+                yield out
+                out = None
+                filled = 0
+
+    if filled and not skip_incomplete:
+        yield tuple(o[:filled] for o in out)
+
+
+class RebatchFlow(DataFlow):
+    """
+    Data flow which splits and stitches the mini-batches from the source
+    flow into mini-batches of `batch_size`, without materializing the
+    whole source flow.
+
+    Usage::
+
+        # the mapper may produce mini-batches of arbitrary sizes
+        source_flow = DataFlow.arrays([x, y], batch_size=256). \\
+            map(drop_invalid_samples)
+        rebatched_flow = source_flow.rebatch(256, skip_incomplete=True)
+        for batch_x, batch_y in rebatched_flow:
+            ...
+
+    The mini-batches lying within one source mini-batch are yielded as
+    views of the source mini-batch.  The other mini-batches are stitched
+    into newly allocated arrays, or into pre-allocated buffers if
+    `ring_buffer_size` is specified.
+    """
+
+    def __init__(self, source, batch_size, skip_incomplete=False,
+                 ring_buffer_size=None):
+        """
+        Construct a :class:`RebatchFlow`.
+
+        Args:
+            source (DataFlow): The source data flow.
+            batch_size (int): Size of each mini-batch.
+            skip_incomplete (bool): Whether or not to exclude the last
+                mini-batch if it is incomplete? (default :obj:`False`)
+            ring_buffer_size (None or int): If specified, stitch mini-batches
+                into this number of pre-allocated buffers, which are reused
+                in a round-robin manner, instead of allocating new arrays
+                for each stitched mini-batch.  The stitched mini-batches
+                are read-only, and remain valid only until another
+                `ring_buffer_size` mini-batches have been stitched.
+                See :class:`ArrayFlow` for choosing this number.
+                (default :obj:`None`, allocate new arrays)
+        """
+        # check the parameters
+        batch_size = int(batch_size)
+        if batch_size < 1:
+            raise ValueError('`batch_size` must be at least 1.')
+        if ring_buffer_size is not None:
+            ring_buffer_size = int(ring_buffer_size)
+            if ring_buffer_size < 1:
+                raise ValueError('`ring_buffer_size` must be at least 1.')
+
+        # memorize the parameters
+        self._source = source
+        self._batch_size = batch_size
+        self._skip_incomplete = bool(skip_incomplete)
+        self._ring_buffer_size = ring_buffer_size
+
+        # internal ring buffers for stitching mini-batches
+        self._ring_buffers = None
+        self._ring_cursor = 0
+
+    @property
+    def source(self):
+        """Get the source data flow."""
+        return self._source
+
+    @property
+    def batch_size(self):
+        """Get the size of each mini-batch."""
+        return self._batch_size
+
+    @property
+    def skip_incomplete(self):
+        """
+        Whether or not to exclude the last mini-batch if it is incomplete?
+        """
+        return self._skip_incomplete
+
+    @property
+    def ring_buffer_size(self):
+        """Get the number of pre-allocated buffers for mini-batches."""
+        return self._ring_buffer_size
+
+    def _allocate(self, chunk):
+        if self._ring_buffers is None:
+            self._ring_buffers = [None] * self._ring_buffer_size
+        buffers = self._ring_buffers[self._ring_cursor]
+        if buffers is None or any(
+                b.dtype != a.dtype or b.shape[1:] != a.shape[1:]
+                for b, a in zip(buffers, chunk)):
+            buffers = _empty_batch(chunk, self._batch_size)
+            self._ring_buffers[self._ring_cursor] = buffers
+        self._ring_cursor = (self._ring_cursor + 1) % self._ring_buffer_size
+        return buffers
+
+    def _minibatch_iterator(self):
+        if self._ring_buffer_size is None:
+            allocate = None
+        else:
+            allocate = self._allocate
+        for batch in _rebatch(self._source, batch_size=self._batch_size,
+                              skip_incomplete=self._skip_incomplete,
+                              allocate=allocate):
+            if allocate is not None:
+                # the buffers are exposed as read-only views, like the
+                # mini-batches gathered into the buffers by `ArrayFlow`
+                batch = tuple(_make_readonly(a[...]) for a in batch)
+            yield batch
@@ -0,0 +1,322 @@
+import numpy as np
+
+from .array_flow import ArrayFlow
+
+__all__ = ['WeightedSamplingFlow', 'StratifiedSamplingFlow']
+
+
+def _allocate_counts(size, proportions):
+    """
+    Allocate `size` items to the classes according to `proportions`,
+    by the largest remainder method.
+    """
+    quotas = size * proportions
+    counts = np.floor(quotas).astype(np.int64)
+    remainder = size - int(np.sum(counts))
+    if remainder > 0:
+        # stable sort, such that the ties are broken by the class order
+        order = np.argsort(counts - quotas, kind='mergesort')
+        counts[order[:remainder]] += 1
+    return counts
+
+
+class WeightedSamplingFlow(ArrayFlow):
+    """
+    Using numpy-like arrays as data source flow, sampling the items in
+    each epoch according to the specified weights.
+
+    Usage::
+
+        # over-sample the rare classes
+        weights = 1. / np.bincount(y)[y]
+        weighted_flow = DataFlow.weighted([x, y], weights, batch_size=256)
+        for batch_x, batch_y in weighted_flow:
+            ...
+
+    With replacement, the items are sampled by searching uniform random
+    numbers in the cumulative sums of the weights, which are computed only
+    once.  Without replacement, the items are sampled by the exponential
+    races of the weights (i.e., taking the items with the smallest keys
+    ``e_i / w_i``, where ``e_i`` are standard exponential random numbers),
+    which is selected in linear time by ``np.argpartition``, and then
+    shuffled in linear time.
+    """
+
+    def __init__(self, arrays, weights, batch_size, replacement=True,
+                 epoch_size=None, skip_incomplete=False, random_state=None,
+                 ring_buffer_size=None):
+        """
+        Construct a :class:`WeightedSamplingFlow`.
+
+        Args:
+            arrays: List of numpy-like arrays, to be iterated through
+                mini-batches.  These arrays should be at least 1-d,
+                with identical first dimension.
+            weights: 1-d array, the non-negative weights of the items.
+                They need not be normalized.
+            batch_size (int): Size of each mini-batch.
+            replacement (bool): Whether or not to sample the items with
+                replacement? (default :obj:`True`)
+            epoch_size (int): The number of items to sample in each epoch.
+                If `replacement` is :obj:`False`, it must not exceed the
+                number of items with non-zero weights.
+                (default :obj:`None`, the length of `arrays`)
+            skip_incomplete (bool): Whether or not to exclude the last
+                mini-batch if it is incomplete? (default :obj:`False`)
+            random_state (RandomState): Optional numpy RandomState for
+                sampling data in each epoch.  (default :obj:`None`,
+                construct a new :class:`RandomState`).
+            ring_buffer_size (None or int): If specified, gather mini-batches
+                into this number of reused buffers.  See :class:`ArrayFlow`
+                for the lifetime of the mini-batches in this case.
+                (default :obj:`None`)
+        """
+        super(WeightedSamplingFlow, self).__init__(
+            arrays=arrays,
+            batch_size=batch_size,
+            shuffle=True,
+            skip_incomplete=skip_incomplete,
+            random_state=random_state,
+            ring_buffer_size=ring_buffer_size
+        )
+
+        # check the parameters
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.shape != (self.data_length,):
+            raise ValueError('`weights` must be a 1-d array with the same '
+                             'data length as `arrays`.')
+        if not np.all(np.isfinite(weights)) or np.any(weights < 0):
+            raise ValueError('`weights` must be finite and non-negative.')
+        non_zero = int(np.count_nonzero(weights))
+        if not non_zero:
+            raise ValueError('`weights` must have at least one non-zero '
+                             'element.')
+        if epoch_size is None:
+            epoch_size = self.data_length
+        epoch_size = int(epoch_size)
+        if epoch_size < 0:
+            raise ValueError('`epoch_size` must be non-negative.')
+        if not replacement and epoch_size > non_zero:
+            raise ValueError('`epoch_size` must not exceed the number of '
+                             'items with non-zero weights, when sampling '
+                             'without replacement: {} vs {}.'.
+                             format(epoch_size, non_zero))
+
+        # memorize the parameters
+        self._weights = weights
+        self._replacement = bool(replacement)
+        self._epoch_size = epoch_size
+        self._cum_weights = np.cumsum(weights) if replacement else None
+
+    @property
+    def weights(self):
+        """Get the weights of the items."""
+        return self._weights
+
+    @property
+    def replacement(self):
+        """Whether or not to sample the items with replacement?"""
+        return self._replacement
+
+    @property
+    def epoch_size(self):
+        """Get the number of items to sample in each epoch."""
+        return self._epoch_size
+
+    def _sample_indices(self):
+        rs = self._random_state
+        if self._replacement:
+            u = rs.uniform(0., self._cum_weights[-1], size=self._epoch_size)
+            indices = np.searchsorted(self._cum_weights, u, side='right')
+            # guard against the rounding errors at the right end
+            np.minimum(indices, self.data_length - 1, out=indices)
+        else:
+            with np.errstate(divide='ignore'):
+                keys = rs.standard_exponential(self.data_length) / \
+                    self._weights
+            k = self._epoch_size
+            if k < self.data_length:
+                indices = np.argpartition(keys, k)[:k]
+            else:
+                indices = np.arange(self.data_length)
+            # the order of the sampled items is not random yet
+            rs.shuffle(indices)
+        return indices.astype(self._index_dtype())
+
+    def _minibatch_iterator(self):
+        self._epoch_random_state = self._random_state.get_state()
+        self._epoch += 1
+        indices = self._sample_indices()
+        for batch_s in self._iter_batch_slices(self._epoch_size):
+            yield self._gather(indices[batch_s])
+
+
+class StratifiedSamplingFlow(ArrayFlow):
+    """
+    Using numpy-like arrays as data source flow, sampling the items in each
+    mini-batch according to the fixed proportions of classes.
+
+    Each mini-batch contains ``round(batch_size * proportion)`` items of
+    each class (rounded by the largest remainder method, such that the
+    counts sum up to `batch_size`).  The items of each class are taken from
+    random permutations of this class, which are repeated if the class is
+    over-sampled in an epoch.
+
+    Usage::
+
+        # each mini-batch has 128 positive and 128 negative samples
+        stratified_flow = DataFlow.stratified(
+            [x, y], labels=y, batch_size=256, proportions={0: .5, 1: .5})
+        for batch_x, batch_y in stratified_flow:
+            ...
+    """
+
+    def __init__(self, arrays, labels, batch_size, proportions=None,
+                 epoch_size=None, skip_incomplete=False, random_state=None,
+                 ring_buffer_size=None):
+        """
+        Construct a :class:`StratifiedSamplingFlow`.
+
+        Args:
+            arrays: List of numpy-like arrays, to be iterated through
+                mini-batches.  These arrays should be at least 1-d,
+                with identical first dimension.
+            labels: 1-d array, the class labels of the items.
+            batch_size (int): Size of each mini-batch.
+            proportions (dict): The proportions of the classes in each
+                mini-batch, ``{label: proportion}``.  They need not be
+                normalized.  (default :obj:`None`, the proportions of the
+                classes in `labels`)
+            epoch_size (int): The number of items to sample in each epoch.
+                (default :obj:`None`, the length of `arrays`)
+            skip_incomplete (bool): Whether or not to exclude the last
+                mini-batch if it is incomplete? (default :obj:`False`)
+            random_state (RandomState): Optional numpy RandomState for
+                sampling data in each epoch.  (default :obj:`None`,
+                construct a new :class:`RandomState`).
+            ring_buffer_size (None or int): If specified, gather mini-batches
+                into this number of reused buffers.  See :class:`ArrayFlow`
+                for the lifetime of the mini-batches in this case.
+                (default :obj:`None`)
+        """
+        super(StratifiedSamplingFlow, self).__init__(
+            arrays=arrays,
+            batch_size=batch_size,
+            shuffle=True,
+            skip_incomplete=skip_incomplete,
+            random_state=random_state,
+            ring_buffer_size=ring_buffer_size
+        )
+
+        # check the parameters
+        labels = np.asarray(labels)
+        if labels.shape != (self.data_length,):
+            raise ValueError('`labels` must be a 1-d array with the same '
+                             'data length as `arrays`.')
+        classes, class_ids, class_counts = np.unique(
+            labels, return_inverse=True, return_counts=True)
+
+        if proportions is None:
+            class_proportions = class_counts.astype(np.float64)
+        else:
+            class_proportions = np.zeros([len(classes)], dtype=np.float64)
+            for label, p in dict(proportions).items():
+                i = np.searchsorted(classes, label)
+                if i >= len(classes) or classes[i] != label:
+                    raise ValueError('Class {!r} in `proportions` does not '
+                                     'exist in `labels`.'.format(label))
+                class_proportions[i] = p
+        if not np.all(np.isfinite(class_proportions)) or \
+                np.any(class_proportions < 0) or \
+                not np.any(class_proportions > 0):
+            raise ValueError('`proportions` must be finite and '
+                             'non-negative, with at least one non-zero '
+                             'element.')
+        class_proportions /= np.sum(class_proportions)
+
+        if epoch_size is None:
+            epoch_size = self.data_length
+        epoch_size = int(epoch_size)
+        if epoch_size < 0:
+            raise ValueError('`epoch_size` must be non-negative.')
+
+        # memorize the parameters
+        self._labels = labels
+        self._classes = classes
+        self._class_proportions = class_proportions
+        self._epoch_size = epoch_size
+
+        # the indices of the items of each class
+        order = np.argsort(class_ids, kind='mergesort'). \
+            astype(self._index_dtype())
+        self._class_indices = tuple(
+            np.split(order, np.cumsum(class_counts)[:-1]))
+
+    @property
+    def labels(self):
+        """Get the class labels of the items."""
+        return self._labels
+
+    @property
+    def classes(self):
+        """Get the sorted unique class labels."""
+        return self._classes
+
+    @property
+    def class_sizes(self):
+        """Get the number of items of each class."""
+        return tuple(len(idx) for idx in self._class_indices)
+
+    @property
+    def class_proportions(self):
+        """Get the normalized proportions of the classes in mini-batches."""
+        return self._class_proportions
+
+    @property
+    def epoch_size(self):
+        """Get the number of items to sample in each epoch."""
+        return self._epoch_size
+
+    def _draw_class(self, c, count):
+        # draw `count` items from the repeated permutations of class `c`
+        class_indices = self._class_indices[c]
+        repeats = -(-count // len(class_indices))
+        pieces = []
+        for _ in range(repeats):
+            pieces.append(self._random_state.permutation(class_indices))
+        return np.concatenate(pieces)[:count] if pieces else class_indices[:0]
+
+    def _sample_indices(self):
+        batch_size = self.batch_size
+        full_batches, tail_size = divmod(self._epoch_size, batch_size)
+        if self.skip_incomplete:
+            tail_size = 0
+        full_counts = _allocate_counts(batch_size, self._class_proportions)
+        tail_counts = _allocate_counts(tail_size, self._class_proportions)
+
+        # draw the items of each class for the whole epoch, and assign
+        # them to the class columns of the mini-batches
+        full = np.empty([full_batches, batch_size], dtype=self._index_dtype())
+        tail = np.empty([tail_size], dtype=self._index_dtype())
+        full_offset = tail_offset = 0
+        for c, (m, n) in enumerate(zip(full_counts, tail_counts)):
+            drawn = self._draw_class(c, full_batches * m + n)
+            full[:, full_offset: full_offset + m] = \
+                drawn[:full_batches * m].reshape([full_batches, m])
+            tail[tail_offset: tail_offset + n] = drawn[full_batches * m:]
+            full_offset += m
+            tail_offset += n
+
+        # shuffle the items within each mini-batch
+        rs = self._random_state
+        order = np.argsort(rs.uniform(size=full.shape), axis=-1)
+        full = full[np.arange(full_batches)[:, np.newaxis], order]
+        rs.shuffle(tail)
+        return np.concatenate([full.reshape([-1]), tail])
+
+    def _minibatch_iterator(self):
+        self._epoch_random_state = self._random_state.get_state()
+        self._epoch += 1
+        indices = self._sample_indices()
+        for batch_s in self._iter_batch_slices(len(indices)):
+            yield self._gather(indices[batch_s])
@@ -70,3 +70,54 @@ class SeqFlow(ArrayFlow):
     def step(self):
         """Get the step of the sequence."""
         return self._step
+
+    def shard(self, num_shards, shard_index, seed=None, tail='pad'):
+        """
+        Construct a data flow, which iterates through one shard of the
+        number sequence of this flow.
+
+        If this flow is not shuffled, and no padding is required (i.e.,
+        `tail` is "drop", or the sequence can be evenly divided into
+        shards), the shard is just a sub-range of this sequence, thus a
+        :class:`SeqFlow` of this sub-range is returned, which yields the
+        same mini-batches as :meth:`ArrayFlow.shard`.  Otherwise a
+        :class:`~tfsnippet.dataflows.ShardedArrayFlow` is returned, see
+        :meth:`ArrayFlow.shard`.
+
+        Args:
+            num_shards (int): The number of shards.
+            shard_index (int): The index of the shard, ranging from ``0``
+                to ``num_shards - 1``.
+            seed (int): The seed of the permutations shared by all the
+                shards.  Required if this flow is shuffled.
+            tail ({'pad', 'drop'}): Whether to pad or to drop the numbers
+                which cannot be evenly divided into shards?
+                (default "pad")
+
+        Returns:
+            SeqFlow or tfsnippet.dataflows.ShardedArrayFlow: The sharded
+                data flow.
+        """
+        num_shards = int(num_shards)
+        shard_index = int(shard_index)
+        length = self.data_length
+        is_sub_range = (
+            not self.is_shuffled and length > 0 and
+            0 <= shard_index < num_shards and
+            (tail == 'drop' or (tail == 'pad' and length % num_shards == 0))
+        )
+        if not is_sub_range:
+            # the parameters are also validated by `ArrayFlow.shard()`
+            return super(SeqFlow, self).shard(
+                num_shards, shard_index, seed=seed, tail=tail)
+
+        shard_length = length // num_shards
+        shard_start = self._start + shard_index * shard_length * self._step
+        return SeqFlow(
+            start=shard_start,
+            stop=shard_start + shard_length * self._step,
+            step=self._step,
+            batch_size=self.batch_size,
+            skip_incomplete=self.skip_incomplete,
+            dtype=self.the_arrays[0].dtype
+        )
@@ -0,0 +1,243 @@
+import numpy as np
+
+from tfsnippet.utils import validate_enum_arg
+from .array_flow import ArrayFlow, _make_readonly
+from .permutation import FeistelPermutation, _MASK64, _splitmix64
+
+__all__ = ['ShardedArrayFlow']
+
+
+def _epoch_seed(seed, epoch):
+    """
+    Derive the seed of the permutation at `epoch` from `seed`.
+
+    The seeds are hashed by splitmix64, rather than taken as ``seed + epoch``,
+    such that the flows with consecutive seeds would not share permutations
+    at different epochs.
+    """
+    state, _ = _splitmix64(int(seed) & _MASK64)
+    state ^= (int(epoch) * 0xd1b54a32d192ed03) & _MASK64
+    _, value = _splitmix64(state)
+    return value & 0xffffffff
+
+
+class ShardedArrayFlow(ArrayFlow):
+    """
+    Using one shard of numpy-like arrays as data source flow.
+
+    The data are divided into `num_shards` disjoint shards of the same
+    length.  If shuffled, all the shards share the same permutation at
+    each epoch, which is determined by ``(seed, epoch)``, so that each
+    worker of data parallel training sees a disjoint part of every
+    shuffled epoch, without any communication among the workers.
+
+    Usage::
+
+        # in the worker with rank `rank`
+        train_flow = DataFlow.arrays([x, y], batch_size=256, shuffle=True). \\
+            shard(num_shards=world_size, shard_index=rank, seed=1234)
+        for batch_x, batch_y in train_flow:
+            ...
+    """
+
+    def __init__(self, arrays, batch_size, num_shards, shard_index,
+                 shuffle=False, skip_incomplete=False, seed=None,
+                 tail='pad', ring_buffer_size=None, shuffle_block_size=None,
+                 counter_based=False):
+        """
+        Construct a :class:`ShardedArrayFlow`.
+
+        Args:
+            arrays: List of numpy-like arrays, to be iterated through
+                mini-batches.  These arrays should be at least 1-d,
+                with identical first dimension.
+            batch_size (int): Size of each mini-batch.
+            num_shards (int): The number of shards.
+            shard_index (int): The index of the shard for this flow,
+                ranging from ``0`` to ``num_shards - 1``.
+            shuffle (bool): Whether or not to shuffle data before iterating?
+                (default :obj:`False`)
+            skip_incomplete (bool): Whether or not to exclude the last
+                mini-batch if it is incomplete? (default :obj:`False`)
+            seed (int): The seed of the permutations shared by all the
+                shards.  Required if `shuffle` is :obj:`True`.
+            tail ({'pad', 'drop'}): How to deal with the data which cannot
+                be evenly divided into shards.  If "pad", the data will be
+                padded by repeating the head of the (shuffled) data.
+                If "drop", these data will be dropped. (default "pad")
+            ring_buffer_size (None or int): If specified, gather mini-batches
+                into this number of reused buffers.  See :class:`ArrayFlow`
+                for the lifetime of the mini-batches in this case.
+                (default :obj:`None`)
+            shuffle_block_size (None or int): If specified, shuffle the
+                whole data by contiguous blocks of this size, with the
+                order of the blocks shared by all the shards at each epoch.
+                See :class:`ArrayFlow` for the zero-copy mini-batches in
+                this case.  Cannot be specified along with `counter_based`.
+                (default :obj:`None`)
+            counter_based (bool): Whether or not to compute the shared
+                permutations on the fly by
+                :class:`~tfsnippet.dataflows.FeistelPermutation`, with O(1)
+                extra memory, instead of materializing the permutations?
+                (default :obj:`False`)
+        """
+        # check the parameters
+        num_shards = int(num_shards)
+        shard_index = int(shard_index)
+        if num_shards < 1:
+            raise ValueError('`num_shards` must be at least 1.')
+        if shard_index < 0 or shard_index >= num_shards:
+            raise ValueError('`shard_index` must be in the range [0, {}): '
+                             'got {}.'.format(num_shards, shard_index))
+        if shuffle and seed is None:
+            raise ValueError('`seed` is required when `shuffle` is True, '
+                             'such that all the shards share the same '
+                             'permutation.')
+        tail = validate_enum_arg('tail', tail, ('pad', 'drop'))
+        if counter_based and shuffle_block_size is not None:
+            raise ValueError('`counter_based` and `shuffle_block_size` '
+                             'cannot be both specified.')
+
+        super(ShardedArrayFlow, self).__init__(
+            arrays=arrays,
+            batch_size=batch_size,
+            shuffle=shuffle,
+            skip_incomplete=skip_incomplete,
+            ring_buffer_size=ring_buffer_size,
+            shuffle_block_size=shuffle_block_size
+        )
+
+        # compute the length of each shard
+        total_length = self._data_length
+        if total_length == 0:
+            raise ValueError('`arrays` must not be empty to be sharded.')
+        if tail == 'pad':
+            shard_length = (total_length + num_shards - 1) // num_shards
+        else:
+            shard_length = total_length // num_shards
+
+        # memorize the parameters
+        self._total_length = total_length
+        self._data_length = shard_length
+        self._num_shards = num_shards
+        self._shard_index = shard_index
+        self._seed = seed
+        self._tail = tail
+        self._counter_based = bool(counter_based)
+        self._epoch = 0
+
+    @property
+    def num_shards(self):
+        """Get the number of shards."""
+        return self._num_shards
+
+    @property
+    def shard_index(self):
+        """Get the index of the shard for this flow."""
+        return self._shard_index
+
+    @property
+    def seed(self):
+        """Get the seed of the permutations shared by all the shards."""
+        return self._seed
+
+    @property
+    def tail(self):
+        """Get how to deal with the uneven tail, either "pad" or "drop"."""
+        return self._tail
+
+    @property
+    def counter_based(self):
+        """Whether or not the permutations are computed on the fly?"""
+        return self._counter_based
+
+    @property
+    def total_length(self):
+        """Get the total length of the data among all the shards."""
+        return self._total_length
+
+    @property
+    def epoch(self):
+        """Get the number of epochs which have been started."""
+        return self._epoch
+
+    def get_state(self):
+        """
+        Get the iteration state of this flow.
+
+        Returns:
+            dict: The state dict, with the index of the current epoch (or of
+                the next epoch, if no epoch is in progress), and the number
+                of mini-batches which have been obtained in the current epoch.
+        """
+        epoch = self._epoch
+        if self._batch_cursor:
+            epoch -= 1
+        return {'epoch': epoch, 'batch_cursor': self._batch_cursor}
+
+    def set_state(self, state):
+        """
+        Set the iteration state of this flow.
+
+        Args:
+            state (dict): The state dict, obtained by :meth:`get_state`.
+        """
+        self._epoch = state['epoch']
+        self._batch_cursor = 0
+        self._skip_batches = state['batch_cursor']
+
+    def _index_dtype(self):
+        # the indices address the whole arrays (plus the padded tail),
+        # rather than only this shard
+        max_index = max(self._total_length,
+                        self._num_shards * self._data_length)
+        return np.int32 if max_index < (1 << 31) else np.int64
+
+    def _epoch_permutation(self, epoch):
+        if self._counter_based:
+            return FeistelPermutation(
+                self._total_length, seed=self._seed, epoch=epoch)
+        seed = _epoch_seed(self._seed, epoch)
+        return np.random.RandomState(seed).permutation(
+            self._total_length).astype(self._index_dtype())
+
+    def _minibatch_iterator(self):
+        epoch = self._epoch
+        self._epoch += 1
+        total_length = self._total_length
+        shard_start = self._shard_index * self._data_length
+
+        if self.is_shuffled and self._shuffle_block_size is not None:
+            block_getter = self._block_shuffled_getter(
+                np.random.RandomState(_epoch_seed(self._seed, epoch)),
+                total_length
+            )
+
+            def get_slice(s):
+                return block_getter(
+                    slice(shard_start + s.start, shard_start + s.stop))
+        elif self.is_shuffled:
+            permutation = self._epoch_permutation(epoch)
+
+            def get_slice(s):
+                start, stop = shard_start + s.start, shard_start + s.stop
+                if self._counter_based:
+                    t = self._index_dtype()
+                    positions = np.arange(start, stop, dtype=t) % total_length
+                    return self._gather(permutation(positions).astype(t))
+                if stop <= total_length:
+                    return self._gather(permutation[start: stop])
+                positions = np.arange(start, stop, dtype=self._index_dtype())
+                return self._gather(permutation[positions % total_length])
+        else:
+            def get_slice(s):
+                start, stop = shard_start + s.start, shard_start + s.stop
+                if stop <= total_length:
+                    return tuple(_make_readonly(a[start: stop])
+                                 for a in self.the_arrays)
+                positions = np.arange(start, stop, dtype=self._index_dtype())
+                return self._gather(positions % total_length)
+
+        # now iterator through the mini-batches
+        for batch_s in self._iter_batch_slices():
+            yield get_slice(batch_s)
@@ -0,0 +1,170 @@
+import numpy as np
+
+from tfsnippet.utils import generate_random_seed
+from .base import DataFlow, ExtraInfoDataFlow
+from .rebatch_flow import _rebatch
+
+__all__ = ['ShuffleBufferFlow']
+
+
+class ShuffleBufferFlow(DataFlow):
+    """
+    Data flow which shuffles the items from the source flow with a bounded
+    buffer, and re-batches them into mini-batches of `batch_size`.
+
+    The source items are first used to fill the buffer.  Once the buffer is
+    full, each upcoming item replaces a uniformly chosen item in the buffer,
+    and the replaced item is emitted.  When the source is exhausted, the
+    remaining items in the buffer are emitted in random order.  This is the
+    same as the shuffle buffer of ``tf.data``, thus the larger the buffer
+    is, the closer it approximates a full shuffle, while only the memory
+    of `buffer_size` items is required.
+
+    Usage::
+
+        source_flow = DataFlow.iterator_factory(read_large_dataset)
+        shuffled_flow = source_flow.shuffle_buffer(10000, batch_size=256)
+        for batch_x, batch_y in shuffled_flow:
+            ...
+    """
+
+    def __init__(self, source, buffer_size, batch_size=None,
+                 skip_incomplete=False, seed=None):
+        """
+        Construct a :class:`ShuffleBufferFlow`.
+
+        Args:
+            source (DataFlow): The source data flow.
+            buffer_size (int): The number of items in the shuffle buffer.
+            batch_size (int): Size of each mini-batch.  Required if `source`
+                is not a :class:`ExtraInfoDataFlow`.
+                (default :obj:`None`, use the batch size of `source`)
+            skip_incomplete (bool): Whether or not to exclude the last
+                mini-batch if it is incomplete? (default :obj:`False`)
+            seed (int): The seed of the random state for choosing items
+                from the buffer.  (default :obj:`None`, use a random seed)
+        """
+        # check the parameters
+        buffer_size = int(buffer_size)
+        if buffer_size < 1:
+            raise ValueError('`buffer_size` must be at least 1.')
+        if batch_size is None:
+            if not isinstance(source, ExtraInfoDataFlow):
+                raise ValueError('`batch_size` is required when `source` '
+                                 'is not an ExtraInfoDataFlow.')
+            batch_size = source.batch_size
+        batch_size = int(batch_size)
+        if batch_size < 1:
+            raise ValueError('`batch_size` must be at least 1.')
+
+        # memorize the parameters
+        self._source = source
+        self._buffer_size = buffer_size
+        self._batch_size = batch_size
+        self._skip_incomplete = bool(skip_incomplete)
+        self._seed = seed
+        self._random_state = np.random.RandomState(
+            generate_random_seed() if seed is None else seed)
+
+        # the shuffle buffer, allocated at the first mini-batch
+        self._buffer = None
+
+    @property
+    def source(self):
+        """Get the source data flow."""
+        return self._source
+
+    @property
+    def buffer_size(self):
+        """Get the number of items in the shuffle buffer."""
+        return self._buffer_size
+
+    @property
+    def batch_size(self):
+        """Get the size of each mini-batch."""
+        return self._batch_size
+
+    @property
+    def skip_incomplete(self):
+        """
+        Whether or not to exclude the last mini-batch if it is incomplete?
+        """
+        return self._skip_incomplete
+
+    @property
+    def seed(self):
+        """Get the seed of the random state."""
+        return self._seed
+
+    def _get_buffer(self, batch):
+        if self._buffer is None or \
+                len(self._buffer) != len(batch) or \
+                any(b.shape[1:] != a.shape[1:] or b.dtype != a.dtype
+                    for b, a in zip(self._buffer, batch)):
+            self._buffer = tuple(
+                np.empty((self._buffer_size,) + a.shape[1:], dtype=a.dtype)
+                for a in batch
+            )
+        return self._buffer
+
+    def _exchange(self, buffer, incoming):
+        """
+        Exchange the incoming items with uniformly chosen items in the
+        full buffer, as if they were exchanged one after another.
+        """
+        n = len(incoming[0])
+        slots = self._random_state.randint(0, self._buffer_size, size=n)
+
+        # group the items choosing the same slot, where each item except
+        # the first one in a group gets the item put by its predecessor
+        order = np.argsort(slots, kind='mergesort')
+        sorted_slots = slots[order]
+        is_dup = np.concatenate(
+            [[False], sorted_slots[1:] == sorted_slots[:-1]])
+        is_last = np.concatenate(
+            [sorted_slots[1:] != sorted_slots[:-1], [True]])
+        dup_pos = np.where(is_dup)[0]
+
+        ret = []
+        for buf, a in zip(buffer, incoming):
+            out = np.empty_like(a)
+            out[order[~is_dup]] = buf[sorted_slots[~is_dup]]
+            out[order[dup_pos]] = a[order[dup_pos - 1]]
+            buf[sorted_slots[is_last]] = a[order[is_last]]
+            ret.append(out)
+        return tuple(ret)
+
+    def _shuffled_chunks(self):
+        buffer = None
+        count = 0
+        for batch in self._source:
+            batch = tuple(np.asarray(a) for a in batch)
+            if len(batch[0]) == 0:
+                continue  # nothing to exchange for an empty mini-batch
+            if buffer is None:
+                buffer = self._get_buffer(batch)
+
+            # fill the buffer
+            if count < self._buffer_size:
+                n = min(len(batch[0]), self._buffer_size - count)
+                for buf, a in zip(buffer, batch):
+                    buf[count: count + n] = a[:n]
+                count += n
+                if n < len(batch[0]):
+                    batch = tuple(a[n:] for a in batch)
+                else:
+                    continue
+
+            # exchange the items with the full buffer
+            yield self._exchange(buffer, batch)
+
+        # emit the remaining items in the buffer
+        if count:
+            indices = self._random_state.permutation(count)
+            yield tuple(buf[indices] for buf in buffer)
+
+    def _minibatch_iterator(self):
+        for batch in _rebatch(self._shuffled_chunks(),
+                              batch_size=self._batch_size,
+                              skip_incomplete=self._skip_incomplete):
+            yield batch
@@ -1,7 +1,9 @@
 from .cifar import *
 from .fashion_mnist import *
+from .image_folder import *
 from .mnist import *
 
 __all__ = [
-    'load_cifar10', 'load_cifar100', 'load_fashion_mnist', 'load_mnist',
+    'ImageFolder', 'load_cifar10', 'load_cifar100', 'load_fashion_mnist',
+    'load_mnist',
 ]
@@ -5,6 +5,7 @@ import six
 import numpy as np
 
 from tfsnippet.utils import CacheDir, validate_enum_arg
+from .utils import preprocessed_name, validate_x_dtype
 
 if six.PY2:
     import cPickle as pickle
@@ -65,29 +66,12 @@ def _validate_x_shape(x_shape, channels_last):
     return x_shape
 
 
-def load_cifar10(channels_last=True, x_shape=None, x_dtype=np.float32,
-                 y_dtype=np.int32, normalize_x=False):
-    """
-    Load the CIFAR-10 dataset as NumPy arrays.
-
-    Args:
-        channels_last (bool): Whether or not to place the channels axis
-            at the last?
-        x_shape: Reshape each digit into this shape.  Default to
-            ``(32, 32, 3)`` if `channels_last` is :obj:`True`, otherwise
-            default to ``(3, 32, 32)``.
-        x_dtype: Cast each digit into this data type.  Default `np.float32`.
-        y_dtype: Cast each label into this data type.  Default `np.int32`.
-        normalize_x (bool): Whether or not to normalize x into ``[0, 1]``,
-            by dividing each pixel value with 255.?  (default :obj:`False`)
+def _channels_name(channels_last):
+    return 'channels_last' if channels_last else 'channels_first'
 
-    Returns:
-        (np.ndarray, np.ndarray), (np.ndarray, np.ndarray): The
-            (train_x, train_y), (test_x, test_y)
-    """
-    # check the arguments
-    x_shape = _validate_x_shape(x_shape, channels_last)
 
+def _load_cifar10_arrays(channels_last, x_shape, x_dtype, y_dtype,
+                         normalize_x):
     # fetch data
     path = CacheDir('cifar').download_and_extract(
         CIFAR_10_URI, hasher=hashlib.md5(), expected_hash=CIFAR_10_MD5)
@@ -116,34 +100,11 @@ def load_cifar10(channels_last=True, x_shape=None, x_dtype=np.float32,
     )
     assert(len(test_x) == len(test_y) == 10000)
 
-    return (train_x, train_y), (test_x, test_y)
-
-
-def load_cifar100(label_mode='fine', channels_last=True, x_shape=None,
-                  x_dtype=np.float32, y_dtype=np.int32, normalize_x=False):
-    """
-    Load the CIFAR-100 dataset as NumPy arrays.
-
-    Args:
-        label_mode: One of {"fine", "coarse"}.
-        channels_last (bool): Whether or not to place the channels axis
-            at the last?  Default :obj:`False`.
-        x_shape: Reshape each digit into this shape.  Default to
-            ``(32, 32, 3)`` if `channels_last` is :obj:`True`, otherwise
-            default to ``(3, 32, 32)``.
-        x_dtype: Cast each digit into this data type.  Default `np.float32`.
-        y_dtype: Cast each label into this data type.  Default `np.int32`.
-        normalize_x (bool): Whether or not to normalize x into ``[0, 1]``,
-            by dividing each pixel value with 255.?  (default :obj:`False`)
+    return train_x, train_y, test_x, test_y
 
-    Returns:
-        (np.ndarray, np.ndarray), (np.ndarray, np.ndarray): The
-            (train_x, train_y), (test_x, test_y)
-    """
-    # check the arguments
-    label_mode = validate_enum_arg('label_mode', label_mode, ('fine', 'coarse'))
-    x_shape = _validate_x_shape(x_shape, channels_last)
 
+def _load_cifar100_arrays(label_mode, channels_last, x_shape, x_dtype,
+                          y_dtype, normalize_x):
     # fetch data
     path = CacheDir('cifar').download_and_extract(
         CIFAR_100_URI, hasher=hashlib.md5(), expected_hash=CIFAR_100_MD5)
@@ -168,4 +129,118 @@ def load_cifar100(label_mode='fine', channels_last=True, x_shape=None,
     )
     assert(len(test_x) == len(test_y) == 10000)
 
+    return train_x, train_y, test_x, test_y
+
+
+def load_cifar10(channels_last=True, x_shape=None, x_dtype=np.float32,
+                 y_dtype=np.int32, normalize_x=False, cache_preprocessed=True):
+    """
+    Load the CIFAR-10 dataset as NumPy arrays.
+
+    Args:
+        channels_last (bool): Whether or not to place the channels axis
+            at the last?
+        x_shape: Reshape each digit into this shape.  Default to
+            ``(32, 32, 3)`` if `channels_last` is :obj:`True`, otherwise
+            default to ``(3, 32, 32)``.
+        x_dtype: Cast each digit into this data type.  Default `np.float32`.
+            Specify `np.uint8` to keep the raw pixel values, which take
+            only 1/4 memory of `np.float32`, and convert them per mini-batch
+            (e.g., by :class:`~tfsnippet.preprocessing.Normalizer`).
+        y_dtype: Cast each label into this data type.  Default `np.int32`.
+        normalize_x (bool): Whether or not to normalize x into ``[0, 1]``,
+            by dividing each pixel value with 255.?  `x_dtype` must be
+            a floating point type if :obj:`True`.  (default :obj:`False`)
+        cache_preprocessed (bool): Whether or not to cache the preprocessed
+            arrays as ".npy" files in the cache directory, and return them
+            memory-mapped?  The memory-mapped arrays are loaded almost
+            instantly on subsequent calls, and are copy-on-write, i.e.,
+            modifying them in place does not affect the cached files.
+            Note each combination of `channels_last`, `x_shape`, `x_dtype`,
+            `y_dtype` and `normalize_x` writes a full copy of the dataset to
+            disk (e.g., about 700MB for `np.float32` x).
+            (default :obj:`True`)
+
+    Returns:
+        (np.ndarray, np.ndarray), (np.ndarray, np.ndarray): The
+            (train_x, train_y), (test_x, test_y)
+    """
+    # check the arguments
+    x_shape = _validate_x_shape(x_shape, channels_last)
+    validate_x_dtype(x_dtype, normalize_x)
+
+    # load data, or the cached preprocessed arrays
+    def load():
+        return _load_cifar10_arrays(
+            channels_last, x_shape, x_dtype, y_dtype, normalize_x)
+
+    if cache_preprocessed:
+        name = preprocessed_name(
+            x_shape, x_dtype, y_dtype, normalize_x,
+            prefix=('cifar10', _channels_name(channels_last))
+        )
+        train_x, train_y, test_x, test_y = \
+            CacheDir('cifar').cache_arrays(name, load, mmap_mode='c')
+    else:
+        train_x, train_y, test_x, test_y = load()
+
+    return (train_x, train_y), (test_x, test_y)
+
+
+def load_cifar100(label_mode='fine', channels_last=True, x_shape=None,
+                  x_dtype=np.float32, y_dtype=np.int32, normalize_x=False,
+                  cache_preprocessed=True):
+    """
+    Load the CIFAR-100 dataset as NumPy arrays.
+
+    Args:
+        label_mode: One of {"fine", "coarse"}.
+        channels_last (bool): Whether or not to place the channels axis
+            at the last?  Default :obj:`False`.
+        x_shape: Reshape each digit into this shape.  Default to
+            ``(32, 32, 3)`` if `channels_last` is :obj:`True`, otherwise
+            default to ``(3, 32, 32)``.
+        x_dtype: Cast each digit into this data type.  Default `np.float32`.
+            Specify `np.uint8` to keep the raw pixel values, which take
+            only 1/4 memory of `np.float32`, and convert them per mini-batch
+            (e.g., by :class:`~tfsnippet.preprocessing.Normalizer`).
+        y_dtype: Cast each label into this data type.  Default `np.int32`.
+        normalize_x (bool): Whether or not to normalize x into ``[0, 1]``,
+            by dividing each pixel value with 255.?  `x_dtype` must be
+            a floating point type if :obj:`True`.  (default :obj:`False`)
+        cache_preprocessed (bool): Whether or not to cache the preprocessed
+            arrays as ".npy" files in the cache directory, and return them
+            memory-mapped?  The memory-mapped arrays are loaded almost
+            instantly on subsequent calls, and are copy-on-write, i.e.,
+            modifying them in place does not affect the cached files.
+            Note each combination of `channels_last`, `x_shape`, `x_dtype`,
+            `y_dtype` and `normalize_x` writes a full copy of the dataset to
+            disk (e.g., about 700MB for `np.float32` x).
+            (default :obj:`True`)
+
+    Returns:
+        (np.ndarray, np.ndarray), (np.ndarray, np.ndarray): The
+            (train_x, train_y), (test_x, test_y)
+    """
+    # check the arguments
+    label_mode = validate_enum_arg('label_mode', label_mode, ('fine', 'coarse'))
+    x_shape = _validate_x_shape(x_shape, channels_last)
+    validate_x_dtype(x_dtype, normalize_x)
+
+    # load data, or the cached preprocessed arrays
+    def load():
+        return _load_cifar100_arrays(
+            label_mode, channels_last, x_shape, x_dtype, y_dtype, normalize_x)
+
+    if cache_preprocessed:
+        name = preprocessed_name(
+            x_shape, x_dtype, y_dtype, normalize_x,
+            prefix=('cifar100_{}'.format(label_mode),
+                    _channels_name(channels_last))
+        )
+        train_x, train_y, test_x, test_y = \
+            CacheDir('cifar').cache_arrays(name, load, mmap_mode='c')
+    else:
+        train_x, train_y, test_x, test_y = load()
+
     return (train_x, train_y), (test_x, test_y)
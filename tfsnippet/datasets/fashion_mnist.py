@@ -1,10 +1,8 @@
-import gzip
-import hashlib
-
 import numpy as np
-import idx2numpy
 
 from tfsnippet.utils import CacheDir
+from .idx_file import fetch_idx_arrays
+from .utils import preprocessed_name, validate_x_dtype
 
 __all__ = ['load_fashion_mnist']
 
@@ -19,12 +17,12 @@ TEST_Y_URI = 'http://fashion-mnist.s3-website.eu-central-1.amazonaws.com/t10k-la
 TEST_Y_MD5 = 'bb300cfdad3c16e7a12a480ee83cd310'
 
 
-def _fetch_array(uri, md5):
-    """Fetch an MNIST array from the `uri` with cache."""
-    path = CacheDir('fashion_mnist').download(
-        uri, hasher=hashlib.md5(), expected_hash=md5)
-    with gzip.open(path, 'rb') as f:
-        return idx2numpy.convert_from_file(f)
+def _fetch_arrays():
+    """Fetch the Fashion MNIST arrays with cache."""
+    return fetch_idx_arrays(CacheDir('fashion_mnist'), [
+        (TRAIN_X_URI, TRAIN_X_MD5), (TRAIN_Y_URI, TRAIN_Y_MD5),
+        (TEST_X_URI, TEST_X_MD5), (TEST_Y_URI, TEST_Y_MD5),
+    ])
 
 
 def _validate_x_shape(x_shape):
@@ -35,8 +33,32 @@ def _validate_x_shape(x_shape):
     return x_shape
 
 
+def _load_arrays(x_shape, x_dtype, y_dtype, normalize_x):
+    # load data
+    train_x, train_y, test_x, test_y = _fetch_arrays()
+    train_x = train_x.astype(x_dtype)
+    train_y = train_y.astype(y_dtype)
+    test_x = test_x.astype(x_dtype)
+    test_y = test_y.astype(y_dtype)
+
+    assert(len(train_x) == len(train_y) == 60000)
+    assert(len(test_x) == len(test_y) == 10000)
+
+    # change shape
+    train_x = train_x.reshape([len(train_x)] + list(x_shape))
+    test_x = test_x.reshape([len(test_x)] + list(x_shape))
+
+    # normalize x
+    if normalize_x:
+        train_x /= np.asarray(255., dtype=train_x.dtype)
+        test_x /= np.asarray(255., dtype=test_x.dtype)
+
+    return train_x, train_y, test_x, test_y
+
+
 def load_fashion_mnist(x_shape=(28, 28), x_dtype=np.float32,
-                       y_dtype=np.int32, normalize_x=False):
+                       y_dtype=np.int32, normalize_x=False,
+                       cache_preprocessed=True):
     """
     Load the Fashion MNIST dataset as NumPy arrays.
 
@@ -45,9 +67,21 @@ def load_fashion_mnist(x_shape=(28, 28), x_dtype=np.float32,
     Args:
         x_shape: Reshape each digit into this shape.  Default ``(784,)``.
         x_dtype: Cast each digit into this data type.  Default `np.float32`.
+            Specify `np.uint8` to keep the raw pixel values, which take
+            only 1/4 memory of `np.float32`, and convert them per mini-batch
+            (e.g., by :class:`~tfsnippet.preprocessing.Normalizer`).
         y_dtype: Cast each label into this data type.  Default `np.int32`.
         normalize_x (bool): Whether or not to normalize x into ``[0, 1]``,
-            by dividing each pixel value with 255.?  (default :obj:`False`)
+            by dividing each pixel value with 255.?  `x_dtype` must be
+            a floating point type if :obj:`True`.  (default :obj:`False`)
+        cache_preprocessed (bool): Whether or not to cache the preprocessed
+            arrays as ".npy" files in the cache directory, and return them
+            memory-mapped?  The memory-mapped arrays are loaded almost
+            instantly on subsequent calls, and are copy-on-write, i.e.,
+            modifying them in place does not affect the cached files.
+            Note each combination of `x_shape`, `x_dtype`, `y_dtype` and
+            `normalize_x` writes a full copy of the dataset to disk (e.g.,
+            about 220MB for `np.float32` x).  (default :obj:`True`)
 
     Returns:
         (np.ndarray, np.ndarray), (np.ndarray, np.ndarray): The
@@ -55,23 +89,17 @@ def load_fashion_mnist(x_shape=(28, 28), x_dtype=np.float32,
     """
     # check arguments
     x_shape = _validate_x_shape(x_shape)
-
-    # load data
-    train_x = _fetch_array(TRAIN_X_URI, TRAIN_X_MD5).astype(x_dtype)
-    train_y = _fetch_array(TRAIN_Y_URI, TRAIN_Y_MD5).astype(y_dtype)
-    test_x = _fetch_array(TEST_X_URI, TEST_X_MD5).astype(x_dtype)
-    test_y = _fetch_array(TEST_Y_URI, TEST_Y_MD5).astype(y_dtype)
-
-    assert(len(train_x) == len(train_y) == 60000)
-    assert(len(test_x) == len(test_y) == 10000)
-
-    # change shape
-    train_x = train_x.reshape([len(train_x)] + list(x_shape))
-    test_x = test_x.reshape([len(test_x)] + list(x_shape))
-
-    # normalize x
-    if normalize_x:
-        train_x /= np.asarray(255., dtype=train_x.dtype)
-        test_x /= np.asarray(255., dtype=test_x.dtype)
+    validate_x_dtype(x_dtype, normalize_x)
+
+    # load data, or the cached preprocessed arrays
+    def load():
+        return _load_arrays(x_shape, x_dtype, y_dtype, normalize_x)
+
+    if cache_preprocessed:
+        name = preprocessed_name(x_shape, x_dtype, y_dtype, normalize_x)
+        train_x, train_y, test_x, test_y = \
+            CacheDir('fashion_mnist').cache_arrays(name, load, mmap_mode='c')
+    else:
+        train_x, train_y, test_x, test_y = load()
 
     return (train_x, train_y), (test_x, test_y)
@@ -0,0 +1,90 @@
+import hashlib
+import struct
+import zlib
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+
+__all__ = ['parse_idx', 'fetch_idx_arrays']
+
+_IDX_DTYPES = {
+    0x08: np.dtype(np.uint8),
+    0x09: np.dtype(np.int8),
+    0x0B: np.dtype('>i2'),
+    0x0C: np.dtype('>i4'),
+    0x0D: np.dtype('>f4'),
+    0x0E: np.dtype('>f8'),
+}
+
+
+def parse_idx(buffer):
+    """
+    Parse an IDX file content as a NumPy array.
+
+    The array is a view of `buffer` without copying, unless its data type
+    is not in native byte order.
+
+    Args:
+        buffer (bytes): The content of the IDX file.
+
+    Returns:
+        np.ndarray: The parsed array.
+
+    Raises:
+        IOError: If `buffer` is not a valid IDX file content.
+    """
+    if len(buffer) < 4:
+        raise IOError('Invalid IDX file: the header is truncated.')
+    zeros, type_code, ndims = struct.unpack('>HBB', buffer[:4])
+    if zeros != 0 or type_code not in _IDX_DTYPES:
+        raise IOError('Invalid IDX file: unrecognized magic number.')
+    dtype = _IDX_DTYPES[type_code]
+    offset = 4 + 4 * ndims
+    if len(buffer) < offset:
+        raise IOError('Invalid IDX file: the header is truncated.')
+    shape = struct.unpack('>' + 'I' * ndims, buffer[4: offset])
+    count = int(np.prod(shape, dtype=np.int64))
+    if len(buffer) - offset != count * dtype.itemsize:
+        raise IOError('Invalid IDX file: the data size does not match the '
+                      'shape {!r}.'.format(shape))
+
+    ret = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+    if not dtype.isnative:
+        ret = ret.astype(dtype.newbyteorder('='))
+    return ret.reshape(shape)
+
+
+def _read_gzip_idx(path):
+    with open(path, 'rb') as f:
+        content = f.read()
+    # zlib releases the GIL while decompressing, so that multiple files
+    # can be decompressed concurrently in threads
+    return parse_idx(zlib.decompress(content, 16 + zlib.MAX_WBITS))
+
+
+def fetch_idx_arrays(cache_dir, uris_and_md5s):
+    """
+    Fetch gzipped IDX files into `cache_dir`, and parse them as arrays.
+
+    The files are downloaded one after another, then decompressed and
+    parsed concurrently in a thread pool.
+
+    Args:
+        cache_dir (CacheDir): The cache directory.
+        uris_and_md5s (Iterable[(str, str)]): The URIs of the files, and
+            their expected MD5 hashes.
+
+    Returns:
+        list[np.ndarray]: The parsed arrays.
+    """
+    paths = [
+        cache_dir.download(uri, hasher=hashlib.md5(), expected_hash=md5)
+        for uri, md5 in uris_and_md5s
+    ]
+    if len(paths) < 2:
+        return [_read_gzip_idx(path) for path in paths]
+    pool = ThreadPool(len(paths))
+    try:
+        return pool.map(_read_gzip_idx, paths)
+    finally:
+        pool.terminate()
@@ -0,0 +1,246 @@
+import hashlib
+import os
+from multiprocessing.pool import ThreadPool
+from threading import Lock
+
+import numpy as np
+
+from tfsnippet.dataflows import DataFlow, DataMapper
+from tfsnippet.utils import AutoInitAndCloseable, CacheDir, iter_files
+from tfsnippet.utils.archive_file import TAR_FILE_EXTENSIONS
+
+__all__ = ['ImageFolder']
+
+ARCHIVE_FILE_EXTENSIONS = ('.zip', '.rar') + TAR_FILE_EXTENSIONS
+DEFAULT_EXTENSIONS = ('.npy', '.bmp', '.gif', '.jpeg', '.jpg', '.png')
+
+
+def _default_decoder(file_path):
+    if file_path.lower().endswith('.npy'):
+        return np.load(file_path)
+    try:
+        import imageio
+    except ImportError:  # pragma: no cover
+        raise RuntimeError('Required package not installed: imageio.  '
+                           'Install it by `pip install TFSnippet[images]`, '
+                           'or specify `decoder`.')
+    return np.asarray(imageio.imread(file_path))
+
+
+class ImageFolder(DataMapper, AutoInitAndCloseable):
+    """
+    :class:`DataMapper` for decoding the samples of a local dataset,
+    organized as files in class sub-directories, according to indices.
+
+    The dataset may be a directory, an archive file, or a ".npz" file::
+
+        root/cat/0001.png                   train.npz:  cat/0001.npy
+        root/cat/0002.png                               cat/0002.npy
+        root/dog/0001.png                               dog/0001.npy
+
+    The directory (relative to the root) of each file is its class name,
+    while the label of each file is the index of its class name in the
+    sorted :attr:`class_names`.
+
+    Only the file index is built at construction, which is cached, such
+    that constructing another :class:`ImageFolder` for the same dataset is
+    nearly free.  The samples are decoded on demand, by calling this mapper
+    with the indices of the files, or iterating through :meth:`as_flow`::
+
+        folder = ImageFolder('/path/to/images', workers=4)
+        for batch_x, batch_y in folder.as_flow(batch_size=64, shuffle=True):
+            ...
+
+    An archive file is extracted into `cache_dir` at the first time, by
+    :meth:`~tfsnippet.utils.CacheDir.extract_file`.  The entries of a ".npz"
+    file are loaded directly from the file, without extraction.
+    """
+
+    def __init__(self, path, decoder=None, extensions=None, workers=None,
+                 cache_dir=None, rebuild_index=False):
+        """
+        Construct a :class:`ImageFolder`.
+
+        Args:
+            path (str): The path of the dataset directory, archive file or
+                ".npz" file.
+            decoder ((str) -> np.ndarray): The function to decode a sample
+                from its file path.  It is not used for ".npz" files.
+                (default :obj:`None`, load ".npy" files by :func:`np.load`,
+                and other files by :func:`imageio.imread`)
+            extensions (Iterable[str]): Only index the files with these
+                extensions (case-insensitive).  (default :obj:`None`, index
+                ".npy" files and common image files if `decoder` is not
+                specified, or all files otherwise)
+            workers (int or None): If specified, decode the samples of each
+                mini-batch in parallel by a pool of this number of threads.
+                (default :obj:`None`)
+            cache_dir (CacheDir): The cache directory, where to extract the
+                archive file and to store the file index.
+                (default :obj:`None`, use ``CacheDir('image_folder')``)
+            rebuild_index (bool): Whether or not to rebuild the file index
+                of a directory even if it has been cached?  This should be
+                specified if the files in the directory have changed.
+                (default :obj:`False`)
+        """
+        path = os.path.abspath(path)
+        if extensions is None and decoder is None:
+            extensions = DEFAULT_EXTENSIONS
+        if extensions is not None:
+            extensions = tuple(sorted(set(e.lower() for e in extensions)))
+        if workers is not None:
+            workers = int(workers)
+            if workers < 1:
+                raise ValueError('`workers` must be at least 1.')
+        if cache_dir is None:
+            cache_dir = CacheDir('image_folder')
+
+        # open the dataset
+        npz_file = None
+        if os.path.isfile(path) and path.lower().endswith('.npz'):
+            npz_file = np.load(path)
+            root = path
+        elif os.path.isfile(path) and \
+                path.lower().endswith(ARCHIVE_FILE_EXTENSIONS):
+            root = cache_dir.extract_file(path)
+        elif os.path.isdir(path):
+            root = path
+        else:
+            raise IOError('Not a dataset directory, a supported archive '
+                          'file or a ".npz" file: {!r}'.format(path))
+
+        # build the file index, or load it from cache
+        if npz_file is not None:
+            names = sorted(
+                k + '.npy' for k in npz_file.files
+                if extensions is None or
+                (k + '.npy').lower().endswith(extensions)
+            )
+            names, labels, class_names = self._build_index(names)
+        else:
+            def build_index():
+                names = sorted(
+                    n for n in iter_files(root)
+                    if extensions is None or n.lower().endswith(extensions)
+                )
+                return self._build_index(names)
+
+            index_key = hashlib.md5(
+                repr((root, extensions)).encode('utf-8')).hexdigest()
+            names, labels, class_names = cache_dir.cache_arrays(
+                'index/{}'.format(index_key), build_index, mmap_mode=None,
+                refresh=rebuild_index
+            )
+
+        self._path = path
+        self._root = root
+        self._decoder = decoder or _default_decoder
+        self._workers = workers
+        self._npz_file = npz_file
+        self._npz_lock = Lock()
+        self._names = tuple(str(n) for n in names)
+        self._labels = np.asarray(labels, dtype=np.int32)
+        self._class_names = tuple(str(n) for n in class_names)
+        self._pool = None
+
+    @staticmethod
+    def _build_index(names):
+        names = np.asarray(list(names), dtype=np.str_)
+        class_of = [os.path.dirname(n) for n in names]
+        class_names = np.asarray(sorted(set(class_of)), dtype=np.str_)
+        class_index = {n: i for i, n in enumerate(class_names)}
+        labels = np.asarray([class_index[n] for n in class_of],
+                            dtype=np.int32)
+        return names, labels, class_names
+
+    @property
+    def path(self):
+        """Get the path of the dataset directory, archive or ".npz" file."""
+        return self._path
+
+    @property
+    def file_names(self):
+        """Get the file names of the samples, relative to the root."""
+        return self._names
+
+    @property
+    def labels(self):
+        """Get the labels of the samples, as an int32 array."""
+        return self._labels
+
+    @property
+    def class_names(self):
+        """Get the sorted class names."""
+        return self._class_names
+
+    @property
+    def workers(self):
+        """Get the number of threads for decoding the samples."""
+        return self._workers
+
+    def __len__(self):
+        return len(self._names)
+
+    def _init(self):
+        if self._workers is not None:
+            self._pool = ThreadPool(self._workers)
+
+    def _close(self):
+        pool = self._pool
+        self._pool = None
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    def decode(self, index):
+        """
+        Decode the sample at `index`.
+
+        Args:
+            index (int): The index of the sample.
+
+        Returns:
+            np.ndarray: The decoded sample.
+        """
+        name = self._names[index]
+        if self._npz_file is not None:
+            # the entries of a ".npz" file share the same file object
+            with self._npz_lock:
+                return self._npz_file[name[:-len('.npy')]]
+        return self._decoder(os.path.join(self._root, name))
+
+    def as_flow(self, batch_size, shuffle=False, skip_incomplete=False):
+        """
+        Get a :class:`DataFlow` which iterates through mini-batches of
+        the decoded samples and their labels.
+
+        Args:
+            batch_size (int): Batch size of the data flow. Required.
+            shuffle (bool): Whether or not to shuffle the samples before
+                iterating? (default :obj:`False`)
+            skip_incomplete (bool): Whether or not to exclude the last
+                mini-batch if it is incomplete? (default :obj:`False`)
+
+        Returns:
+            DataFlow: The data flow of ``(x, y)`` mini-batches.
+        """
+        seq_dtype = (np.int32 if len(self) < (1 << 31) else np.int64)
+        seq_flow = DataFlow.seq(
+            0, len(self), 1, batch_size=batch_size,
+            shuffle=shuffle, skip_incomplete=skip_incomplete, dtype=seq_dtype
+        )
+        return seq_flow.map(self)
+
+    def _transform(self, indices):
+        self.init()
+        indices = [int(i) for i in np.asarray(indices).reshape([-1])]
+        if not indices:
+            # infer the shape and dtype of the samples from the first one
+            sample = self.decode(0) if len(self) else np.empty([0])
+            return (np.empty((0,) + sample.shape, dtype=sample.dtype),
+                    self._labels[:0])
+        if self._pool is not None and len(indices) > 1:
+            samples = self._pool.map(self.decode, indices)
+        else:
+            samples = [self.decode(i) for i in indices]
+        return np.stack(samples, axis=0), self._labels[indices]
@@ -0,0 +1,44 @@
+import numpy as np
+
+__all__ = ['preprocessed_name', 'validate_x_dtype']
+
+
+def validate_x_dtype(x_dtype, normalize_x):
+    """
+    Validate the `x_dtype` argument of a dataset loader.
+
+    Args:
+        x_dtype: The data type of x.
+        normalize_x (bool): Whether or not x is to be normalized?
+
+    Raises:
+        ValueError: If `normalize_x` is :obj:`True` but `x_dtype` is not
+            a floating point type.
+    """
+    if normalize_x and not np.issubdtype(x_dtype, np.floating):
+        raise ValueError('`x_dtype` must be a floating point type when '
+                         '`normalize_x` is True: got {}.'.
+                         format(np.dtype(x_dtype)))
+
+
+def preprocessed_name(x_shape, x_dtype, y_dtype, normalize_x, prefix=()):
+    """
+    Get the name of the cached preprocessed arrays of a dataset loader.
+
+    Args:
+        x_shape (tuple[int]): The shape of each x.
+        x_dtype: The data type of x.
+        y_dtype: The data type of y.
+        normalize_x (bool): Whether or not x is normalized?
+        prefix (Iterable[str]): Other options of the loader, which should
+            also be included in the name.
+
+    Returns:
+        str: The name, to be used with
+            :meth:`~tfsnippet.utils.CacheDir.cache_arrays`.
+    """
+    parts = list(prefix) + [
+        'x'.join(str(v) for v in x_shape), np.dtype(x_dtype).name,
+        np.dtype(y_dtype).name, 'normalized' if normalize_x else 'raw'
+    ]
+    return 'preprocessed/' + '_'.join(parts)
@@ -3,7 +3,8 @@ from collections import OrderedDict
 import numpy as np
 import tensorflow as tf
 
-from tfsnippet.trainer import resolve_feed_dict, merge_feed_dict
+from tfsnippet.trainer import (resolve_feed_dict, merge_feed_dict,
+                               StagingFlow)
 from tfsnippet.utils import validate_enum_arg, get_default_session_or_error
 
 __all__ = ['collect_outputs']
@@ -17,8 +18,11 @@ def collect_outputs(outputs, inputs, data_flow, mode='concat', feed_dict=None,
     Args:
         outputs (Iterable[tf.Tensor] or dict[str, tf.Tensor]): The output
             tensors to be computed.
-        inputs (Iterable[tf.Tensor]): Input placeholders.
+        inputs (Iterable[tf.Tensor]): Input placeholders.  Must be empty or
+            :obj:`None` if `data_flow` is a :class:`StagingFlow`.
         data_flow (DataFlow): Data flow to feed the input placeholders.
+            If it is a :class:`StagingFlow`, `outputs` should be computed
+            upon its staged inputs instead.
         mode ({'concat', 'average'}): If "concat", will concatenate the outputs
             from each mini-batch.  If "average", the output from each batch
             must be a scalar, and if so, this method will take average of the
@@ -32,6 +36,9 @@ def collect_outputs(outputs, inputs, data_flow, mode='concat', feed_dict=None,
             Returns a dict if `outputs` is a dict, or a tuple otherwise.
     """
     mode = validate_enum_arg('mode', mode, ['concat', 'average'])
+    if isinstance(data_flow, StagingFlow) and inputs:
+        raise ValueError('`inputs` must not be specified when `data_flow` '
+                         'is a StagingFlow.')
     session = session or get_default_session_or_error()
 
     if isinstance(outputs, (dict, OrderedDict)):
@@ -40,7 +47,7 @@ def collect_outputs(outputs, inputs, data_flow, mode='concat', feed_dict=None,
     else:
         output_keys = None
         outputs = [tf.convert_to_tensor(o) for o in outputs]
-    inputs = [tf.convert_to_tensor(i) for i in inputs]
+    inputs = [tf.convert_to_tensor(i) for i in (inputs or ())]
 
     # check the shape of output tensors
     for i, o in enumerate(outputs):
@@ -16,11 +16,20 @@ def _create_sampled_dataflow(arrays, sampler, sample_now, **kwargs):
 
 
 def bernoulli_flow(x, batch_size, shuffle=False, skip_incomplete=False,
-                   sample_now=False, dtype=np.int32, random_state=None):
+                   sample_now=False, dtype=np.int32, random_state=None,
+                   sample_in_graph=False, uint8_pixels=False):
     """
     Construct a new :class:`DataFlow`, which samples 0/1 binary images
     according to the given `x` array.
 
+    If `sample_in_graph` is :obj:`True`, the returned flow yields the uint8
+    images without sampling, which should be fed into a `tf.uint8`
+    placeholder, and be sampled in the graph by::
+
+        input_x = tf.placeholder(dtype=tf.uint8, shape=...)
+        sampled_x = BernoulliSampler(dtype=np.int32, uint8_pixels=True). \\
+            sample_tensor(input_x)
+
     Args:
         x: The `train_x` or `test_x` of an image dataset.  The pixel values
             must be 8-bit integers, having the range of ``[0, 255]``.
@@ -35,15 +44,38 @@ def bernoulli_flow(x, batch_size, shuffle=False, skip_incomplete=False,
         random_state (RandomState): Optional numpy RandomState for
             shuffling data before each epoch.  (default :obj:`None`,
             construct a new :class:`RandomState`).
+        sample_in_graph (bool): Whether or not to yield the uint8 images
+            without sampling, such that they can be sampled in the graph?
+            (default :obj:`False`)
+        uint8_pixels (bool): Whether or not to sample the uint8 images by
+            comparing them against random integers, without converting
+            them into probabilities?  This is faster, but the samples
+            differ from those of earlier versions.  (default :obj:`False`)
 
     Returns:
         DataFlow: The Bernoulli `x` flow.
     """
     x = np.asarray(x)
 
+    # yield the uint8 images to be sampled in the graph
+    if sample_in_graph:
+        if sample_now:
+            raise ValueError('`sample_now` and `sample_in_graph` cannot be '
+                             'both True.')
+        return DataFlow.arrays(
+            [x.astype(np.uint8, copy=False)], batch_size=batch_size,
+            shuffle=shuffle, skip_incomplete=skip_incomplete,
+            random_state=random_state
+        )
+
     # prepare the sampler
-    x = x / np.asarray(255., dtype=x.dtype)
-    sampler = BernoulliSampler(dtype=dtype, random_state=random_state)
+    if uint8_pixels:
+        x = x.astype(np.uint8, copy=False)
+        sampler = BernoulliSampler(dtype=dtype, random_state=random_state,
+                                   uint8_pixels=True)
+    else:
+        x = x / np.asarray(255., dtype=x.dtype)
+        sampler = BernoulliSampler(dtype=dtype, random_state=random_state)
 
     # compose the data flow
     return _create_sampled_dataflow(
@@ -1,5 +1,6 @@
+from .normalizers import *
 from .samplers import *
 
 __all__ = [
-    'BaseSampler', 'BernoulliSampler', 'UniformNoiseSampler',
+    'BaseSampler', 'BernoulliSampler', 'Normalizer', 'UniformNoiseSampler',
 ]
@@ -0,0 +1,81 @@
+import numpy as np
+
+from tfsnippet.dataflows import DataMapper
+
+__all__ = ['Normalizer']
+
+
+class Normalizer(DataMapper):
+    """
+    A :class:`DataMapper` which converts the input array into a floating
+    point array, and normalizes it by ``x * scale + shift``.
+
+    It can be used to keep an image dataset as 8-bit integers in memory,
+    which is 4x smaller than 32-bit floats, and to normalize each
+    mini-batch on the fly::
+
+        (train_x, train_y), _ = spt.datasets.load_cifar10(x_dtype=np.uint8)
+        normalizer = Normalizer()  # converts pixels into [0, 1] float32
+        train_flow = spt.DataFlow.arrays(
+            [train_x, train_y], batch_size=128, shuffle=True). \\
+            map(lambda x, y: (normalizer.normalize(x), y))
+
+    The conversion and the normalization are done in a single pass over the
+    mini-batch, without any intermediate array (unless `shift` is not zero).
+    Alternatively, the 8-bit mini-batches can be fed into a `tf.uint8`
+    placeholder and normalized in the graph, e.g., by
+    ``tf.cast(input_x, tf.float32) * (1. / 255)``, which also reduces the
+    amount of data to be fed into the session.
+    """
+
+    def __init__(self, scale=1. / 255, shift=0., dtype=np.float32):
+        """
+        Construct a new :class:`Normalizer`.
+
+        Args:
+            scale (float): The scale of the input array.
+                (default ``1. / 255``, normalizes 8-bit pixels into [0, 1])
+            shift (float): The shift after scaling. (default ``0.``)
+            dtype: The data type of the normalized array, which must be a
+                floating point type.  Default `np.float32`.
+        """
+        dtype = np.dtype(dtype)
+        if not np.issubdtype(dtype, np.floating):
+            raise TypeError('`dtype` must be a floating point type: got {}.'.
+                            format(dtype))
+        self._scale = float(scale)
+        self._shift = float(shift)
+        self._dtype = dtype
+
+    @property
+    def scale(self):
+        """Get the scale of the input array."""
+        return self._scale
+
+    @property
+    def shift(self):
+        """Get the shift after scaling."""
+        return self._shift
+
+    @property
+    def dtype(self):
+        """Get the data type of the normalized array."""
+        return self._dtype
+
+    def normalize(self, x):
+        """
+        Normalize the array `x`.
+
+        Args:
+            x (np.ndarray): The input `x` array.
+
+        Returns:
+            np.ndarray: The normalized array.
+        """
+        ret = np.multiply(x, self._dtype.type(self._scale), dtype=self._dtype)
+        if self._shift != 0.:
+            ret += self._dtype.type(self._shift)
+        return ret
+
+    def _transform(self, x):
+        return self.normalize(x),
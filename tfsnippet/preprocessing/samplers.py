@@ -1,10 +1,29 @@
+from threading import local
+
 import numpy as np
+import tensorflow as tf
 
 from tfsnippet.dataflows import DataMapper
 from tfsnippet.utils import generate_random_seed
 
 __all__ = ['BaseSampler', 'BernoulliSampler', 'UniformNoiseSampler']
 
+_Generator = getattr(np.random, 'Generator', None)
+
+
+def _new_random_state():
+    """Construct a new :class:`Generator` if possible, or a RandomState."""
+    if _Generator is not None:
+        return np.random.default_rng(generate_random_seed())
+    return np.random.RandomState(generate_random_seed())  # pragma: no cover
+
+
+def _random_integers(rng, high, size, dtype):
+    """Draw integers from ``[0, high)`` by `rng`."""
+    if _Generator is not None and isinstance(rng, _Generator):
+        return rng.integers(0, high, size=size, dtype=dtype)
+    return rng.randint(0, high, size=size, dtype=dtype)
+
 
 class BaseSampler(DataMapper):
     """Base class for samplers."""
@@ -21,6 +40,26 @@ class BaseSampler(DataMapper):
         """
         raise NotImplementedError()
 
+    def sample_tensor(self, x, name=None):
+        """
+        Sample tensor according to `x` in the graph.
+
+        This is the TensorFlow counterpart of :meth:`sample`, which can be
+        applied on the input placeholders, such that the data can be fed
+        without sampling, and be sampled on the device at each run.
+        The random numbers are generated by TensorFlow random ops, thus
+        the `random_state` of this sampler is not used.
+
+        Args:
+            x (tf.Tensor): The input `x` tensor.
+            name (str): Default name of the name scope.
+                If not specified, generate one according to the class name.
+
+        Returns:
+            tf.Tensor: The sampled tensor.
+        """
+        raise NotImplementedError()
+
     def _transform(self, x):
         return self.sample(x),
 
@@ -30,38 +69,127 @@ class BernoulliSampler(BaseSampler):
     A :class:`DataMapper` which can sample 0/1 integers according to the
     input probability.  The input is assumed to be float numbers range within
     [0, 1) or [0, 1].
+
+    If `uint8_pixels` is :obj:`True`, the input is assumed to be 8-bit pixel
+    intensities within [0, 255] instead, and the probability of sampling 1
+    is ``x / 255``.  Such input is compared directly against random
+    numbers uniformly drawn from [0, 255), without being converted into
+    floating point probabilities.
+
+    If `random_state` is a :class:`numpy.random.Generator` (which is also
+    the default if supported by NumPy), the uniform random numbers are
+    drawn as float32 into a buffer reused across calls.  The buffer is
+    not pickled along with the sampler.
+
+    Note that the default `random_state` has been changed from a
+    :class:`numpy.random.RandomState` into a :class:`numpy.random.Generator`
+    (if supported by NumPy), thus the samples differ from those of earlier
+    versions even if the global NumPy random seed is set.  Specify a
+    :class:`RandomState` explicitly to reproduce the earlier samples.
     """
 
-    def __init__(self, dtype=np.int32, random_state=None):
+    def __init__(self, dtype=np.int32, random_state=None, uint8_pixels=False):
         """
         Construct a new :class:`BernoulliSampler`.
 
         Args:
             dtype: The data type of the sampled array.  Default `np.int32`.
-            random_state (RandomState): Optional numpy RandomState for sampling.
-                (default :obj:`None`, construct a new :class:`RandomState`).
+            random_state (RandomState or Generator): Optional numpy
+                RandomState or Generator for sampling.  (default :obj:`None`,
+                construct a new :class:`Generator` if supported by NumPy,
+                or a new :class:`RandomState` otherwise).
+            uint8_pixels (bool): Whether or not the input is uint8 pixel
+                intensities within [0, 255]?  (default :obj:`False`)
         """
         self._dtype = dtype
-        self._random_state = \
-            random_state or np.random.RandomState(generate_random_seed())
+        self._random_state = random_state or _new_random_state()
+        self._uint8_pixels = bool(uint8_pixels)
+        self._buffers = local()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['_buffers']  # thread-local buffers cannot be pickled
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._buffers = local()
 
     @property
     def dtype(self):
         """Get the data type of the sampled array."""
         return self._dtype
 
+    @property
+    def uint8_pixels(self):
+        """Whether or not the input is uint8 pixel intensities?"""
+        return self._uint8_pixels
+
+    def _uniform(self, shape):
+        """Draw float32 uniform random numbers into the reused buffer."""
+        size = int(np.prod(shape, dtype=np.int64))
+        buf = getattr(self._buffers, 'uniform', None)
+        if buf is None or buf.size < size:
+            buf = self._buffers.uniform = np.empty([size], dtype=np.float32)
+        buf = buf[:size].reshape(shape)
+        self._random_state.random(out=buf, dtype=np.float32)
+        return buf
+
     def sample(self, x):
-        rng = self._random_state or np.random
-        sampled = np.asarray(
-            rng.uniform(0., 1., size=x.shape) < x, dtype=self._dtype)
+        rng = self._random_state
+        x = np.asarray(x)
+        sampled = np.empty(x.shape, dtype=self._dtype)
+        if self._uint8_pixels:
+            if x.dtype != np.uint8:
+                raise TypeError('The input must be a uint8 array when '
+                                '`uint8_pixels` is True: got {}.'.
+                                format(x.dtype))
+            # P(r < x) = x / 255, for r uniformly drawn from [0, 255)
+            if _Generator is not None and isinstance(rng, _Generator):
+                r = self._uniform(x.shape)
+                r *= np.float32(255)
+            else:
+                r = _random_integers(rng, 255, x.shape, np.uint8)
+            np.less(r, x, out=sampled)
+        elif _Generator is not None and isinstance(rng, _Generator):
+            np.less(self._uniform(x.shape), x, out=sampled)
+        else:
+            np.less(rng.uniform(0., 1., size=x.shape), x, out=sampled)
         return sampled
 
+    def sample_tensor(self, x, name=None):
+        x = tf.convert_to_tensor(x)
+        with tf.name_scope(name, default_name='BernoulliSampler',
+                           values=[x]):
+            if self._uint8_pixels:
+                if x.dtype.base_dtype != tf.uint8:
+                    raise TypeError('The input must be a uint8 tensor when '
+                                    '`uint8_pixels` is True: got {}.'.
+                                    format(x.dtype.base_dtype.name))
+                # P(r < x) = x / 255, for r uniformly drawn from [0, 255)
+                r = tf.random_uniform(
+                    tf.shape(x), minval=0, maxval=255, dtype=tf.int32)
+                sampled = tf.less(r, tf.cast(x, dtype=tf.int32))
+            else:
+                u = tf.random_uniform(tf.shape(x), dtype=x.dtype.base_dtype)
+                sampled = tf.less(u, x)
+            return tf.cast(sampled, dtype=self._dtype)
+
 
 class UniformNoiseSampler(BaseSampler):
     """
     A :class:`DataMapper` which can add uniform noise onto the input array.
     The data type of the returned array will be the same as the input array,
     unless `dtype` is specified at construction.
+
+    If `random_state` is a :class:`numpy.random.Generator` (which is also
+    the default if supported by NumPy), and the returned array is float32
+    or float64, the noise is drawn directly into the returned array.
+
+    As with :class:`BernoulliSampler`, the default `random_state` has been
+    changed from a :class:`numpy.random.RandomState` into a
+    :class:`numpy.random.Generator` (if supported by NumPy), and the noise
+    differs from that of earlier versions.
     """
 
     def __init__(self, minval=0., maxval=1., dtype=None, random_state=None):
@@ -72,14 +200,15 @@ class UniformNoiseSampler(BaseSampler):
             minval: The lower bound of the uniform noise (included).
             maxval: The upper bound of the uniform noise (excluded).
             dtype: The data type of the sampled array.  Default `np.int32`.
-            random_state (RandomState): Optional numpy RandomState for sampling.
-                (default :obj:`None`, construct a new :class:`RandomState`).
+            random_state (RandomState or Generator): Optional numpy
+                RandomState or Generator for sampling.  (default :obj:`None`,
+                construct a new :class:`Generator` if supported by NumPy,
+                or a new :class:`RandomState` otherwise).
         """
         self._minval = minval
         self._maxval = maxval
         self._dtype = np.dtype(dtype) if dtype is not None else None
-        self._random_state = \
-            random_state or np.random.RandomState(generate_random_seed())
+        self._random_state = random_state or _new_random_state()
 
     @property
     def minval(self):
@@ -97,7 +226,34 @@ class UniformNoiseSampler(BaseSampler):
         return self._dtype
 
     def sample(self, x):
-        rng = self._random_state or np.random
+        rng = self._random_state
+        x = np.asarray(x)
         dtype = self._dtype or x.dtype
+        if _Generator is not None and isinstance(rng, _Generator) and \
+                dtype in (np.float32, np.float64):
+            # draw the noise directly into the output array
+            ret = np.empty(x.shape, dtype=dtype)
+            rng.random(out=ret, dtype=dtype)
+            ret *= dtype.type(self._maxval - self._minval)
+            ret += dtype.type(self._minval)
+            if self._maxval > self._minval:
+                # ``random * range + minval`` may be rounded up to `maxval`
+                np.minimum(ret, np.nextafter(dtype.type(self._maxval),
+                                             dtype.type(self._minval)),
+                           out=ret)
+            ret += x
+            return ret
         noise = rng.uniform(self._minval, self._maxval, size=x.shape)
         return np.asarray(x + noise, dtype=dtype)
+
+    def sample_tensor(self, x, name=None):
+        x = tf.convert_to_tensor(x)
+        with tf.name_scope(name, default_name='UniformNoiseSampler',
+                           values=[x]):
+            dtype = tf.as_dtype(self._dtype or x.dtype.base_dtype)
+            noise_dtype = dtype if dtype.is_floating else tf.float32
+            noise = tf.random_uniform(
+                tf.shape(x), minval=self._minval, maxval=self._maxval,
+                dtype=noise_dtype
+            )
+            return tf.cast(tf.cast(x, dtype=noise_dtype) + noise, dtype=dtype)
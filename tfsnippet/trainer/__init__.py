@@ -3,11 +3,12 @@ from .dynamic_values import *
 from .evaluator import *
 from .feed_dict import *
 from .loss_trainer import *
+from .staging import *
 from .trainer import *
 from .validator import *
 
 __all__ = [
     'AnnealingScalar', 'BaseTrainer', 'DynamicValue', 'Evaluator',
-    'LossTrainer', 'Trainer', 'Validator', 'auto_batch_weight',
+    'LossTrainer', 'StagingFlow', 'Trainer', 'Validator', 'auto_batch_weight',
     'merge_feed_dict', 'resolve_feed_dict',
 ]
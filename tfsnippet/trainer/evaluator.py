@@ -10,6 +10,7 @@ from tfsnippet.utils import get_default_session_or_error, EventSource
 from tfsnippet.scaffold import TrainLoop, EventKeys
 
 from .feed_dict import resolve_feed_dict, merge_feed_dict
+from .staging import StagingFlow
 
 __all__ = ['auto_batch_weight', 'Evaluator']
 
@@ -68,8 +69,11 @@ class Evaluator(object):
             inputs (list[tf.Tensor]): The input placeholders.
                 The number of tensors, and the order of tensors, should
                 both match the arrays of each mini-batch data, provided
-                by `data_flow`.
-            data_flow (DataFlow): The validation data flow.
+                by `data_flow`.  Must be empty or :obj:`None` if
+                `data_flow` is a :class:`StagingFlow`.
+            data_flow (DataFlow): The validation data flow.  If it is a
+                :class:`StagingFlow`, the metrics should be computed upon
+                its staged inputs instead of `inputs`.
             feed_dict (dict[tf.Tensor, any]): The fixed feed dict for
                 validation.  It will be merged with `inputs` and the
                 argument of ``run(feed_dict)``. (default :obj:`None`)
@@ -81,6 +85,9 @@ class Evaluator(object):
                 :obj:`None`, will use 1. as the metric weight.
                 (default :func:`auto_batch_weight`)
         """
+        if isinstance(data_flow, StagingFlow) and inputs:
+            raise ValueError('`inputs` must not be specified when '
+                             '`data_flow` is a StagingFlow.')
         if not isinstance(metrics, (dict, OrderedDict)):
             metrics = {loop.valid_metric_name: metrics}
         metrics = OrderedDict([
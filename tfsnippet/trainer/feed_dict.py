@@ -27,16 +27,21 @@ def resolve_feed_dict(feed_dict, inplace=False):
     if not inplace:
         feed_dict = dict(feed_dict)
     for k in feed_dict:
-        v = feed_dict[k]
-        if isinstance(v, ScheduledVariable):
-            feed_dict[k] = v.get()
-        elif isinstance(v, DynamicValue):
-            feed_dict[k] = v.get()
-        elif callable(v):
-            feed_dict[k] = v()
+        feed_dict[k] = _resolve_feed_value(feed_dict[k])
     return feed_dict
 
 
+def _resolve_feed_value(v):
+    """Resolve a dynamic value of the feed dict into fixed value."""
+    if isinstance(v, ScheduledVariable):
+        return v.get()
+    elif isinstance(v, DynamicValue):
+        return v.get()
+    elif callable(v):
+        return v()
+    return v
+
+
 def merge_feed_dict(*feed_dicts):
     """
     Merge all feed dicts into one.
@@ -0,0 +1,180 @@
+import sys
+from threading import Thread, Event
+
+import six
+import tensorflow as tf
+
+from tfsnippet.dataflows import DataFlow, ExtraInfoDataFlow
+from tfsnippet.utils import get_default_session_or_error
+
+if six.PY2:
+    from Queue import Queue
+else:
+    from queue import Queue
+
+__all__ = ['StagingFlow']
+
+_BATCH = 0
+_EPOCH_END = 1
+_ERROR = 2
+
+
+class StagingFlow(DataFlow):
+    """
+    Data flow which stages the mini-batches from the source flow into a
+    TensorFlow queue in a background thread, such that the preparation of
+    the mini-batches and the feeding of them overlap with the execution of
+    the graph.
+
+    The model should be built upon :attr:`inputs`, the tensors dequeued
+    from the staging queue, instead of placeholders.  Then this flow can be
+    passed to :class:`Trainer`, :class:`Evaluator` or
+    :func:`~tfsnippet.evaluation.collect_outputs` as the data flow, without
+    the `inputs` placeholders::
+
+        train_flow = spt.DataFlow.arrays([train_x, train_y], batch_size=128,
+                                         shuffle=True, skip_incomplete=True)
+        staging_flow = spt.StagingFlow(
+            train_flow, dtypes=[tf.float32, tf.int32], prefetch=4)
+        input_x, input_y = staging_flow.inputs
+        loss = build_model(input_x, input_y)
+        train_op = optimizer.minimize(loss)
+
+        with spt.TrainLoop(...) as loop:
+            trainer = spt.Trainer(loop, train_op, None, staging_flow,
+                                  metrics={'loss': loss})
+            trainer.run()
+
+    In each epoch, a background thread iterates through the source flow,
+    and runs the enqueue operation with each mini-batch, blocking when
+    `prefetch` mini-batches are waiting in the queue.  This flow yields the
+    source mini-batch once it has been staged, and each yielded mini-batch
+    must be consumed by exactly one ``session.run`` depending on
+    :attr:`inputs`, otherwise the staged mini-batches would mismatch the
+    yielded ones.  If the epoch is interrupted, the remaining staged
+    mini-batches are discarded.
+
+    The session for staging is the default session when an epoch starts.
+    """
+
+    def __init__(self, source, dtypes, shapes=None, prefetch=2, name=None):
+        """
+        Construct a :class:`StagingFlow`.
+
+        Args:
+            source (DataFlow): The source data flow.
+            dtypes (Iterable[tf.DType]): The data types of the arrays in
+                each mini-batch.
+            shapes (Iterable[Iterable[int or None]]): The shapes of the
+                items of the arrays (i.e., excluding the batch dimension).
+                (default :obj:`None`, use ``source.data_shapes`` if `source`
+                is a :class:`ExtraInfoDataFlow`, or unknown otherwise)
+            prefetch (int): The maximum number of mini-batches to be staged
+                ahead.  It should be at least 1. (default ``2``)
+            name (str): The name of the staging queue.
+                (default :obj:`None`)
+        """
+        dtypes = tuple(tf.as_dtype(t) for t in dtypes)
+        if not dtypes:
+            raise ValueError('`dtypes` must not be empty.')
+        if shapes is None and isinstance(source, ExtraInfoDataFlow):
+            shapes = source.data_shapes
+        if shapes is not None:
+            shapes = tuple(tf.TensorShape([None]).concatenate(s)
+                           for s in shapes)
+            if len(shapes) != len(dtypes):
+                raise ValueError('The length of `shapes` does not match '
+                                 '`dtypes`: {} vs {}.'.
+                                 format(len(shapes), len(dtypes)))
+        else:
+            shapes = (tf.TensorShape(None),) * len(dtypes)
+        prefetch = int(prefetch)
+        if prefetch < 1:
+            raise ValueError('`prefetch` must be at least 1.')
+
+        with tf.name_scope(name, default_name='StagingFlow'):
+            queue = tf.FIFOQueue(prefetch, dtypes=dtypes, name='queue')
+            placeholders = tuple(
+                tf.placeholder(dtype=t, shape=s, name='input_{}'.format(i))
+                for i, (t, s) in enumerate(zip(dtypes, shapes))
+            )
+            enqueue_op = queue.enqueue(placeholders)
+            outputs = queue.dequeue()
+            if not isinstance(outputs, (list, tuple)):
+                outputs = [outputs]
+            for o, s in zip(outputs, shapes):
+                o.set_shape(s)
+            size_op = queue.size()
+
+        self._source = source
+        self._prefetch = prefetch
+        self._placeholders = placeholders
+        self._enqueue_op = enqueue_op
+        self._inputs = tuple(outputs)
+        self._dequeue_op = outputs[0].op
+        self._size_op = size_op
+
+    @property
+    def source(self):
+        """Get the source data flow."""
+        return self._source
+
+    @property
+    def prefetch(self):
+        """Get the maximum number of mini-batches to be staged ahead."""
+        return self._prefetch
+
+    @property
+    def inputs(self):
+        """
+        Get the input tensors dequeued from the staging queue.
+
+        Returns:
+            tuple[tf.Tensor]: The input tensors.
+        """
+        return self._inputs
+
+    def _worker_func(self, session, tickets, stopping):
+        try:
+            iterator = iter(self._source)
+            try:
+                for batch in iterator:
+                    if stopping.is_set():
+                        break
+                    session.run(self._enqueue_op, feed_dict=dict(
+                        zip(self._placeholders, batch)))
+                    tickets.put((_BATCH, batch))
+            finally:
+                iterator.close()
+            tickets.put((_EPOCH_END, None))
+        except Exception:
+            tickets.put((_ERROR, sys.exc_info()))
+
+    def _minibatch_iterator(self):
+        session = get_default_session_or_error()
+        tickets = Queue()
+        stopping = Event()
+        worker = Thread(target=self._worker_func,
+                        args=(session, tickets, stopping))
+        worker.daemon = True
+        worker.start()
+
+        try:
+            while True:
+                kind, payload = tickets.get()
+                if kind == _ERROR:
+                    six.reraise(*payload)
+                elif kind == _EPOCH_END:
+                    break
+                yield payload
+        finally:
+            # stop the worker, dequeuing the staged mini-batches such that
+            # the worker would not be blocked by the full queue
+            stopping.set()
+            while worker.is_alive():
+                if session.run(self._size_op) > 0:
+                    session.run(self._dequeue_op)
+                else:
+                    worker.join(.01)
+            for _ in range(session.run(self._size_op)):
+                session.run(self._dequeue_op)
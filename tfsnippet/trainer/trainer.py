@@ -1,9 +1,10 @@
-import six
+import weakref
 
 from tfsnippet.scaffold import TrainLoop
 from tfsnippet.utils import is_tensor_object
 from .base_trainer import BaseTrainer
-from .feed_dict import resolve_feed_dict, merge_feed_dict
+from .feed_dict import _resolve_feed_value
+from .staging import StagingFlow
 
 
 __all__ = ['Trainer']
@@ -74,10 +75,12 @@ class Trainer(BaseTrainer):
             inputs (list[tf.Tensor]): The input placeholders.
                 The number of tensors, and the order of tensors, should
                 both match the arrays of each mini-batch data, provided
-                by `data_flow`.
+                by `data_flow`.  Must be empty or :obj:`None` if
+                `data_flow` is a :class:`StagingFlow`.
             data_flow (DataFlow): The training data flow.
                 Each mini-batch must contain one array for each placeholder
-                in `inputs`.
+                in `inputs`.  If it is a :class:`StagingFlow`, the model
+                should be built upon its staged inputs instead.
             feed_dict: The feed dict for training.  It will be merged with
                 the arrays provided by `data_flow` in each step.
 
@@ -94,6 +97,9 @@ class Trainer(BaseTrainer):
         if loop.max_epoch is None and loop.max_step is None:
             raise ValueError('At least one of `max_epoch`, `max_step` should '
                              'be configured for `loop`.')
+        if isinstance(data_flow, StagingFlow) and inputs:
+            raise ValueError('`inputs` must not be specified when '
+                             '`data_flow` is a StagingFlow.')
         if summaries is not None and is_tensor_object(summaries):
             summaries = [summaries]
         super(Trainer, self).__init__(loop=loop)
@@ -105,6 +111,7 @@ class Trainer(BaseTrainer):
         self._train_op = train_op
         self._metrics = dict(metrics or ())
         self._summaries = list(summaries or ())
+        self._step_plan = None  # (session ref, signature, compiled plan)
 
     @property
     def inputs(self):
@@ -154,32 +161,63 @@ class Trainer(BaseTrainer):
     def _iter_steps(self):
         return self.loop.iter_steps(self.data_flow)
 
-    def _run_step(self, session, payload):
-        # prepare for the feed dict of this step
-        step, batch_data = payload
-        feed_dict = resolve_feed_dict(
-            merge_feed_dict(
-                self.feed_dict,
-                zip(self.inputs, batch_data)
-            )
-        )
+    def _get_step_plan(self, session, input_count):
+        """
+        Get the compiled plan for running a training step.
+
+        The step is compiled by ``session.make_callable``, with the fetches
+        and the fed tensors fixed, such that each step only needs to bind
+        the feed values and the batch arrays.  The plan is cached until the
+        session, the number of batch arrays, the keys of :attr:`feed_dict`
+        or :attr:`metrics`, or the availability of ``loop.summary_writer``
+        changes.  These are checked at every step, by comparing the keys
+        by identity, so that changes made by hooks within an epoch also
+        take effect.
 
-        # run the training operation if batch data is not null
-        metric_names = list(six.iterkeys(self.metrics))
-        metric_tensors = [self.metrics[k] for k in metric_names]
-        if self.loop.summary_writer is not None:
-            summary_tensors = self._summaries
-        else:
-            summary_tensors = []
-        session_out = session.run(
+        Returns:
+            (callable, tuple, list[str]): The compiled step function, the
+                keys of :attr:`feed_dict` to be fed before the batch arrays,
+                and the names of the fetched metrics.
+        """
+        with_summaries = (self.loop.summary_writer is not None and
+                          bool(self._summaries))
+        signature = (input_count, tuple(self._feed_dict),
+                     tuple(self._metrics), with_summaries)
+
+        # the session is referenced weakly, such that the cached plan
+        # would not keep a closed session alive
+        plan = self._step_plan
+        if plan is not None and plan[0]() is session and \
+                plan[1] == signature:
+            return plan[2]
+
+        inputs = self._inputs[:input_count]
+        input_set = set(inputs)
+        feed_keys = tuple(k for k in self._feed_dict if k not in input_set)
+        metric_names = signature[2]
+        metric_tensors = [self._metrics[k] for k in metric_names]
+        summary_tensors = self._summaries if with_summaries else []
+        step_fn = session.make_callable(
             [self._train_op] + metric_tensors + summary_tensors,
-            feed_dict=feed_dict
+            feed_list=list(feed_keys) + list(inputs)
         )
-        metric_values = session_out[1: len(session_out) - len(summary_tensors)]
-        summaries = session_out[len(session_out) - len(summary_tensors):]
+        self._step_plan = (weakref.ref(session), signature,
+                           (step_fn, feed_keys, metric_names))
+        return self._step_plan[2]
+
+    def _run_step(self, session, payload):
+        # bind the feed values and the batch data to the compiled step
+        step, batch_data = payload
+        input_count = min(len(self._inputs), len(batch_data))
+        step_fn, feed_keys, metric_names = \
+            self._get_step_plan(session, input_count)
+        feed_values = [_resolve_feed_value(self._feed_dict[k])
+                       for k in feed_keys]
+        session_out = step_fn(*(feed_values + list(batch_data[:input_count])))
 
         # collect the metrics and the summaries
+        metric_count = len(metric_names)
         self.loop.collect_metrics(
-            {n: v for n, v in zip(metric_names, metric_values)})
-        for summary in summaries:
+            {n: v for n, v in zip(metric_names, session_out[1:])})
+        for summary in session_out[1 + metric_count:]:
             self.loop.add_summary(summary)
@@ -2,6 +2,7 @@ import os
 import shutil
 from contextlib import contextmanager
 
+import numpy as np
 import requests
 import six
 import sys
@@ -390,6 +391,67 @@ class CacheDir(object):
                 os.remove(file_path)
             return extract_path
 
+    def _cache_arrays(self, factory, cache_path):
+        if not os.path.isdir(cache_path):
+            temp_path = cache_path + '._saving_'
+            try:
+                arrays = tuple(factory())
+                makedirs(temp_path, exist_ok=True)
+                for i, arr in enumerate(arrays):
+                    np.save(
+                        os.path.join(temp_path, 'array_{}.npy'.format(i)),
+                        np.asarray(arr)
+                    )
+            except BaseException:
+                if os.path.isdir(temp_path):
+                    shutil.rmtree(temp_path)
+                raise
+            else:
+                os.rename(temp_path, cache_path)
+
+    def cache_arrays(self, name, factory, mmap_mode='r', refresh=False):
+        """
+        Load the NumPy arrays cached in the sub-directory `name` of this
+        :class:`CacheDir`, or produce them by `factory` and cache them as
+        ".npy" files if `name` does not exist.
+
+        The cached arrays are memory-mapped by default, such that loading
+        them is nearly free, and multiple processes can share the pages of
+        the same files.  Note the memory-mapped arrays are read-only in the
+        default mode "r".  Specify mode "c" to obtain copy-on-write arrays,
+        which can be modified in memory without affecting the cached files.
+
+        Args:
+            name (str): The name of the sub-directory to store the arrays.
+                It should identify everything that affects the output of
+                `factory`.  If it already exists in this :class:`CacheDir`,
+                will not call `factory`.
+            factory (() -> Iterable[np.ndarray]): The function to produce
+                the arrays.
+            mmap_mode (str or None): The mode to memory-map the ".npy" files,
+                see :func:`numpy.load`.  Specify :obj:`None` to load the
+                arrays into memory. (default "r")
+            refresh (bool): Whether or not to produce the arrays by
+                `factory` again, even if `name` already exists?
+                (default :obj:`False`)
+
+        Returns:
+            tuple[np.ndarray]: The cached arrays.
+        """
+        cache_path = os.path.abspath(os.path.join(self.path, name))
+        with self._lock_file(cache_path):
+            if refresh and os.path.isdir(cache_path):
+                shutil.rmtree(cache_path)
+            self._cache_arrays(factory, cache_path)
+
+        ret = []
+        file_path = os.path.join(cache_path, 'array_0.npy')
+        while os.path.isfile(file_path):
+            ret.append(np.load(file_path, mmap_mode=mmap_mode))
+            file_path = os.path.join(
+                cache_path, 'array_{}.npy'.format(len(ret)))
+        return tuple(ret)
+
     def purge_all(self):
         """Delete everything in this :class:`CacheDir`."""
         shutil.rmtree(self.path)
@@ -3,6 +3,7 @@ __all__ = [
     'Disposable',
     'NoReentrantContext',
     'DisposableContext',
+    'CheckpointSavableObject',
 ]
 
 
@@ -134,3 +135,30 @@ class DisposableContext(NoReentrantContext):
         ret = super(DisposableContext, self).__enter__()
         self._has_entered = True
         return ret
+
+
+class CheckpointSavableObject(object):
+    """
+    Base class for all objects that can be saved via
+    :class:`~tfsnippet.scaffold.CheckpointSaver`.
+    """
+
+    def get_state(self):
+        """
+        Get the internal states of the object.
+
+        The returned state dict must be pickle-able.
+
+        Returns:
+            dict: The internal states dict.
+        """
+        raise NotImplementedError()
+
+    def set_state(self, state):
+        """
+        Set the internal states of the object.
+
+        Args:
+            state: The internal states dict.
+        """
+        raise NotImplementedError()